@@ -10,7 +10,6 @@ import torch as th
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
-import wandb
 from torch.distributions import Normal
 
 from mo_utils.evaluation import (
@@ -18,6 +17,7 @@ from mo_utils.evaluation import (
     log_episode_info,
     policy_evaluation_mo,
 )
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOAgent, MOPolicy
 from mo_utils.networks import layer_init, mlp, polyak_update
 from mo_utils.weights import equally_spaced_weights
@@ -360,7 +360,7 @@ class CAPQL(MOAgent, MOPolicy):
                 polyak_update(q_net.parameters(), target_q_net.parameters(), self.tau)
 
         if self.log and self.global_step % 100 == 0:
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "losses/critic_loss": critic_loss.item(),
                     "losses/policy_loss": policy_loss.item(),
@@ -497,5 +497,7 @@ class CAPQL(MOAgent, MOPolicy):
             if checkpoints:
                 self.save(filename="CAPQL", save_replay_buffer=False)
 
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
@@ -9,13 +9,13 @@ import torch as th
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
-import wandb
 
 from mo_utils.buffer import ReplayBuffer
 from mo_utils.evaluation import (
     log_all_multi_policy_metrics,
     log_episode_info,
 )
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOAgent, MOPolicy
 from mo_utils.networks import (
     NatureCNN,
@@ -330,7 +330,7 @@ class Envelope(MOPolicy, MOAgent):
             self.q_optim.zero_grad()
             critic_loss.backward()
             if self.log and self.global_step % 100 == 0:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "losses/grad_norm": get_grad_norm(self.q_net.parameters()).item(),
                         "global_step": self.global_step,
@@ -370,7 +370,7 @@ class Envelope(MOPolicy, MOAgent):
             )
 
         if self.log and self.global_step % 100 == 0:
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "losses/critic_loss": np.mean(critic_losses),
                     "metrics/epsilon": self.epsilon,
@@ -379,7 +379,7 @@ class Envelope(MOPolicy, MOAgent):
                 },
             )
             if self.per:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "metrics/mean_priority": np.mean(priority),
                         "metrics/max_priority": np.max(priority),
@@ -616,5 +616,7 @@ class Envelope(MOPolicy, MOAgent):
             else:
                 obs = next_obs
 
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
\ No newline at end of file
@@ -14,10 +14,12 @@ import wandb
 
 from mo_utils.buffer import ReplayBuffer
 from mo_utils.evaluation import (
+    EvaluationCache,
     log_all_multi_policy_metrics,
     log_episode_info,
     policy_evaluation_mo,
 )
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.model_based.probabilistic_ensemble import (
     ProbabilisticEnsemble,
 )
@@ -133,6 +135,7 @@ class GPIPD(MOPolicy, MOAgent):
         log: bool = True,
         seed: Optional[int] = None,
         device: Union[th.device, str] = "auto",
+        cache_evaluations: bool = False,
     ):
         """Initialize the GPI-PD algorithm.
 
@@ -183,6 +186,7 @@ class GPIPD(MOPolicy, MOAgent):
             log: Whether to log.
             seed: The seed for random number generators.
             device: The device to use.
+            cache_evaluations: Whether to reuse the evaluations of the weights while the parameters did not change, see `EvaluationCache`.
         """
         MOAgent.__init__(self, env, device=device, seed=seed)
         MOPolicy.__init__(self, device=device)
@@ -280,6 +284,9 @@ class GPIPD(MOPolicy, MOAgent):
         self.dynamics_uncertainty_threshold = dynamics_uncertainty_threshold
         self.real_ratio = real_ratio
 
+        # results of the evaluations of the current parameters, see `policy_evaluation_mo`
+        self.eval_cache = EvaluationCache() if cache_evaluations else None
+
         # logging
         self.log = log
         if self.log:
@@ -417,7 +424,7 @@ class GPIPD(MOPolicy, MOAgent):
                 obs = next_obs_pred[nonterm_mask]
 
         if self.log:
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "dynamics/uncertainty_mean": uncertainties.mean(),
                     "dynamics/uncertainty_max": uncertainties.max(),
@@ -507,7 +514,7 @@ class GPIPD(MOPolicy, MOAgent):
             critic_loss.backward()
 
             if self.log and self.global_step % 100 == 0:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "losses/grad_norm": get_grad_norm(self.q_nets[0].parameters()).item(),
                         "global_step": self.global_step,
@@ -550,7 +557,7 @@ class GPIPD(MOPolicy, MOAgent):
 
         if self.log and self.global_step % 100 == 0:
             if self.per:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "metrics/mean_priority": np.mean(priority),
                         "metrics/max_priority": np.max(priority),
@@ -559,7 +566,7 @@ class GPIPD(MOPolicy, MOAgent):
                     commit=False,
                 )
             if self.gpi_pd:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "metrics/mean_gpriority": np.mean(gpriority),
                         "metrics/max_gpriority": np.max(gpriority),
@@ -568,7 +575,7 @@ class GPIPD(MOPolicy, MOAgent):
                     },
                     commit=False,
                 )
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "losses/critic_loss": np.mean(critic_losses),
                     "metrics/epsilon": self.epsilon,
@@ -816,7 +823,7 @@ class GPIPD(MOPolicy, MOAgent):
                         Y = np.hstack((m_rewards, m_next_obs - m_obs))
                         mean_holdout_loss = self.dynamics.fit(X, Y)
                         if self.log:
-                            wandb.log(
+                            get_metrics_sink().log(
                                 {"dynamics/mean_holdout_loss": mean_holdout_loss, "global_step": self.global_step},
                             )
 
@@ -831,7 +838,7 @@ class GPIPD(MOPolicy, MOAgent):
 
                 if self.dyna and self.global_step >= self.dynamics_rollout_starts:
                     plot = visualize_eval(self, eval_env, self.dynamics, weight, compound=False, horizon=1000)
-                    wandb.log({"dynamics/predictions": wandb.Image(plot), "global_step": self.global_step})
+                    get_metrics_sink().log({"dynamics/predictions": wandb.Image(plot), "global_step": self.global_step})
                     plot.close()
 
             if terminated or truncated:
@@ -840,7 +847,7 @@ class GPIPD(MOPolicy, MOAgent):
 
                 if self.log and "episode" in info.keys():
                     log_episode_info(info["episode"], np.dot, weight, self.global_step, verbose=verbose)
-                    wandb.log(
+                    get_metrics_sink().log(
                         {"metrics/policy_index": np.array(self.policy_indices), "global_step": self.global_step},
                     )
                     self.policy_indices = []
@@ -943,11 +950,13 @@ class GPIPD(MOPolicy, MOAgent):
             )
 
             if weight_selection_algo == "ols":
-                value = policy_evaluation_mo(self, eval_env, w, rep=num_eval_episodes_for_front)[3]
+                value = policy_evaluation_mo(self, eval_env, w, rep=num_eval_episodes_for_front, cache=self.eval_cache)[3]
                 linear_support.add_solution(value, w)
             elif weight_selection_algo == "gpi-ls":
                 for wcw in M:
-                    n_value = policy_evaluation_mo(self, eval_env, wcw, rep=num_eval_episodes_for_front)[3]
+                    n_value = policy_evaluation_mo(
+                        self, eval_env, wcw, rep=num_eval_episodes_for_front, cache=self.eval_cache
+                    )[3]
                     linear_support.add_solution(n_value, wcw)
 
             if self.log and self.global_step % eval_mo_freq == 0:
@@ -956,7 +965,8 @@ class GPIPD(MOPolicy, MOAgent):
                     eval_env.eval(self, ref_point=ref_point, reward_dim=self.reward_dim, global_step=self.global_step)
                 else:
                     gpi_returns_test_tasks = [
-                        policy_evaluation_mo(self, eval_env, ew, rep=num_eval_episodes_for_front)[3] for ew in eval_weights
+                        policy_evaluation_mo(self, eval_env, ew, rep=num_eval_episodes_for_front, cache=self.eval_cache)[3]
+                        for ew in eval_weights
                     ]
                     log_all_multi_policy_metrics(
                         current_front=gpi_returns_test_tasks,
@@ -970,11 +980,13 @@ class GPIPD(MOPolicy, MOAgent):
                     mean_gpi_returns_test_tasks = np.mean(
                         [np.dot(ew, q) for ew, q in zip(eval_weights, gpi_returns_test_tasks)], axis=0
                     )
-                    wandb.log({"eval/Mean Utility - GPI": mean_gpi_returns_test_tasks, "iteration": iter})
+                    get_metrics_sink().log({"eval/Mean Utility - GPI": mean_gpi_returns_test_tasks, "iteration": iter})
 
             if checkpoints:
                 self.save(filename=f"GPI-PD {weight_selection_algo} iter={iter}", save_replay_buffer=False)
 
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
 
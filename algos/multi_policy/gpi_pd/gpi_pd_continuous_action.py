@@ -14,10 +14,12 @@ import wandb
 
 from mo_utils.buffer import ReplayBuffer
 from mo_utils.evaluation import (
+    EvaluationCache,
     log_all_multi_policy_metrics,
     log_episode_info,
     policy_evaluation_mo,
 )
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.model_based.probabilistic_ensemble import (
     ProbabilisticEnsemble,
 )
@@ -125,6 +127,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
         log: bool = True,
         seed: Optional[int] = None,
         device: Union[th.device, str] = "auto",
+        cache_evaluations: bool = False,
     ):
         """GPI-PD algorithm with continuous actions.
 
@@ -172,6 +175,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
             log (bool, optional): Whether to log to wandb. Defaults to True.
             seed (Optional[int], optional): The seed to use. Defaults to None.
             device (Union[th.device, str], optional): The device to use for training. Defaults to "auto".
+            cache_evaluations (bool, optional): Whether to reuse the evaluations of the weights while the parameters did not change, see `EvaluationCache`. Defaults to False.
         """
         MOAgent.__init__(self, env, device=device, seed=seed)
         MOPolicy.__init__(self, device=device)
@@ -257,6 +261,9 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
 
         self._n_updates = 0
 
+        # results of the evaluations of the current parameters, see `policy_evaluation_mo`
+        self.eval_cache = EvaluationCache() if cache_evaluations else None
+
         self.log = log
         if self.log:
             self.setup_wandb(project_name, experiment_name, wandb_entity, wandb_group, wandb_tags, offline_mode)
@@ -385,7 +392,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
                 obs = next_obs_pred[nonterm_mask]
 
         if self.log:
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "dynamics/uncertainty_mean": uncertainties.mean(),
                     "dynamics/uncertainty_max": uncertainties.max(),
@@ -435,7 +442,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
             critic_loss.backward()
             
             if self.log and self.global_step % 100 == 0:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "losses/critic_grad_norm": get_grad_norm(self.q_nets[0].parameters()).item(),
                         "global_step": self.global_step,
@@ -462,7 +469,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
                 self.policy_optim.zero_grad()
                 policy_loss.backward()
                 if self.log and self.global_step % 100 == 0:
-                    wandb.log(
+                    get_metrics_sink().log(
                         {
                             "losses/policy_grad_norm": get_grad_norm(self.q_nets[0].parameters()).item(),
                             "global_step": self.global_step,
@@ -476,7 +483,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
 
         if self.log and self.global_step % 100 == 0:
             if self.per:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "metrics/mean_priority": np.mean(priority),
                         "metrics/max_priority": np.max(priority),
@@ -484,7 +491,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
                     },
                     commit=False,
                 )
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "losses/critic_loss": critic_loss.item(),
                     "losses/policy_loss": policy_loss.item(),
@@ -622,7 +629,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
                         Y = np.hstack((m_rewards, m_next_obs - m_obs))
                         mean_holdout_loss = self.dynamics.fit(X, Y)
                         if self.log:
-                            wandb.log(
+                            get_metrics_sink().log(
                                 {"dynamics/mean_holdout_loss": mean_holdout_loss, "global_step": self.global_step},
                             )
 
@@ -637,7 +644,7 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
 
                 if self.dyna and self.global_step >= self.dynamics_rollout_starts:
                     plot = visualize_eval(self, eval_env, self.dynamics, w=weight, compound=False, horizon=1000)
-                    wandb.log({"dynamics/predictions": wandb.Image(plot), "global_step": self.global_step})
+                    get_metrics_sink().log({"dynamics/predictions": wandb.Image(plot), "global_step": self.global_step})
                     plot.close()
 
             if terminated or truncated:
@@ -740,11 +747,13 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
             )
 
             if weight_selection_algo == "ols":
-                value = policy_evaluation_mo(self, eval_env, w, rep=num_eval_episodes_for_front)[3]
+                value = policy_evaluation_mo(self, eval_env, w, rep=num_eval_episodes_for_front, cache=self.eval_cache)[3]
                 linear_support.add_solution(value, w)
             elif weight_selection_algo == "gpi-ls":
                 for wcw in M:
-                    n_value = policy_evaluation_mo(self, eval_env, wcw, rep=num_eval_episodes_for_front)[3]
+                    n_value = policy_evaluation_mo(
+                        self, eval_env, wcw, rep=num_eval_episodes_for_front, cache=self.eval_cache
+                    )[3]
                     linear_support.add_solution(n_value, wcw)
 
             if self.log and self.global_step % eval_mo_freq == 0:
@@ -753,7 +762,8 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
                     eval_env.eval(self, ref_point=ref_point, reward_dim=self.reward_dim, global_step=self.global_step)
                 else:
                     gpi_returns_test_tasks = [
-                        policy_evaluation_mo(self, eval_env, ew, rep=num_eval_episodes_for_front)[3] for ew in eval_weights
+                        policy_evaluation_mo(self, eval_env, ew, rep=num_eval_episodes_for_front, cache=self.eval_cache)[3]
+                        for ew in eval_weights
                     ]
                     log_all_multi_policy_metrics(
                         current_front=gpi_returns_test_tasks,
@@ -767,12 +777,14 @@ class GPIPDContinuousAction(MOAgent, MOPolicy):
                     mean_gpi_returns_test_tasks = np.mean(
                         [np.dot(ew, q) for ew, q in zip(eval_weights, gpi_returns_test_tasks)], axis=0
                     )
-                    wandb.log({"eval/Mean Utility - GPI": mean_gpi_returns_test_tasks, "iteration": iter})
+                    get_metrics_sink().log({"eval/Mean Utility - GPI": mean_gpi_returns_test_tasks, "iteration": iter})
 
             # Checkpoint
             if checkpoints:
                 self.save(filename=f"GPI-PD {weight_selection_algo} iter={iter}", save_replay_buffer=False)
 
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
 
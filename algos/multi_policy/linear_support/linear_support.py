@@ -3,14 +3,12 @@ import random
 from copy import deepcopy
 from typing import List, Optional
 
-import cdd
-import wandb
-import cvxpy as cp
 import numpy as np
-from cvxpy import SolverError
 from gymnasium.core import Env
+from scipy.optimize import linprog
 
 from mo_utils.evaluation import policy_evaluation_mo
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOPolicy
 from mo_utils.performance_indicators import hypervolume
 from mo_utils.weights import extrema_weights
@@ -19,6 +17,142 @@ from mo_utils.weights import extrema_weights
 np.set_printoptions(precision=4)
 
 
+def _scalarize(weights: List[np.ndarray], values: List[np.ndarray]) -> np.ndarray:
+    """Scalarized values (columns) for each weight vector (rows).
+
+    Each one is computed with `np.dot`, as in `max_scalarized_value`, so that ties (e.g. of a value with the maximum)
+    compare exactly as there, whereas matrix products may round differently.
+    """
+    return np.array([[np.dot(v, w) for v in values] for w in weights])
+
+
+def _max_value_lp_2d(W: np.ndarray, V: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Solves max w . v such that W v <= V for 2 objectives and each w in weights, where W and w are non-negative.
+
+    By LP duality, the bound is the minimum of V . y such that y >= 0 and W^T y = w. Normalizing each weight vector by
+    its sum, this is the lower convex hull of the points (w_1 / sum(w), V / sum(w)) of the visited weights, interpolated
+    at the first component of each normalized weight (the LP is unbounded outside of the visited weights).
+    """
+    sums = W.sum(axis=1)
+    xs, ys = W[:, 0] / sums, V / sums
+    order = np.lexsort((ys, xs))
+    xs, first = np.unique(xs[order], return_index=True)  # the lowest point of each x
+    ys = ys[order][first]
+
+    hull = []
+    for point in zip(xs, ys):
+        while len(hull) >= 2 and (hull[-1][0] - hull[-2][0]) * (point[1] - hull[-2][1]) <= (hull[-1][1] - hull[-2][1]) * (point[0] - hull[-2][0]):
+            hull.pop()
+        hull.append(point)
+    hull_xs, hull_ys = np.array(hull).T
+
+    weight_sums = weights.sum(axis=1)
+    x = weights[:, 0] / weight_sums
+    tol = 1e-9
+    inside = (x >= hull_xs[0] - tol) & (x <= hull_xs[-1] + tol)
+    return np.where(inside, weight_sums * np.interp(x, hull_xs, hull_ys), float("inf"))
+
+
+class _UpperEnvelope:
+    """Vertices of the upper envelope max_v v . w of a set of value vectors over the weight simplex, updated incrementally.
+
+    The envelope is the polyhedron {(w, u): w in the weight simplex, v . w <= u for every value vector v}, whose vertices
+    give the corner weights. It is represented by the extreme rays (w, u, t) of its homogenization (vertices have t = 1
+    and the only ray is (0, 1, 0)) and the constraints tight at each of them. Adding a value vector is then one step of
+    the double description method: only the vertices cut off by the new constraint are replaced, by the intersections
+    of the new hyperplane with their edges to the kept vertices.
+    """
+
+    def __init__(self, num_objectives: int):
+        self.num_objectives = num_objectives
+        self.values = np.zeros((0, num_objectives))
+        self.generators = np.zeros((0, num_objectives + 2))
+        # tight[i, j]: whether constraint j is tight at generator i. Constraints are w_k >= 0 (one per objective),
+        # t >= 0, then v . w <= u for each value vector.
+        self.tight = np.zeros((0, num_objectives + 1), dtype=bool)
+
+    @staticmethod
+    def _tolerance(value: np.ndarray) -> float:
+        return 1e-9 * max(1.0, np.abs(value).max())
+
+    def add(self, value: np.ndarray):
+        """Adds the constraint v . w <= u of a value vector."""
+        n = self.num_objectives
+        value = np.round(np.asarray(value, dtype=np.float64), decimals=4) # Round to avoid numerical issues
+        row = np.concatenate((value, [-1.0, 0.0]))
+
+        if len(self.values) == 0:
+            # vertices (e_k, v_k, 1) on the extrema of the simplex, and the vertical ray (0, 1, 0)
+            vertices = np.concatenate((np.eye(n), value[:, None], np.ones((n, 1))), axis=1)
+            self.generators = np.vstack((vertices, np.eye(1, n + 2, n)))
+            self.tight = np.zeros((n + 1, n + 2), dtype=bool)
+            self.tight[:n, :n] = ~np.eye(n, dtype=bool)
+            self.tight[:n, n + 1] = True
+            self.tight[n, : n + 1] = True
+            self.values = value[None]
+            return
+
+        vals = self.generators @ row
+        tol = self._tolerance(value)
+        cut, kept = vals > tol, vals < -tol
+        new_tight = ~cut & ~kept
+        if cut.any():
+            P, Q = np.flatnonzero(cut), np.flatnonzero(kept)
+            # (p, q) are adjacent iff they share enough tight constraints, and no other generator is tight at all of them
+            common = self.tight[P][:, None] & self.tight[Q][None]
+            pi, qi = np.nonzero(common.sum(axis=2) >= n - 1)
+            common = common[pi, qi]
+            adjacent = np.sum(~np.any(common[:, None] & ~self.tight[None], axis=2), axis=1) == 2
+            p, q, common = P[pi[adjacent]], Q[qi[adjacent]], common[adjacent]
+
+            new_generators = vals[p, None] * self.generators[q] - vals[q, None] * self.generators[p]
+            t = new_generators[:, -1:]
+            new_generators /= np.where(t > tol, t, np.linalg.norm(new_generators, axis=1, keepdims=True))
+
+            # several values tied at a vertex yield it from several edges (or it was already on the new hyperplane):
+            # it is kept once, tight at all the constraints of its copies
+            generators = np.vstack((self.generators[~cut], new_generators))
+            tight = np.vstack((self.tight[~cut], common))
+            new_tight = np.concatenate((new_tight[~cut], np.ones(len(p), dtype=bool)))
+            num_kept = len(generators) - len(p)
+            on_hyperplane = np.flatnonzero(new_tight)
+            close = np.max(np.abs(generators[num_kept:, None] - generators[None, on_hyperplane]), axis=2) <= 100 * tol
+            first_copy = on_hyperplane[np.argmax(close, axis=1)]
+            np.logical_or.at(tight, first_copy, tight[num_kept:])
+            unique = np.ones(len(generators), dtype=bool)
+            unique[num_kept:] = first_copy == np.arange(num_kept, len(generators))
+            self.generators, self.tight, new_tight = generators[unique], tight[unique], new_tight[unique]
+
+        self.tight = np.hstack((self.tight, new_tight[:, None]))
+        self.values = np.vstack((self.values, value))
+
+    def remove(self, index: int):
+        """Removes the constraint of the index-th value vector."""
+        column = self.num_objectives + 1 + index
+        if not self.tight[:, column].any():
+            # the constraint does not touch the envelope, which is unchanged without it
+            self.tight = np.delete(self.tight, column, axis=1)
+            self.values = np.delete(self.values, index, axis=0)
+            return
+        # the envelope may grow where the value vector was optimal
+        values = np.delete(self.values, index, axis=0)
+        self.__init__(self.num_objectives)
+        for value in values:
+            self.add(value)
+
+    def corner_weights(self) -> List[np.ndarray]:
+        """Weights of the vertices of the envelope."""
+        vertices = self.generators[self.generators[:, -1] > 0.5]
+        corners = []
+        for v in vertices:
+            corner_weight = v[: self.num_objectives]
+            # Make sure the corner weight is positive and sum to 1
+            corner_weight = np.abs(corner_weight)
+            corner_weight /= corner_weight.sum()
+            corners.append(corner_weight)
+        return corners
+
+
 class LinearSupport:
     """Linear Support for computing corner weights when using linear utility functions.
 
@@ -53,6 +187,8 @@ class LinearSupport:
         self.iteration = 0
         self.ols_ended = False
         self.verbose = verbose
+        self._envelope = _UpperEnvelope(num_objectives)  # corner weights of the CCS, see compute_corner_weights
+        self._lp_bounds = {}  # max_value_lp of the corner weights, see max_value_lp
         for w in extrema_weights(self.num_objectives):
             self.queue.append((float("inf"), w))
 
@@ -80,17 +216,24 @@ class LinearSupport:
                 print("W_corner:", W_corner, "W_corner size:", len(W_corner))
             
             if gpi_agent is not None:
-                wandb.log({"linear_support/num_corner_weights": len(W_corner),  "global_step": gpi_agent.global_step})
+                get_metrics_sink().log({"linear_support/num_corner_weights": len(W_corner),  "global_step": gpi_agent.global_step})
+
+            corner_keys = {np.asarray(wc, dtype=np.float64).tobytes() for wc in W_corner}
+            self._lp_bounds = {key: bound for key, bound in self._lp_bounds.items() if key in corner_keys}
+
+            if algo == "gpi-ls":
+                if gpi_agent is None:
+                    raise ValueError("GPI-LS requires passing a GPI agent.")
+                gpi_expanded_set = self.gpi_corner_evaluations(gpi_agent, env, W_corner, rep_eval=rep_eval)
+            elif algo == "ols":
+                max_optimistic_values = self.max_values_lp(W_corner)
 
             self.queue = []
-            for wc in W_corner:
+            for i, wc in enumerate(W_corner):
                 if algo == "ols":
-                    priority = self.ols_priority(wc)
+                    priority = self.ols_priority(wc, max_optimistic_value=max_optimistic_values[i])
 
                 elif algo == "gpi-ls":
-                    if gpi_agent is None:
-                        raise ValueError("GPI-LS requires passing a GPI agent.")
-                    gpi_expanded_set = [policy_evaluation_mo(gpi_agent, env, wc, rep=rep_eval)[3] for wc in W_corner]
                     priority = self.gpi_ls_priority(wc, gpi_expanded_set)
 
                 if self.epsilon is None or priority >= self.epsilon:
@@ -109,7 +252,7 @@ class LinearSupport:
             print("CCS:", self.ccs, "CCS size:", len(self.ccs))
         
         if gpi_agent is not None:
-            wandb.log({"linear_support/ccs_size": len(self.ccs),  "global_step": gpi_agent.global_step})
+            get_metrics_sink().log({"linear_support/ccs_size": len(self.ccs),  "global_step": gpi_agent.global_step})
 
         if len(self.queue) == 0:
             if self.verbose:
@@ -122,6 +265,26 @@ class LinearSupport:
                 print("Next weight:", next_w)
             return next_w
 
+    def gpi_corner_evaluations(self, gpi_agent: MOPolicy, env: Env, W_corner: List[np.ndarray], rep_eval: int = 1) -> List[np.ndarray]:
+        """Returns the average discounted vector return of the GPI agent for each corner weight.
+
+        Each corner weight is evaluated once, and its evaluation is reused by the priorities of all corner weights.
+
+        Args:
+            gpi_agent: Agent to evaluate
+            env: Environment to evaluate the agent in
+            W_corner: Corner weights
+            rep_eval: Number of episodes of each evaluation
+
+        Returns:
+            List of the vector returns, one per corner weight.
+        """
+        values = {}
+        for wc in W_corner:
+            if tuple(wc) not in values:
+                values[tuple(wc)] = policy_evaluation_mo(gpi_agent, env, wc, rep=rep_eval)[3]
+        return [values[tuple(wc)] for wc in W_corner]
+
     def get_weight_support(self) -> List[np.ndarray]:
         """Returns the weight support of the CCS.
 
@@ -177,6 +340,8 @@ class LinearSupport:
                 print(f"Value {value} is dominated. Discarding.")
             return [len(self.ccs)]
 
+        # added to the envelope first, so that the values it makes obsolete usually no longer touch it
+        self._envelope.add(value)
         removed_indx = self.remove_obsolete_values(value)
 
         self.ccs.append(value)
@@ -184,17 +349,19 @@ class LinearSupport:
 
         return removed_indx
 
-    def ols_priority(self, w: np.ndarray) -> float:
+    def ols_priority(self, w: np.ndarray, max_optimistic_value: Optional[float] = None) -> float:
         """Get the priority of a weight vector for OLS.
 
         Args:
             w: Weight vector
+            max_optimistic_value: The upper-bound `max_value_lp(w)`, if already computed.
 
         Returns:
             Priority of the weight vector.
         """
         max_value_ccs = self.max_scalarized_value(w)
-        max_optimistic_value = self.max_value_lp(w)
+        if max_optimistic_value is None:
+            max_optimistic_value = self.max_value_lp(w)
         priority = max_optimistic_value - max_value_ccs
         return priority
 
@@ -266,17 +433,23 @@ class LinearSupport:
             The indices of the removed values.
         """
         removed_indx = []
+        if len(self.ccs) == 0:
+            return removed_indx
+        # scalarized values of the CCS (columns) and of the new value for each visited weight (rows)
+        scalarized = _scalarize(self.visited_weights, self.ccs + [value])
+        scalarized, new_scalarized = scalarized[:, :-1], scalarized[:, -1]
+        alive = np.ones(len(self.ccs), dtype=bool)
         for i in reversed(range(len(self.ccs))):
-            weights_optimal = [
-                w
-                for w in self.visited_weights
-                if np.dot(self.ccs[i], w) == self.max_scalarized_value(w) and np.dot(value, w) < np.dot(self.ccs[i], w)
-            ]
-            if len(weights_optimal) == 0:
-                print("removed value", self.ccs[i])
+            max_scalarized = np.max(scalarized[:, alive], axis=1)
+            weights_optimal = (scalarized[:, i] == max_scalarized) & (new_scalarized < scalarized[:, i])
+            if not weights_optimal.any():
+                if self.verbose:
+                    print("removed value", self.ccs[i])
                 removed_indx.append(i)
+                alive[i] = False
                 self.ccs.pop(i)
                 self.weight_support.pop(i)
+                self._envelope.remove(i)
         return removed_indx
 
     def max_value_lp(self, w_new: np.ndarray) -> float:
@@ -288,33 +461,55 @@ class LinearSupport:
         Returns:
             Upper-bound for the maximum value of the scalarized objective.
         """
+        return self.max_values_lp([w_new])[0]
+
+    def max_values_lp(self, weights: List[np.ndarray]) -> np.ndarray:
+        """Returns the upper-bounds `max_value_lp` of several weight vectors, which share the constraints of the LP.
+
+        The bound of w is max w . v such that W v <= V, where W are the visited weights and V their maximum scalarized
+        values in the CCS. With 2 objectives, it is computed in closed form for all weights at once (see
+        `_max_value_lp_2d`); otherwise each LP is solved with HiGHS. The bound of each weight vector is cached with the
+        value vector attaining it: since the constraints only change when weights are visited or the CCS changes, the
+        bound is still optimal as long as that value vector satisfies the new constraints and none of the constraints
+        tight at it were loosened.
+
+        Args:
+            weights: Weight vectors
+
+        Returns:
+            Upper-bounds for the maximum value of the scalarized objective, inf if it is unbounded.
+        """
+        weights = np.vstack(weights).astype(np.float64)
         # No upper bound if no values in CCS
         if len(self.ccs) == 0:
-            return float("inf")
-
-        w = cp.Parameter(self.num_objectives)
-        w.value = w_new
-        v = cp.Variable(self.num_objectives)
-
-        W_ = np.vstack(self.visited_weights)
-        W = cp.Parameter(W_.shape)
-        W.value = W_
-
-        V_ = np.array([self.max_scalarized_value(weight) for weight in self.visited_weights])
-        V = cp.Parameter(V_.shape)
-        V.value = V_
-
-        # Maximum value for weight vector w
-        objective = cp.Maximize(w @ v)
-        # such that it is consistent with other optimal values for other visited weights
-        constraints = [W @ v <= V]
-        prob = cp.Problem(objective, constraints)
-        try:
-            result = prob.solve(verbose=False)
-        except SolverError:
-            print("ECOS solver error, trying another one.")
-            result = prob.solve(solver=cp.SCS, verbose=False)
-        return result
+            return np.full(len(weights), float("inf"))
+
+        W_ = np.vstack(self.visited_weights).astype(np.float64)
+        V_ = np.max(_scalarize(self.visited_weights, self.ccs), axis=1)
+        if self.num_objectives == 2 and np.all(W_ >= 0) and np.all(W_.sum(axis=1) > 0) and np.all(weights.sum(axis=1) > 0):
+            return _max_value_lp_2d(W_, V_, weights)
+
+        tol = 1e-6 * max(1.0, np.abs(V_).max())
+        results = np.empty(len(weights))
+        for i, w in enumerate(weights):
+            key = w.tobytes()
+            if key in self._lp_bounds:
+                result, v_opt, tight, V_tight = self._lp_bounds[key]
+                if np.all(W_ @ v_opt <= V_ + tol) and np.all(V_[: len(tight)][tight] <= V_tight + tol):
+                    results[i] = result
+                    continue
+
+            # Maximum value for weight vector w, such that it is consistent with other optimal values for other visited weights
+            solution = linprog(-w, A_ub=W_, b_ub=V_, bounds=(None, None), method="highs")
+            if solution.status == 3:
+                results[i] = float("inf")
+            elif solution.status == 2:
+                results[i] = -float("inf")
+            else:
+                results[i] = -solution.fun
+                tight = W_ @ solution.x >= V_ - tol
+                self._lp_bounds[key] = (results[i], solution.x, tight, V_[tight])
+        return results
 
     def compute_corner_weights(self) -> List[np.ndarray]:
         """Returns the corner weights for the current set of values.
@@ -322,55 +517,18 @@ class LinearSupport:
         See http://roijers.info/pub/thesis.pdf Definition 19.
         Obs: there is a typo in the definition of the corner weights in the thesis, the >= sign should be <=.
 
+        The vertices of the upper envelope of the CCS are updated by `add_solution` (see `_UpperEnvelope`), instead of
+        being enumerated from scratch; the envelope is only rebuilt if the CCS was modified directly.
+
         Returns:
             List of corner weights.
         """
-        A = np.vstack(self.ccs)
-        A = np.round(A, decimals=4)  # Round to avoid numerical issues
-        A = np.concatenate((A, -np.ones(A.shape[0]).reshape(-1, 1)), axis=1)
-
-        A_plus = np.ones(A.shape[1]).reshape(1, -1)
-        A_plus[0, -1] = 0
-        A = np.concatenate((A, A_plus), axis=0)
-        A_plus = -np.ones(A.shape[1]).reshape(1, -1)
-        A_plus[0, -1] = 0
-        A = np.concatenate((A, A_plus), axis=0)
-
-        for i in range(self.num_objectives):
-            A_plus = np.zeros(A.shape[1]).reshape(1, -1)
-            A_plus[0, i] = -1
-            A = np.concatenate((A, A_plus), axis=0)
-
-        b = np.zeros(len(self.ccs) + 2 + self.num_objectives)
-        b[len(self.ccs)] = 1
-        b[len(self.ccs) + 1] = -1
-
-        def compute_poly_vertices(A, b):
-            # Based on https://stackoverflow.com/questions/65343771/solve-linear-inequalities
-            b = b.reshape((b.shape[0], 1))
-            mat = cdd.Matrix(np.hstack([b, -A]), number_type="float")
-            mat.rep_type = cdd.RepType.INEQUALITY
-            P = cdd.Polyhedron(mat)
-            g = P.get_generators()
-            V = np.array(g)
-            vertices = []
-            for i in range(V.shape[0]):
-                if V[i, 0] != 1:
-                    continue
-                if i not in g.lin_set:
-                    vertices.append(V[i, 1:])
-            return vertices
-
-        vertices = compute_poly_vertices(A, b)
-        corners = []
-        for v in vertices:
-            corner_weight = v[:-1]
-            # Make sure the corner weight is positive and sum to 1
-            corner_weight = np.abs(corner_weight)
-            corner_weight /= corner_weight.sum()
-            corners.append(corner_weight)
-
-        return corners
+        ccs = np.round(np.array(self.ccs, dtype=np.float64).reshape(-1, self.num_objectives), decimals=4)
+        if not np.array_equal(self._envelope.values, ccs):
+            self._envelope = _UpperEnvelope(self.num_objectives)
+            for value in ccs:
+                self._envelope.add(value)
+        return self._envelope.corner_weights()
 
     def is_dominated(self, value: np.ndarray) -> bool:
         """Checks if the value is dominated by any of the values in the CCS.
@@ -383,10 +541,8 @@ class LinearSupport:
         """
         if len(self.ccs) == 0:
             return False
-        for w in self.visited_weights:
-            if np.dot(value, w) >= self.max_scalarized_value(w):
-                return False
-        return True
+        scalarized = _scalarize(self.visited_weights, self.ccs + [value])
+        return not np.any(scalarized[:, -1] >= np.max(scalarized[:, :-1], axis=1))
 
 
 if __name__ == "__main__":
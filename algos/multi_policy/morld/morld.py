@@ -6,7 +6,6 @@ import os
 import math
 import random
 import time
-import wandb
 from typing import Callable, List, Optional, Tuple, Union
 from typing_extensions import override
 
@@ -16,12 +15,13 @@ import torch as th
 from mo_gymnasium.wrappers import MONormalizeReward
 from torch import optim
 
-from mo_utils.evaluation import log_all_multi_policy_metrics
+from mo_utils.evaluation import EvaluationCache, log_all_multi_policy_metrics
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOAgent, MOPolicy
 from mo_utils.networks import polyak_update
 from mo_utils.pareto import ParetoArchive
 from mo_utils.scalarization import tchebicheff, weighted_sum
-from mo_utils.utils import nearest_neighbors
+from mo_utils.utils import group_rows_by_weight, nearest_neighbors
 from mo_utils.weights import equally_spaced_weights, random_weights
 from morl_generalization.generalization_evaluator import MORLGeneralizationEvaluator
 from algos.single_policy.esr.eupg import EUPG
@@ -85,6 +85,7 @@ class MORLD(MOAgent):
         offline_mode: bool = False,
         log: bool = True,
         device: Union[th.device, str] = "auto",
+        cache_evaluations: bool = False,
     ):
         """Initializes MORL/D.
 
@@ -116,6 +117,8 @@ class MORLD(MOAgent):
             offline_mode: Whether to run wandb in offline mode.
             log: For wandb logging
             device: torch device
+            cache_evaluations: whether to reuse the evaluations (ser mode) of the policies whose parameters did not change
+                since their last evaluation, see `EvaluationCache`
         """
         MOAgent.__init__(self, env, device=device, seed=seed)
         self.gamma = gamma
@@ -179,6 +182,8 @@ class MORLD(MOAgent):
         self.project_name = project_name
         self.experiment_name = experiment_name
         self.log = log
+        # results of the evaluations of the current parameters, policies which did not change are not evaluated again
+        self.eval_cache = EvaluationCache() if cache_evaluations else None
 
         self.experiment_name += f"({policy_name})"
         if shared_buffer:
@@ -290,7 +295,12 @@ class MORLD(MOAgent):
         """
         if self.evaluation_mode == "ser":
             _, _, _, discounted_reward = policy.wrapped.policy_eval(
-                eval_env, weights=policy.weights, scalarization=self.scalarization, num_episodes=num_eval_episodes_for_front, log=self.log
+                eval_env,
+                weights=policy.weights,
+                scalarization=self.scalarization,
+                num_episodes=num_eval_episodes_for_front,
+                log=self.log,
+                cache=self.eval_cache,
             )
 
         elif self.evaluation_mode == "esr":
@@ -431,31 +441,47 @@ class MORLD(MOAgent):
                     p.wrapped.update()
 
     # TODO: implement this search more optimally
-    def _select_nearest_policy(self, given_weight) -> Policy:
+    def _nearest_policy_index(self, given_weight) -> int:
         """
-        Selects the policy with weights nearest to the given weight vector.
+        Index (in the archive) of the policy with weights nearest to the given weight vector.
         """
         # Initialize variables to track the minimum distance and the selected policies
         min_distance = float('inf')
         nearest_policies = []
     
         # Iterate through each policy in the population
-        for policy in self.archive.individuals:
+        for i, policy in enumerate(self.archive.individuals):
             # Calculate the Euclidean distance between the policy's weights and the given weights
             distance = self.dist_metric(policy.weights, given_weight)
             
             # Update the minimum distance and reset the list if the current distance is smaller
             if distance < min_distance:
                 min_distance = distance
-                nearest_policies = [policy]
+                nearest_policies = [i]
             # Add the policy to the list if the current distance is equal to the minimum distance
             elif distance == min_distance:
-                nearest_policies.append(policy)
+                nearest_policies.append(i)
     
         # Randomly select one policy from the list of nearest policies (if there are m)
-        selected_policy = random.choice(nearest_policies)
-    
-        return selected_policy
+        return random.choice(nearest_policies)
+
+    def _select_nearest_policy(self, given_weight) -> Policy:
+        """
+        Selects the policy with weights nearest to the given weight vector.
+        """
+        return self.archive.individuals[self._nearest_policy_index(given_weight)]
+
+    def select_eval_policies(self, weights: np.ndarray) -> np.ndarray:
+        """Archived policy followed for each of the given weights.
+
+        The actions of an archived policy do not depend on the weight it is evaluated with, so the evaluator only needs
+        to run the rollouts of each distinct policy once (see `eval`'s `policy_indices`).
+        """
+        return np.array([self._nearest_policy_index(w) for w in weights])
+
+    def get_eval_policy(self, policy_index: int) -> Policy:
+        """Policy with the given index (see `select_eval_policies`)."""
+        return self.archive.individuals[policy_index]
 
     @th.no_grad()
     def eval(
@@ -464,29 +490,60 @@ class MORLD(MOAgent):
         w: Union[np.ndarray, th.Tensor], 
         torch_action: bool = False,
         disc_vec_return: Optional[np.ndarray] = None,
+        policy_indices: Optional[np.ndarray] = None,
         **kwargs
     ) -> Union[np.ndarray, th.Tensor]:
         """
         Evaluate the policy action for the given observation and weight vector.
         Implemented for testing generalization.
+
+        If `policy_indices` (one archive index per environment, see `select_eval_policies`) is given, the policies are
+        not looked up from w.
         """
         if isinstance(obs, np.ndarray):
             obs = th.tensor(obs).float().to(self.device)
+        if isinstance(w, th.Tensor):
+            w = w.detach().cpu().numpy()
 
-        policy = self._select_nearest_policy(w) # Select the policy with weights nearest to the given weight vector
-        if self.policy_name == "MOSAC" or self.policy_name.startswith("MOSACDiscrete"):
-            action, _, _ = policy.wrapped.actor.get_action(obs) # MOSAC Policy
-        elif self.policy_name == "EUPG":
-            action = policy.wrapped.eval(obs, disc_vec_return)
+        # w has one weight vector per environment (rows differ when several weights are evaluated in a single batch)
+        if policy_indices is not None:
+            policy_indices = np.atleast_1d(policy_indices)
+            groups = [(self.archive.individuals[i], np.flatnonzero(policy_indices == i)) for i in np.unique(policy_indices)]
         else:
-            raise NotImplementedError
-        
+            groups = [(self._select_nearest_policy(weight), rows) for weight, rows in group_rows_by_weight(w)]
+
+        if len(groups) == 1:
+            action = self.__policy_action(groups[0][0], obs, disc_vec_return) # policy with weights nearest to the given weight vector
+        else:
+            action = None
+            for policy, rows in groups:
+                group_action = self.__policy_action(
+                    policy, obs[th.as_tensor(rows)], disc_vec_return[rows] if disc_vec_return is not None else None
+                )
+                if isinstance(group_action, th.Tensor):
+                    group_action = group_action.detach().cpu().numpy()
+                group_action = np.asarray(group_action)
+                if action is None:
+                    action = np.empty((len(obs),) + group_action.shape[1:], dtype=group_action.dtype)
+                action[rows] = group_action
+            if torch_action:
+                action = th.as_tensor(action).to(self.device)
 
         if not torch_action and isinstance(action, th.Tensor):
             action = action.detach().cpu().numpy()
 
         return action
     
+    def __policy_action(self, policy: Policy, obs: th.Tensor, disc_vec_return: Optional[np.ndarray]):
+        """Action of a single policy of the population for a batch of observations."""
+        if self.policy_name == "MOSAC" or self.policy_name.startswith("MOSACDiscrete"):
+            action, _, _ = policy.wrapped.actor.get_action(obs) # MOSAC Policy
+        elif self.policy_name == "EUPG":
+            action = policy.wrapped.eval(obs, disc_vec_return)
+        else:
+            raise NotImplementedError
+        return action
+
     def save(self, save_dir="weights/", filename=None, save_replay_buffer=True):
         """Save the agent's weights and replay buffer."""
         if not os.path.isdir(save_dir):
@@ -584,7 +641,7 @@ class MORLD(MOAgent):
             self.__share(policy)
             self.__adapt_ref_point()
 
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "metrics/archive_individuals": len(self.archive.individuals),
                     "global_step": self.global_step,
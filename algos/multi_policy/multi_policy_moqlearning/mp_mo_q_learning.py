@@ -151,15 +151,38 @@ class MPMOQLearning(MOAgent):
         self, 
         obs: np.ndarray, 
         w: Optional[np.ndarray] = None,
+        policy_indices: Optional[np.ndarray] = None,
         **kwargs,
     ) -> int:
-        """If use_gpi is True, return the action given by the GPI policy. Otherwise, chooses the best policy for w and follows it."""
+        """If use_gpi is True, return the action given by the GPI policy. Otherwise, chooses the best policy for w and follows it.
+
+        If `policy_indices` (see `select_eval_policies`) is given, follows these policies instead, one per row of obs.
+        """
         if self.use_gpi_policy:
             return self._gpi_action(obs, w)
+        elif policy_indices is not None:
+            if np.ndim(policy_indices) == 0:
+                return self.policies[policy_indices].eval(obs, w)
+            return np.array([self.policies[i].eval(o, w) for i, o in zip(policy_indices, obs)])
         else:
             best_policy = np.argmax([np.dot(w, v) for v in self.linear_support.ccs])
             return self.policies[best_policy].eval(obs, w)
 
+    def select_eval_policies(self, weights: np.ndarray) -> Optional[np.ndarray]:
+        """Policy followed for each of the given weights, None if the GPI policy is used (its actions depend on the weight).
+
+        Each policy acts greedily w.r.t. its own weight, so the evaluator only needs to run the rollouts of each distinct
+        policy once (see `eval`'s `policy_indices`).
+        """
+        if self.use_gpi_policy:
+            return None
+        ccs = np.array(self.linear_support.ccs)
+        return np.argmax(np.asarray(weights) @ ccs.T, axis=1)
+
+    def get_eval_policy(self, policy_index: int) -> MOQLearning:
+        """Policy with the given index (see `select_eval_policies`)."""
+        return self.policies[policy_index]
+
     def delete_policies(self, delete_indx: List[int]):
         """Delete the policies with the given indices."""
         for i in sorted(delete_indx, reverse=True):
@@ -4,9 +4,9 @@ from typing import Callable, List, Optional
 
 import gymnasium as gym
 import numpy as np
-import wandb
 
 from mo_utils.evaluation import log_all_multi_policy_metrics
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOAgent
 from mo_utils.pareto import get_non_dominated
 from mo_utils.performance_indicators import hypervolume
@@ -259,7 +259,7 @@ class PQL(MOAgent):
                 state = next_state
 
                 if self.log and self.global_step % log_every == 0:
-                    wandb.log({"global_step": self.global_step})
+                    get_metrics_sink().log({"global_step": self.global_step})
                     pf = self._eval_all_policies(eval_env)
                     log_all_multi_policy_metrics(
                         current_front=pf,
@@ -10,9 +10,9 @@ import numpy as np
 import torch as th
 import torch.nn as nn
 import torch.nn.functional as F
-import wandb
 
 from mo_utils.evaluation import log_all_multi_policy_metrics
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOAgent, MOPolicy
 from mo_utils.pareto import get_non_dominated_inds
 from mo_utils.performance_indicators import hypervolume
@@ -519,7 +519,7 @@ class PCN(MOAgent, MOPolicy):
             if self.log:
                 hv = hypervolume(ref_point, leaves_r)
                 hv_est = hv
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "train/hypervolume": hv_est,
                         "train/loss": np.mean(loss),
@@ -527,7 +527,7 @@ class PCN(MOAgent, MOPolicy):
                     },
                 )
                 if not self.continuous_action:
-                    wandb.log(
+                    get_metrics_sink().log(
                         {
                             "train/entropy": np.mean(entropy),
                             "global_step": self.global_step,
@@ -545,7 +545,7 @@ class PCN(MOAgent, MOPolicy):
 
             total_episodes += num_step_episodes
             if self.log:
-                wandb.log(
+                get_metrics_sink().log(
                     {
                         "train/episode": total_episodes,
                         "train/horizon_desired": desired_horizon,
@@ -555,7 +555,7 @@ class PCN(MOAgent, MOPolicy):
                 )
 
                 for i in range(self.reward_dim):
-                    wandb.log(
+                    get_metrics_sink().log(
                         {
                             f"train/desired_return_{i}": desired_return[i],
                             f"train/mean_return_{i}": np.mean(np.array(returns)[:, i]),
@@ -590,5 +590,7 @@ class PCN(MOAgent, MOPolicy):
                 
                 next_eval_step += eval_mo_freq
 
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
@@ -6,22 +6,27 @@ Some code in this file has been adapted from the original code provided by the a
 """
 import time
 import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from copy import deepcopy
 from typing import List, Optional, Tuple, Union
 from typing_extensions import override
 from itertools import product
 
+import cloudpickle
 import gymnasium as gym
 import mo_gymnasium as mo_gym
 import numpy as np
 import torch as th
-import wandb
 from scipy.optimize import least_squares
 
 from mo_utils.evaluation import log_all_multi_policy_metrics
+from mo_utils.metrics_sink import MetricsSink, RecordingBackend, get_metrics_sink, set_metrics_sink
+from mo_utils.hypervolume import hypervolume_with_candidates
 from mo_utils.morl_algorithm import MOAgent
 from mo_utils.pareto import ParetoArchive
-from mo_utils.performance_indicators import hypervolume, sparsity
+from mo_utils.performance_indicators import sparsity
+from mo_utils.utils import group_rows_by_weight
 from mo_utils.weights import equally_spaced_weights
 from algos.single_policy.ser.mo_ppo import MOPPO, MOPPONet, make_env
 from morl_generalization.generalization_evaluator import MORLGeneralizationEvaluator
@@ -65,6 +70,11 @@ class PerformancePredictor:
         self.f_scale = f_scale
         self.sigma = sigma
 
+        # Fitted models: (evaluation, objective) -> parameters fitted on the current samples, and on the previous ones
+        # (used as initial guesses when the same evaluation is predicted again after new samples were added)
+        self._fitted_params = {}
+        self._previous_params = {}
+
     def add(self, weight: np.ndarray, eval_before_pg: np.ndarray, eval_after_pg: np.ndarray) -> None:
         """Add a new sample to the performance predictor.
 
@@ -79,26 +89,31 @@ class PerformancePredictor:
         self.previous_performance.append(eval_before_pg)
         self.next_performance.append(eval_after_pg)
         self.used_weight.append(weight)
+        # the fitted models are outdated, they are only kept to warm-start the next fits
+        if self._fitted_params:
+            self._previous_params = self._fitted_params
+            self._fitted_params = {}
 
-    def __build_model_and_predict(
+    def __fit_model(
         self,
         training_weights,
         training_deltas,
         training_next_perfs,
         current_dim,
         current_eval: np.ndarray,
-        weight_candidate: np.ndarray,
         sigma: float,
-    ):
-        """Uses the hyperbolic model on the training data: weights, deltas and next_perfs to predict the next delta given the current evaluation and weight.
+        initial_guess: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Fits the hyperbolic model on the training data: weights, deltas and next_perfs, weighted by their proximity to the current evaluation.
+
+        The model is fitted from the default initial guess and, if given, from initial_guess (e.g. the parameters fitted
+        on the previous samples), keeping the fit with the lowest cost: a warm start alone may stop in a flat region of
+        the model (e.g. a saturated sigmoid) that the default initial guess avoids.
 
         Returns:
-             The expected delta from current_eval by using weight_candidate.
+             The parameters (A, a, b, c) of the model predicting the delta of the current_dim objective from the weight of that objective.
         """
 
-        def __f(x, A, a, b, c):
-            return A * (np.exp(a * (x - b)) - 1) / (np.exp(a * (x - b)) + 1) + c
-
         def __hyperbolic_model(params, x, y):
             # f = A * (exp(a(x - b)) - 1) / (exp(a(x - b)) + 1) + c
             return (
@@ -132,23 +147,31 @@ class PerformancePredictor:
             coef = np.exp(-((dist / sigma) ** 2) / 2.0)
             w.append(coef)
 
-        train_x = np.array(train_x)
-        train_y = np.array(train_y)
+        # float64 data, as exp overflows with float32 weights (see generate_weights) for large a * (x - b)
+        train_x = np.array(train_x, dtype=np.float64)
+        train_y = np.array(train_y, dtype=np.float64)
         w = np.array(w)
 
         A_upperbound = np.clip(np.max(train_y) - np.min(train_y), 1.0, 500.0)
-        initial_guess = np.ones(4)
-        res_robust = least_squares(
-            __hyperbolic_model,
-            initial_guess,
-            loss="soft_l1",
-            f_scale=self.f_scale,
-            args=(train_x, train_y),
-            jac=__jacobian,
-            bounds=([0, 0.1, -5.0, -500.0], [A_upperbound, 20.0, 5.0, 500.0]),
-        )
+        lower_bounds, upper_bounds = [0, 0.1, -5.0, -500.0], [A_upperbound, 20.0, 5.0, 500.0]
+        initial_guesses = [np.ones(4)]
+        if initial_guess is not None:
+            initial_guesses.append(np.clip(initial_guess, lower_bounds, upper_bounds))
+        fits = [
+            least_squares(
+                __hyperbolic_model,
+                guess,
+                loss="soft_l1",
+                f_scale=self.f_scale,
+                args=(train_x, train_y),
+                jac=__jacobian,
+                bounds=(lower_bounds, upper_bounds),
+            )
+            for guess in initial_guesses
+        ]
+        res_robust = min(fits, key=lambda res: res.cost)
 
-        return __f(weight_candidate[current_dim], *res_robust.x)
+        return res_robust.x
 
     def predict_next_evaluation(self, weight_candidate: np.ndarray, policy_eval: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """Predict the next evaluation of the policy.
@@ -163,6 +186,38 @@ class PerformancePredictor:
         Returns:
             the delta prediction, along with the predicted next evaluations
         """
+        delta_predictions, predicted_evals = self.predict_next_evaluations(np.asarray(weight_candidate)[None], policy_eval)
+        return delta_predictions[0], predicted_evals[0]
+
+    def predict_next_evaluations(self, weight_candidates: np.ndarray, policy_eval: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict the next evaluations of the policy for several weight candidates.
+
+        The neighborhood of policy_eval and the prediction model of each objective do not depend on the weight, so the
+        models are fitted once and evaluated on all the weight candidates. The fitted models of each evaluation are
+        reused until new samples are added, then refitted, also starting from their previous parameters.
+
+        Args:
+            weight_candidates: weight candidates, of shape (num_weights, reward_dim)
+            policy_eval: current evaluation of the policy
+
+        Returns:
+            the delta predictions, along with the predicted next evaluations, of shape (num_weights, reward_dim)
+        """
+        # float64 weights, as float32 weights (see generate_weights) would make the predictions float32
+        weight_candidates = np.atleast_2d(np.asarray(weight_candidates, dtype=np.float64))
+        key = np.asarray(policy_eval, dtype=np.float64).tobytes()
+        params = [self._fitted_params.get((key, obj_num)) for obj_num in range(weight_candidates.shape[1])]
+        if any(p is None for p in params):
+            params = self.__fit_models(policy_eval, key, weight_candidates.shape[1])
+
+        def __f(x, A, a, b, c):
+            return A * (np.exp(a * (x - b)) - 1) / (np.exp(a * (x - b)) + 1) + c
+
+        delta_predictions = np.stack([__f(weight_candidates[:, obj_num], *p) for obj_num, p in enumerate(params)], axis=1)
+        return delta_predictions, delta_predictions + policy_eval
+
+    def __fit_models(self, policy_eval: np.ndarray, key: bytes, reward_dim: int) -> List[np.ndarray]:
+        """Fits the prediction model of each objective on the neighborhood of policy_eval, and caches their parameters."""
         neighbor_weights = []
         neighbor_deltas = []
         neighbor_next_perf = []
@@ -188,21 +243,22 @@ class PerformancePredictor:
                     neighbor_deltas.append(next_perf - previous_perf)
                     neighbor_next_perf.append(next_perf)
 
-        # constructing a prediction model for each objective dimension, and using it to construct the delta predictions
-        delta_predictions = [
-            self.__build_model_and_predict(
-                training_weights=neighbor_weights,
-                training_deltas=neighbor_deltas,
-                training_next_perfs=neighbor_next_perf,
-                current_dim=obj_num,
-                current_eval=policy_eval,
-                weight_candidate=weight_candidate,
-                sigma=current_sigma,
+        # constructing a prediction model for each objective dimension
+        params = []
+        for obj_num in range(reward_dim):
+            params.append(
+                self.__fit_model(
+                    training_weights=neighbor_weights,
+                    training_deltas=neighbor_deltas,
+                    training_next_perfs=neighbor_next_perf,
+                    current_dim=obj_num,
+                    current_eval=policy_eval,
+                    sigma=current_sigma,
+                    initial_guess=self._previous_params.get((key, obj_num)),
+                )
             )
-            for obj_num in range(weight_candidate.size)
-        ]
-        delta_predictions = np.array(delta_predictions)
-        return delta_predictions, delta_predictions + policy_eval
+            self._fitted_params[(key, obj_num)] = params[-1]
+        return params
 
 
 def generate_weights(delta_weight: float, dimensions: int = 2) -> np.ndarray:
@@ -227,6 +283,98 @@ def generate_weights(delta_weight: float, dimensions: int = 2) -> np.ndarray:
     return valid_weight_vectors
 
 
+def _make_vector_env(env_id: str, num_envs: int, seed: Optional[int], run_name: str, gamma: float, generalization_hyperparams: Optional[dict]):
+    """Vectorized training environments of the population."""
+    if seed is not None:
+        envs = [make_env(env_id, seed + i, i, run_name, gamma, generalization_hyperparams) for i in range(num_envs)]
+    else:
+        envs = [make_env(env_id, i, i, run_name, gamma, generalization_hyperparams) for i in range(num_envs)]
+    return mo_gym.wrappers.vector.MOSyncVectorEnv(envs)
+
+
+def _get_normalization_state(envs: gym.vector.SyncVectorEnv) -> list:
+    """Running statistics of the observation and reward normalization wrappers of each sub-environment."""
+    states = []
+    for env in envs.envs:
+        state = {}
+        while isinstance(env, gym.Wrapper):
+            if isinstance(env, gym.wrappers.NormalizeObservation):
+                state["obs_rms"] = deepcopy(env.obs_rms)
+            elif isinstance(env, mo_gym.wrappers.MONormalizeReward):
+                state[f"return_rms_{env.idx}"] = deepcopy(env.return_rms)
+            env = env.env
+        states.append(state)
+    return states
+
+
+def _set_normalization_state(envs: gym.vector.SyncVectorEnv, states: list):
+    """Restores statistics returned by `_get_normalization_state` in the normalization wrappers."""
+    for env, state in zip(envs.envs, states):
+        while isinstance(env, gym.Wrapper):
+            if isinstance(env, gym.wrappers.NormalizeObservation):
+                env.obs_rms = deepcopy(state["obs_rms"])
+            elif isinstance(env, mo_gym.wrappers.MONormalizeReward):
+                env.return_rms = deepcopy(state[f"return_rms_{env.idx}"])
+            env = env.env
+
+
+# environments, agents (by population slot), normalization statistics (by population slot, and before any training) and
+# metrics of the population training processes
+_population_worker = None
+
+
+def _init_population_worker(
+    env_id: str,
+    num_envs: int,
+    run_name: str,
+    generalization_hyperparams: Optional[dict],
+    network_args: tuple,
+    moppo_kwargs: dict,
+    worker: int,
+):
+    global _population_worker
+    from envs.register_envs import register_envs
+
+    register_envs()
+    if moppo_kwargs["seed"] is not None:
+        th.manual_seed(moppo_kwargs["seed"] + worker)
+    # the training logs are sent back to the main process with the trained parameters
+    recorder = RecordingBackend()
+    set_metrics_sink(MetricsSink(recorder))
+    env = _make_vector_env(env_id, num_envs, moppo_kwargs["seed"], run_name, moppo_kwargs["gamma"], generalization_hyperparams)
+    _population_worker = (env, {}, {}, _get_normalization_state(env), network_args, moppo_kwargs, recorder)
+
+
+def _train_population_shard(payload: bytes):
+    """Trains agents of the population for an iteration. An agent is (re)created when its parameters and optimizer state are sent.
+
+    The agents of a worker share its environments, but each agent is trained with its own normalization statistics, which
+    are swapped into the environments before it trains and sent back with its parameters.
+    """
+    env, agents, normalization, initial_normalization, network_args, moppo_kwargs, recorder = _population_worker
+    tasks, start_time, iteration, max_iterations = cloudpickle.loads(payload)
+    results = []
+    for i, state, weights, global_step in tasks:
+        if state is not None:
+            agents[i] = MOPPO(i, MOPPONet(*network_args).to(moppo_kwargs["device"]), weights, env, **moppo_kwargs)
+            agents[i].networks.load_state_dict(state["networks"])
+            agents[i].optimizer.load_state_dict(state["optimizer"])
+            # agents which were never trained start with fresh statistics
+            normalization[i] = state["normalization"] if state["normalization"] is not None else initial_normalization
+        agent = agents[i]
+        agent.change_weights(weights)
+        agent.global_step = global_step
+        _set_normalization_state(env, normalization[i])
+        agent.train(start_time, iteration, max_iterations)
+        normalization[i] = _get_normalization_state(env)
+        networks = {key: value.cpu() for key, value in agent.networks.state_dict().items()}
+        results.append(
+            (i, {"networks": networks, "optimizer": agent.optimizer.state_dict(), "normalization": normalization[i]}, agent.global_step)
+        )
+    get_metrics_sink().flush()
+    return results, recorder.pop_records()
+
+
 class PerformanceBuffer2d:
     """Stores the population. Divides the objective space in to n bins of size max_size.
 
@@ -407,6 +555,7 @@ class PGMORL(MOAgent):
         gae: bool = True,
         gae_lambda: float = 0.95,
         generalization_hyperparams: Optional[dict] = None,
+        num_workers: int = 0,
         device: Union[th.device, str] = "auto",
     ):
         """Initializes the PGMORL agent.
@@ -451,6 +600,8 @@ class PGMORL(MOAgent):
             gae: whether to use generalized advantage estimation
             gae_lambda: lambda parameter for GAE
             generalization_hyperparams: generalization arguments
+            num_workers: number of processes training the population in parallel, each with its own environments and a
+                shard of the agents (0 trains the agents in turn in this process)
             device: device on which the code should run
         """
         super().__init__(env, device=device, seed=seed)
@@ -511,11 +662,14 @@ class PGMORL(MOAgent):
         self.gae = gae
 
         # env setup
-        if self.seed is not None:
-            envs = [make_env(env_id, self.seed + i, i, experiment_name, self.gamma, generalization_hyperparams) for i in range(self.num_envs)]
-        else:
-            envs = [make_env(env_id, i, i, experiment_name, self.gamma, generalization_hyperparams) for i in range(self.num_envs)]
-        self.env = mo_gym.wrappers.vector.MOSyncVectorEnv(envs)
+        self.experiment_name = experiment_name
+        self.generalization_hyperparams = generalization_hyperparams
+        self.env = _make_vector_env(env_id, self.num_envs, self.seed, experiment_name, self.gamma, generalization_hyperparams)
+
+        # Parallel training of the population
+        self.num_workers = min(num_workers, self.pop_size)
+        self._train_pools: Optional[List[ProcessPoolExecutor]] = None
+        self._worker_agents = [None] * self.pop_size  # agent whose parameters the worker of each slot trains
 
         # Logging
         self.log = log
@@ -536,34 +690,33 @@ class PGMORL(MOAgent):
         print(f"Warmup phase - sampled weights: {weights}")
 
         self.agents = [
-            MOPPO(
-                i,
-                self.networks[i],
-                weights[i],
-                self.env,
-                log=self.log,
-                gamma=self.gamma,
-                device=self.device,
-                seed=self.seed,
-                steps_per_iteration=self.steps_per_iteration,
-                num_minibatches=self.num_minibatches,
-                update_epochs=self.update_epochs,
-                learning_rate=self.learning_rate,
-                anneal_lr=self.anneal_lr,
-                clip_coef=self.clip_coef,
-                ent_coef=self.ent_coef,
-                vf_coef=self.vf_coef,
-                clip_vloss=self.clip_vloss,
-                max_grad_norm=self.max_grad_norm,
-                norm_adv=self.norm_adv,
-                target_kl=self.target_kl,
-                gae=self.gae,
-                gae_lambda=self.gae_lambda,
-                rng=self.np_random,
-            )
+            MOPPO(i, self.networks[i], weights[i], self.env, rng=self.np_random, **self._moppo_kwargs())
             for i in range(self.pop_size)
         ]
 
+    def _moppo_kwargs(self) -> dict:
+        """Hyperparameters of the MOPPO agents of the population."""
+        return dict(
+            log=self.log,
+            gamma=self.gamma,
+            device=self.device,
+            seed=self.seed,
+            steps_per_iteration=self.steps_per_iteration,
+            num_minibatches=self.num_minibatches,
+            update_epochs=self.update_epochs,
+            learning_rate=self.learning_rate,
+            anneal_lr=self.anneal_lr,
+            clip_coef=self.clip_coef,
+            ent_coef=self.ent_coef,
+            vf_coef=self.vf_coef,
+            clip_vloss=self.clip_vloss,
+            max_grad_norm=self.max_grad_norm,
+            norm_adv=self.norm_adv,
+            target_kl=self.target_kl,
+            gae=self.gae,
+            gae_lambda=self.gae_lambda,
+        )
+
     @override
     def get_config(self) -> dict:
         return {
@@ -597,12 +750,78 @@ class PGMORL(MOAgent):
             "clip_vloss": self.clip_vloss,
             "gae": self.gae,
             "gae_lambda": self.gae_lambda,
+            "num_workers": self.num_workers,
         }
 
     def __train_all_agents(self, iteration: int, max_iterations: int):
+        if self.num_workers > 0:
+            self.__train_all_agents_in_parallel(iteration, max_iterations)
+            return
         for i, agent in enumerate(self.agents):
             agent.train(self.start_time, iteration, max_iterations)
 
+    def __train_all_agents_in_parallel(self, iteration: int, max_iterations: int):
+        """Trains the agents in the worker processes, agent i being trained by worker i % num_workers.
+
+        The workers keep the agents between iterations and send back their parameters, optimizer state and normalization
+        statistics, so only the clones made by the task selection are sent to them, and they resume the optimization (and
+        the observation and reward normalization) of the agents they copy, whichever worker trained those.
+        The evolutionary selection stays in this process.
+        """
+        if self._train_pools is None:
+            init_args = (
+                self.env_id,
+                self.num_envs,
+                self.experiment_name,
+                self.generalization_hyperparams,
+                (self.observation_shape, self.action_space.shape, self.reward_dim, self.net_arch),
+                self._moppo_kwargs(),
+            )
+            # one process per pool, so that each shard of agents is always trained by the same process
+            self._train_pools = [
+                ProcessPoolExecutor(
+                    max_workers=1,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_population_worker,
+                    initargs=init_args + (worker,),
+                )
+                for worker in range(self.num_workers)
+            ]
+
+        futures = []
+        for worker, pool in enumerate(self._train_pools):
+            tasks = []
+            for i in range(worker, self.pop_size, self.num_workers):
+                agent = self.agents[i]
+                state = None
+                if self._worker_agents[i] is not agent:
+                    state = {
+                        "networks": agent.networks.state_dict(),
+                        "optimizer": agent.optimizer.state_dict(),
+                        "normalization": agent.normalization_state,
+                    }
+                tasks.append((i, state, agent.weights.detach().cpu().numpy(), agent.global_step))
+                self._worker_agents[i] = agent
+            payload = cloudpickle.dumps((tasks, self.start_time, iteration, max_iterations))
+            futures.append(pool.submit(_train_population_shard, payload))
+
+        for future in futures:
+            results, records = future.result()
+            for i, state, global_step in results:
+                self.agents[i].networks.load_state_dict(state["networks"])
+                self.agents[i].optimizer.load_state_dict(state["optimizer"])
+                self.agents[i].normalization_state = state["normalization"]
+                self.agents[i].global_step = global_step
+            for record in records:
+                get_metrics_sink().log(record)
+
+    def _close_train_pools(self):
+        if self._train_pools is not None:
+            for pool in self._train_pools:
+                pool.shutdown()
+            self._train_pools = None
+            self._worker_agents = [None] * self.pop_size
+
     def __eval_all_agents(
         self,
         eval_env: gym.Env,
@@ -639,68 +858,58 @@ class PGMORL(MOAgent):
             )
 
     def __task_weight_selection(self, ref_point: np.ndarray):
-        """Chooses agents and weights to train at the next iteration based on the current population and prediction model."""
+        """Chooses agents and weights to train at the next iteration based on the current population and prediction model.
+
+        The next evaluation of every (candidate, weight) pair is predicted once, then each worker gets the pair with the
+        best hypervolume - sparsity of the estimated front, scored for all the pairs at once.
+        """
         candidate_weights = generate_weights(self.delta_weight / 2.0, self.reward_dim)  # Generates more weights than agents
         self.np_random.shuffle(candidate_weights)  # Randomize
 
         current_front = deepcopy(self.archive.evaluations)
         population = self.population.individuals
         population_eval = self.population.evaluations
-        selected_tasks = []
+
+        # Prediction of improvements of each (candidate, weight) pair, in the order of the candidates then of the weights
+        predicted_evals = np.concatenate(
+            [self.predictor.predict_next_evaluations(candidate_weights, candidate_eval)[1] for candidate_eval in population_eval]
+        )
+        pair_candidates = np.repeat(np.arange(len(population)), len(candidate_weights))
+        pair_evals = np.asarray(population_eval)[pair_candidates]
+        pair_weights = np.tile(candidate_weights, (len(population), 1))
+        available = np.ones(len(pair_candidates), dtype=bool)  # pairs not selected yet
+
         # For each worker, select a (policy, weight) tuple
         for i in range(len(self.agents)):
-            max_improv = float("-inf")
-            best_candidate = None
-            best_eval = None
-            best_predicted_eval = None
-
-            # In each selection, look at every possible candidate in the current population and every possible weight generated
-            for candidate, last_candidate_eval in zip(population, population_eval):
-                # Pruning the already selected (candidate, weight) pairs
-                candidate_tuples = [
-                    (last_candidate_eval, weight)
-                    for weight in candidate_weights
-                    if (tuple(last_candidate_eval), tuple(weight)) not in selected_tasks
-                ]
-
-                # Prediction of improvements of each pair
-                delta_predictions, predicted_evals = map(
-                    list,
-                    zip(
-                        *[
-                            self.predictor.predict_next_evaluation(weight, candidate_eval)
-                            for candidate_eval, weight in candidate_tuples
-                        ]
-                    ),
-                )
-                # optimization criterion is a hypervolume - sparsity
-                hypervolumes = [hypervolume(ref_point, current_front + [predicted_eval]) for predicted_eval in predicted_evals]
-                sparsity_values = [sparsity(current_front + [predicted_eval]) for predicted_eval in predicted_evals]
-                mixture_metrics = [hv + self.sparsity_coef * sparsity_val for hv, sparsity_val in zip(hypervolumes, sparsity_values)]
-                
-                wandb.log(
-                    {
-                        "metrics/hypervolume_improvement": np.mean(hypervolumes),
-                        "metrics/sparsity_improvement": np.mean(sparsity_values),
-                        "metrics/mixture_improvement": np.mean(mixture_metrics),
-                        "global_step": self.global_step
-                    },
-                )
-                # Best among all the weights for the current candidate
-                current_candidate_weight = np.argmax(np.array(mixture_metrics))
-                current_candidate_improv = np.max(np.array(mixture_metrics))
-
-                # Best among all candidates, weight tuple update
-                if max_improv < current_candidate_improv:
-                    max_improv = current_candidate_improv
-                    best_candidate = (
-                        candidate,
-                        candidate_tuples[current_candidate_weight][1],
-                    )
-                    best_eval = last_candidate_eval
-                    best_predicted_eval = predicted_evals[current_candidate_weight]
+            pairs = np.flatnonzero(available)
+            # optimization criterion is a hypervolume - sparsity
+            hypervolumes = hypervolume_with_candidates(ref_point, current_front, predicted_evals[pairs])
+            extended_fronts = np.concatenate(
+                (
+                    np.broadcast_to(np.reshape(current_front, (-1, self.reward_dim)), (len(pairs), len(current_front), self.reward_dim)),
+                    predicted_evals[pairs, None],
+                ),
+                axis=1,
+            )
+            sparsity_values = sparsity(extended_fronts)
+            mixture_metrics = hypervolumes + self.sparsity_coef * sparsity_values
 
-            selected_tasks.append((tuple(best_eval), tuple(best_candidate[1])))
+            get_metrics_sink().log(
+                {
+                    "metrics/hypervolume_improvement": np.mean(hypervolumes),
+                    "metrics/sparsity_improvement": np.mean(sparsity_values),
+                    "metrics/mixture_improvement": np.mean(mixture_metrics),
+                    "global_step": self.global_step
+                },
+            )
+            # Best (candidate, weight) pair, the first one in case of ties
+            best_pair = pairs[np.argmax(mixture_metrics)]
+            best_candidate = (population[pair_candidates[best_pair]], pair_weights[best_pair])
+            best_eval = pair_evals[best_pair]
+            best_predicted_eval = predicted_evals[best_pair]
+
+            # Pruning the selected (candidate, weight) pair, along with the candidates with the same evaluation
+            available &= ~(np.all(pair_evals == best_eval, axis=1) & np.all(pair_weights == best_candidate[1], axis=1))
             # Append current estimate to the estimated front (to compute the next predictions)
             current_front.append(best_predicted_eval)
 
@@ -716,31 +925,46 @@ class PGMORL(MOAgent):
                 f"current eval: {best_eval} - estimated next: {best_predicted_eval} - deltas {(best_predicted_eval - best_eval)}"
             )
 
-    def _select_nearest_policy(self, given_weight) -> MOPPO:
+    def _nearest_policy_index(self, given_weight) -> int:
         """
-        Selects the policy with weights nearest to the given weight vector.
+        Index (in the archive) of the policy with weights nearest to the given weight vector.
         """
         # Initialize variables to track the minimum distance and the selected policy
         min_distance = float('inf')
-        selected_policy = None
         nearest_policies = []
 
         # Iterate through each policy in the population
-        for policy in self.archive.individuals:
+        for i, policy in enumerate(self.archive.individuals):
             # Calculate the Euclidean distance between the policy's weights and the given weights
             distance = np.sum(np.square(policy.weights.detach().cpu().numpy() - given_weight))
             
             # Update the minimum distance and reset the list if the current distance is smaller
             if distance < min_distance:
                 min_distance = distance
-                nearest_policies = [policy]
+                nearest_policies = [i]
             # Add the policy to the list if the current distance is equal to the minimum distance
             elif distance == min_distance:
-                nearest_policies.append(policy)
+                nearest_policies.append(i)
+
+        return random.choice(nearest_policies)
+
+    def _select_nearest_policy(self, given_weight) -> MOPPO:
+        """
+        Selects the policy with weights nearest to the given weight vector.
+        """
+        return self.archive.individuals[self._nearest_policy_index(given_weight)]
 
-        selected_policy = random.choice(nearest_policies)
+    def select_eval_policies(self, weights: np.ndarray) -> np.ndarray:
+        """Archived policy followed for each of the given weights.
+
+        The actions of an archived MOPPO do not depend on the weight it is evaluated with, so the evaluator only needs
+        to run the rollouts of each distinct policy once (see `eval`'s `policy_indices`).
+        """
+        return np.array([self._nearest_policy_index(w) for w in weights])
 
-        return selected_policy
+    def get_eval_policy(self, policy_index: int) -> MOPPO:
+        """Policy with the given index (see `select_eval_policies`)."""
+        return self.archive.individuals[policy_index]
 
     @th.no_grad()
     def eval(
@@ -749,18 +973,39 @@ class PGMORL(MOAgent):
         w: Union[np.ndarray, th.Tensor], 
         torch_action: bool = False,
         num_envs: int = 1,
+        policy_indices: Optional[np.ndarray] = None,
         **kwargs
     ) -> Union[np.ndarray, th.Tensor]:
         """
         Evaluate the policy action for the given observation and weight vector.
         Implemented for testing generalization.
+
+        If `policy_indices` (one archive index per environment, see `select_eval_policies`) is given, the policies are
+        not looked up from w.
         """
         if isinstance(obs, np.ndarray):
             obs = th.tensor(obs).float().to(self.device)
+        if isinstance(w, th.Tensor):
+            w = w.detach().cpu().numpy()
+
+        # w has one weight vector per environment (rows differ when several weights are evaluated in a single batch)
+        if policy_indices is not None:
+            policy_indices = np.atleast_1d(policy_indices)
+            groups = [(self.archive.individuals[i], np.flatnonzero(policy_indices == i)) for i in np.unique(policy_indices)]
+        else:
+            groups = [(self._select_nearest_policy(weight), rows) for weight, rows in group_rows_by_weight(w)]
 
-        # w is tiled to match the number of environments
-        policy = self._select_nearest_policy(w[0]) # Select the MOPPO with weights nearest to the given weight vector
-        action = policy.eval(obs, w[0], num_envs=num_envs)
+        w = np.atleast_2d(w)
+        if len(groups) == 1:
+            policy, rows = groups[0] # MOPPO with weights nearest to the given weight vector
+            action = policy.eval(obs, w[rows[0]], num_envs=num_envs)
+        else:
+            action = None
+            for policy, rows in groups:
+                group_action = policy.eval(obs[th.as_tensor(rows)], w[rows[0]], num_envs=len(rows))
+                if action is None:
+                    action = np.empty((len(w),) + group_action.shape[1:], dtype=group_action.dtype)
+                action[rows] = group_action
 
         if not torch_action and isinstance(action, th.Tensor):
             action = action.detach().cpu().numpy()
@@ -809,7 +1054,7 @@ class PGMORL(MOAgent):
         for i in range(1, self.warmup_iterations + 1):
             print(f"Warmup iteration #{iteration}")
             if self.log:
-                wandb.log({"charts/warmup_iterations": i, "global_step": self.global_step})
+                get_metrics_sink().log({"charts/warmup_iterations": i, "global_step": self.global_step})
             self.__train_all_agents(iteration=iteration, max_iterations=max_iterations)
             iteration += 1
             self.global_step += self.steps_per_iteration * self.num_envs
@@ -835,7 +1080,7 @@ class PGMORL(MOAgent):
             self.__task_weight_selection(ref_point=ref_point)
             print(f"Evolutionary generation #{evolutionary_generation}")
             if self.log:
-                wandb.log(
+                get_metrics_sink().log(
                     {"charts/evolutionary_generation": evolutionary_generation, "global_step": self.global_step},
                 )
 
@@ -843,7 +1088,7 @@ class PGMORL(MOAgent):
                 # Run training of every agent for evolutionary iterations.
                 if self.log:
                     print(f"Evolutionary iteration #{iteration - self.warmup_iterations}")
-                    wandb.log(
+                    get_metrics_sink().log(
                         {
                             "charts/evolutionary_iterations": iteration - self.warmup_iterations,
                             "global_step": self.global_step,
@@ -868,7 +1113,7 @@ class PGMORL(MOAgent):
                 log=(self.log and not test_generalization),
             )
 
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     "metrics/archive_individuals": len(self.archive.individuals),
                     "global_step": self.global_step,
@@ -876,6 +1121,9 @@ class PGMORL(MOAgent):
             )
 
         print("Done training!")
+        self._close_train_pools()
         self.env.close()
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
@@ -10,11 +10,11 @@ import numpy as np
 import torch as th
 import torch.nn as nn
 import torch.optim as optim
-import wandb
 from torch.distributions import Categorical
 
 from mo_utils.accrued_reward_buffer import AccruedRewardReplayBuffer
 from mo_utils.evaluation import log_episode_info
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOAgent, MOPolicy
 from mo_utils.networks import (
     layer_init, 
@@ -306,7 +306,7 @@ class EUPG(MOPolicy, MOAgent):
 
         if self.log:
             log_str = f"_{self.id}" if self.id is not None else ""
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     f"losses{log_str}/loss": loss,
                     f"metrics{log_str}/scalarized_episodic_return": scalarized_return,
@@ -387,7 +387,7 @@ class EUPG(MOPolicy, MOAgent):
 
             if self.log and self.global_step % 1000 == 0:
                 print("SPS:", int(self.global_step / (time.time() - start_time)))
-                wandb.log({"charts/SPS": int(self.global_step / (time.time() - start_time)), "global_step": self.global_step})
+                get_metrics_sink().log({"charts/SPS": int(self.global_step / (time.time() - start_time)), "global_step": self.global_step})
 
     @override
     def get_config(self) -> dict:
@@ -9,12 +9,12 @@ import gymnasium as gym
 import mo_gymnasium as mo_gym
 import numpy as np
 import torch as th
-import wandb
 from mo_gymnasium.wrappers import MORecordEpisodeStatistics
 from torch import nn, optim
 from torch.distributions import Normal
 
 from mo_utils.evaluation import log_episode_info
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOPolicy
 from mo_utils.networks import layer_init, mlp
 from morl_generalization.utils import get_env_selection_algo_wrapper
@@ -336,20 +336,31 @@ class MOPPO(MOPolicy):
 
         self.optimizer = optim.Adam(networks.parameters(), lr=self.learning_rate, eps=1e-5)
 
-        # Storage setup (the batch)
-        self.batch = PPOReplayBuffer(
-            self.steps_per_iteration,
-            self.num_envs,
-            self.networks.obs_shape,
-            self.networks.action_shape,
-            self.networks.reward_dim,
-            self.device,
-        )
+        # Storage setup (the batch), allocated when the agent first trains
+        self.batch: Optional[PPOReplayBuffer] = None
+
+        # Running statistics of the normalization wrappers the agent was trained with, when it is trained on copies of
+        # `envs` in other processes (see the parallel training of PGMORL)
+        self.normalization_state: Optional[list] = None
 
     def __deepcopy__(self, memo):
         """Deepcopy method.
 
-        Useful for genetic algorithms stuffs.
+        Useful for genetic algorithms stuffs. See `clone`.
+        """
+        return self.clone()
+
+    def clone(self, copy_optimizer: bool = True) -> "MOPPO":
+        """Lightweight copy of the agent.
+
+        The clone shares the environments of this agent, copies its networks, and allocates its own batch when it first
+        trains (the batch is refilled at every training iteration, so its content is not copied).
+
+        Args:
+            copy_optimizer: whether the clone resumes the optimizer state of this agent, otherwise it starts with a new optimizer
+
+        Returns:
+            The clone of the agent.
         """
         copied_net = deepcopy(self.networks)
         copied = type(self)(
@@ -377,8 +388,9 @@ class MOPPO(MOPolicy):
         )
 
         copied.global_step = self.global_step
-        copied.optimizer = optim.Adam(copied_net.parameters(), lr=self.learning_rate, eps=1e-5)
-        copied.batch = deepcopy(self.batch)
+        copied.normalization_state = deepcopy(self.normalization_state)
+        if copy_optimizer:
+            copied.optimizer.load_state_dict(deepcopy(self.optimizer.state_dict()))
         return copied
     
     def get_save_dict(self, save_replay_buffer: bool = False) -> dict:
@@ -603,7 +615,7 @@ class MOPPO(MOPolicy):
 
         # record rewards for plotting purposes
         if self.log:
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     f"charts_{self.id}/learning_rate": self.optimizer.param_groups[0]["lr"],
                     f"losses_{self.id}/value_loss": v_loss.item(),
@@ -625,6 +637,16 @@ class MOPPO(MOPolicy):
             current_iteration: current iteration number
             max_iterations: maximum number of iterations
         """
+        if self.batch is None:
+            self.batch = PPOReplayBuffer(
+                self.steps_per_iteration,
+                self.num_envs,
+                self.networks.obs_shape,
+                self.networks.action_shape,
+                self.networks.reward_dim,
+                self.device,
+            )
+
         next_obs, _ = self.envs.reset(seed=self.seed)
         next_obs = th.Tensor(next_obs).to(self.device)  # num_envs x obs
         next_done = th.zeros(self.num_envs).to(self.device)
@@ -648,6 +670,6 @@ class MOPPO(MOPolicy):
         print("SPS:", int(self.global_step / (time.time() - start_time)))
         if self.log:
             print(f"Worker {self.id} - Global step: {self.global_step}")
-            wandb.log(
+            get_metrics_sink().log(
                 {"charts/SPS": int(self.global_step / (time.time() - start_time)), "global_step": self.global_step},
             )
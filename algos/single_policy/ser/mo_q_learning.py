@@ -5,9 +5,9 @@ from typing_extensions import override
 
 import gymnasium as gym
 import numpy as np
-import wandb
 
 from mo_utils.evaluation import log_episode_info
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.model_based.tabular_model import TabularModel
 from mo_utils.morl_algorithm import MOAgent, MOPolicy
 from mo_utils.scalarization import weighted_sum
@@ -220,7 +220,7 @@ class MOQLearning(MOPolicy, MOAgent):
             )
 
         if self.log and self.global_step % 1000 == 0:
-            wandb.log(
+            get_metrics_sink().log(
                 {
                     f"charts{self.idstr}/epsilon": self.epsilon,
                     f"losses{self.idstr}/scalarized_td_error": self.scalarization(td_error, self.weights),
@@ -295,7 +295,7 @@ class MOQLearning(MOPolicy, MOAgent):
                 self.num_episodes += 1
 
                 if self.log and self.global_step % 1000 == 0:
-                    wandb.log(
+                    get_metrics_sink().log(
                         {
                             f"charts{self.idstr}/SPS": int(self.global_step / (time.time() - start_time)),
                             "global_step": self.global_step,
@@ -18,10 +18,10 @@ import torch.nn as nn
 import torch.nn.functional as F
 from torch.distributions.categorical import Categorical
 import torch.optim as optim
-import wandb
 
 from mo_utils.buffer import ReplayBuffer
 from mo_utils.evaluation import log_episode_info
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.morl_algorithm import MOPolicy
 from mo_utils.networks import (
     NatureCNN,
@@ -506,7 +506,7 @@ class MOSACDiscrete(MOPolicy):
             }
             if self.autotune:
                 to_log[f"losses{log_str}/alpha_loss"] = alpha_loss.item()
-            wandb.log(to_log)
+            get_metrics_sink().log(to_log)
 
     def train(
         self, 
@@ -564,7 +564,7 @@ class MOSACDiscrete(MOPolicy):
                     self.update()
                 if self.log and self.global_step % 100 == 0:
                     print("SPS:", int(self.global_step / (time.time() - start_time)))
-                    wandb.log(
+                    get_metrics_sink().log(
                         {"charts/SPS": int(self.global_step / (time.time() - start_time)), "global_step": self.global_step}
                     )
 
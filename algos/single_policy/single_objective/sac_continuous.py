@@ -17,13 +17,13 @@ import torch as th
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
-import wandb
 
 from mo_utils.buffer import ReplayBuffer
 from mo_utils.evaluation import (
     log_all_multi_policy_metrics,
     policy_evaluation_mo,
 )
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.weights import equally_spaced_weights
 from mo_utils.networks import mlp, polyak_update, layer_init
 from mo_utils.morl_algorithm import MOAgent
@@ -476,7 +476,7 @@ class SACContinuous(MOAgent):
             }
             if self.autotune:
                 to_log[f"losses{log_str}/alpha_loss"] = alpha_loss.item()
-            wandb.log(to_log)
+            get_metrics_sink().log(to_log)
 
     def train(
         self, 
@@ -540,7 +540,7 @@ class SACContinuous(MOAgent):
                 self.update()
                 if self.log and self.global_step % 100 == 0:
                     print("SPS:", int(self.global_step / (time.time() - start_time)))
-                    wandb.log(
+                    get_metrics_sink().log(
                         {"charts/SPS": int(self.global_step / (time.time() - start_time)), "global_step": self.global_step}
                     )
 
@@ -561,5 +561,7 @@ class SACContinuous(MOAgent):
                         ref_front=known_pareto_front,
                     )
         
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
@@ -18,9 +18,9 @@ import torch.nn as nn
 import torch.nn.functional as F
 from torch.distributions.categorical import Categorical
 import torch.optim as optim
-import wandb
 
 from mo_utils.buffer import ReplayBuffer
+from mo_utils.metrics_sink import get_metrics_sink
 from mo_utils.weights import equally_spaced_weights
 from mo_utils.evaluation import (
     log_all_multi_policy_metrics,
@@ -489,7 +489,7 @@ class SACDiscrete(MOAgent):
             }
             if self.autotune:
                 to_log[f"losses{log_str}/alpha_loss"] = alpha_loss.item()
-            wandb.log(to_log)
+            get_metrics_sink().log(to_log)
 
     def train(
         self, 
@@ -554,7 +554,7 @@ class SACDiscrete(MOAgent):
                     self.update()
                 if self.log and self.global_step % 100 == 0:
                     print("SPS:", int(self.global_step / (time.time() - start_time)))
-                    wandb.log(
+                    get_metrics_sink().log(
                         {"charts/SPS": int(self.global_step / (time.time() - start_time)), "global_step": self.global_step}
                     )
                 
@@ -575,5 +575,7 @@ class SACDiscrete(MOAgent):
                             ref_front=known_pareto_front,
                         )
 
+        if test_generalization:
+            eval_env.wait_for_background_evals() # log the evaluations still running in the background
         if self.log:
             self.close_wandb()
\ No newline at end of file
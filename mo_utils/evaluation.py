@@ -1,13 +1,15 @@
 """Utilities related to evaluation."""
 import os
 import random
-from typing import List, Optional, Tuple
+import weakref
+from collections import OrderedDict
+from copy import deepcopy
+from typing import Hashable, List, Optional, Tuple
 
 import numpy as np
 import torch as th
-import wandb
-from pymoo.util.ref_dirs import get_reference_directions
 
+from mo_utils.metrics_sink import Table, get_metrics_sink
 from mo_utils.pareto import filter_pareto_dominated
 from mo_utils.performance_indicators import (
     cardinality,
@@ -17,7 +19,71 @@ from mo_utils.performance_indicators import (
     maximum_utility_loss,
     sparsity,
 )
-from mo_utils.weights import equally_spaced_weights
+from mo_utils.utils import policy_fingerprint
+from mo_utils.weights import equally_spaced_weights, reference_directions
+
+
+class EvaluationCache:
+    """Cache of evaluation results, keyed by policy fingerprint and evaluation settings.
+
+    The fingerprint is a hash of the policy parameters (see `mo_utils.utils.policy_fingerprint`), so a policy that did
+    not change since its last evaluation is not rolled out again. When a policy's parameters change, the results
+    cached for its previous parameters are evicted.
+    """
+
+    def __init__(self, max_policies: int = 256):
+        """
+        Args:
+            max_policies: Maximum number of policy fingerprints to keep results for; the least recently used ones are evicted first
+        """
+        self.max_policies = max_policies
+        self._results: OrderedDict = OrderedDict()
+        self._owners = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(self, policy) -> str:
+        """Fingerprints the policy and evicts the results of its previous parameters if they changed."""
+        fingerprint = policy_fingerprint(policy)
+        previous = self._owners.get(id(policy))
+        if previous is None:
+            try:
+                weakref.finalize(policy, self._owners.pop, id(policy), None)
+            except TypeError:
+                pass
+        elif previous != fingerprint:
+            self._results.pop(previous, None)
+        self._owners[id(policy)] = fingerprint
+        return fingerprint
+
+    @staticmethod
+    def key(env, w: Optional[np.ndarray], rep: int, *extra: Hashable) -> tuple:
+        """Key of an evaluation of `rep` episodes with weight `w` in `env` (identified by its id and seed)."""
+        env_id = env.unwrapped.spec.id if env.unwrapped.spec is not None else type(env.unwrapped).__name__
+        w = None if w is None else np.asarray(w, dtype=np.float64).tobytes()
+        return (env_id, env.unwrapped.np_random_seed, w, rep) + extra
+
+    def lookup(self, fingerprint: str, key: tuple):
+        """Returns a copy of the cached result, or None if there is none."""
+        results = self._results.get(fingerprint)
+        if results is None or key not in results:
+            self.misses += 1
+            return None
+        self._results.move_to_end(fingerprint)
+        self.hits += 1
+        return deepcopy(results[key])
+
+    def store(self, fingerprint: str, key: tuple, result):
+        """Caches an evaluation result."""
+        self._results.setdefault(fingerprint, {})[key] = deepcopy(result)
+        self._results.move_to_end(fingerprint)
+        while len(self._results) > self.max_policies:
+            self._results.popitem(last=False)
+
+    def clear(self):
+        """Removes all cached results."""
+        self._results.clear()
+        self._owners.clear()
 
 
 def eval_mo(
@@ -117,8 +183,34 @@ def eval_mo_reward_conditioned(
     )
 
 
+def returns_converged(vec_returns: np.ndarray, tol: float) -> bool:
+    """Whether enough episodes were run to estimate the average vector return.
+
+    Args:
+        vec_returns: vector returns of the episodes run so far, shape (num_episodes, reward_dim)
+        tol: tolerance on the standard error of the average return of every objective
+
+    Returns:
+        True once at least two episodes were run and the standard error is at most tol. Deterministic evaluations
+        (first two returns identical) converge after two episodes.
+    """
+    vec_returns = np.asarray(vec_returns)
+    if len(vec_returns) < 2:
+        return False
+    if len(vec_returns) == 2 and np.array_equal(vec_returns[0], vec_returns[1]):
+        return True
+    std_error = np.std(vec_returns, axis=0, ddof=1) / np.sqrt(len(vec_returns))
+    return bool(np.all(std_error <= tol))
+
+
 def policy_evaluation_mo(
-    agent, env, w: Optional[np.ndarray], scalarization=np.dot, rep: int = 5
+    agent,
+    env,
+    w: Optional[np.ndarray],
+    scalarization=np.dot,
+    rep: int = 5,
+    cache: Optional[EvaluationCache] = None,
+    tol: Optional[float] = None,
 ) -> Tuple[float, float, np.ndarray, np.ndarray]:
     """Evaluates the value of a policy by running the policy for multiple episodes. Returns the average returns.
 
@@ -128,11 +220,28 @@ def policy_evaluation_mo(
         w (np.ndarray): Weight vector
         scalarization: scalarization function, taking reward and weight as parameters
         rep (int, optional): Number of episodes for averaging. Defaults to 5.
+        cache (EvaluationCache, optional): If given, the result is reused while the agent's parameters do not change
+        tol (float, optional): If given, episodes are run until the standard error of the average vector return is at most tol
+            (see `returns_converged`), rep being the maximum number of episodes
 
     Returns:
         (float, float, np.ndarray, np.ndarray): Avg scalarized return, Avg scalarized discounted return, Avg vectorized return, Avg vectorized discounted return
     """
-    evals = [eval_mo(agent=agent, env=env, w=w, scalarization=scalarization) for _ in range(rep)]
+    if cache is not None:
+        fingerprint = cache.fingerprint(agent)
+        key = cache.key(env, w, rep, getattr(scalarization, "__qualname__", repr(scalarization)), tol)
+        result = cache.lookup(fingerprint, key)
+        if result is None:
+            result = policy_evaluation_mo(agent, env, w, scalarization=scalarization, rep=rep, tol=tol)
+            cache.store(fingerprint, key, result)
+        return result
+
+    if tol is None:
+        evals = [eval_mo(agent=agent, env=env, w=w, scalarization=scalarization) for _ in range(rep)]
+    else:
+        evals = []
+        while len(evals) < rep and not returns_converged([eval[2] for eval in evals], tol):
+            evals.append(eval_mo(agent=agent, env=env, w=w, scalarization=scalarization))
     avg_scalarized_return = np.mean([eval[0] for eval in evals])
     avg_scalarized_discounted_return = np.mean([eval[1] for eval in evals])
     avg_vec_return = np.mean([eval[2] for eval in evals], axis=0)
@@ -178,7 +287,7 @@ def log_all_multi_policy_metrics(
     eum = expected_utility(filtered_front, weights_set=equally_spaced_weights(reward_dim, n_sample_weights))
     card = cardinality(filtered_front)
 
-    wandb.log(
+    get_metrics_sink().log(
         {
             "eval/hypervolume": hv,
             "eval/sparsity": sp,
@@ -188,11 +297,11 @@ def log_all_multi_policy_metrics(
         },
         commit=False,
     )
-    front = wandb.Table(
+    front = Table(
         columns=[f"objective_{i}" for i in range(1, reward_dim + 1)],
         data=[p.tolist() for p in filtered_front],
     )
-    wandb.log({"eval/front": front})
+    get_metrics_sink().log({"eval/front": front})
 
     # If PF is known, log the additional metrics
     if ref_front is not None:
@@ -200,9 +309,9 @@ def log_all_multi_policy_metrics(
         mul = maximum_utility_loss(
             front=filtered_front,
             reference_set=ref_front,
-            weights_set=get_reference_directions("energy", reward_dim, n_sample_weights).astype(np.float32),
+            weights_set=reference_directions(reward_dim, n_sample_weights).astype(np.float32),
         )
-        wandb.log({"eval/igd": generational_distance, "eval/mul": mul})
+        get_metrics_sink().log({"eval/igd": generational_distance, "eval/mul": mul})
 
 
 def seed_everything(seed: int):
@@ -262,7 +371,7 @@ def log_episode_info(
         idstr = "_" + str(id)
     else:
         idstr = ""
-    wandb.log(
+    get_metrics_sink().log(
         {
             f"charts{idstr}/timesteps_per_episode": episode_ts,
             f"charts{idstr}/episode_time": episode_time,
@@ -274,7 +383,7 @@ def log_episode_info(
     )
 
     for i in range(episode_return.shape[0]):
-        wandb.log(
+        get_metrics_sink().log(
             {
                 f"metrics{idstr}/episode_return_obj_{i}": episode_return[i],
                 f"metrics{idstr}/disc_episode_return_obj_{i}": disc_episode_return[i],
@@ -0,0 +1,211 @@
+"""Exact hypervolume of 2, 3 and 4 objective fronts (maximization), and of a front extended by candidate points.
+
+The hypervolume is the volume dominated by the points and dominating the reference point. 2D fronts are swept in
+O(n log n) with array operations. 3D and 4D fronts are computed by the compiled algorithms of moocore (installed with
+pymoo >= 0.6.2) when available; otherwise 3D fronts are swept along the last objective while maintaining the 2D front of
+the points seen so far (O(n log n) searches), and 4D fronts are sliced along the last objective into 3D fronts whose
+slices are computed together with array operations.
+"""
+import bisect
+from typing import List, Union
+
+import numpy as np
+import numpy.typing as npt
+from pymoo.indicators.hv import HV
+
+from mo_utils.pareto import get_non_pareto_dominated_mask_batched
+
+try:
+    import moocore
+except ImportError: # pymoo < 0.6.2 computes hypervolumes in pure Python
+    moocore = None
+
+_MAX_BATCH_ELEMENTS = 2**22
+
+
+class _Staircase:
+    """2D Pareto front (x ascending, y descending) and the area it dominates above a reference point, built point by point."""
+
+    def __init__(self, ref_x: float, ref_y: float):
+        self.ref_x = ref_x
+        self.ref_y = ref_y
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+        self.area = 0.0
+
+    def add(self, x: float, y: float):
+        """Adds a point dominating the reference point and updates the dominated area."""
+        xs, ys = self.xs, self.ys
+        idx = bisect.bisect_left(xs, x) # first point with a larger (or equal) x, which has the largest y among them
+        height = ys[idx] if idx < len(xs) else self.ref_y
+        if height >= y:
+            return # dominated
+
+        # exclusive area of the new point, walking left over the points it dominates
+        right, j = x, idx - 1
+        while j >= 0 and ys[j] <= y:
+            self.area += (right - xs[j]) * (y - height)
+            right, height = xs[j], ys[j]
+            j -= 1
+        self.area += (right - (xs[j] if j >= 0 else self.ref_x)) * (y - height)
+
+        end = idx + 1 if idx < len(xs) and xs[idx] == x else idx
+        xs[j + 1 : end] = [x]
+        ys[j + 1 : end] = [y]
+
+
+def _hypervolume_2d(points: np.ndarray, ref_point: np.ndarray) -> float:
+    order = np.lexsort((-points[:, 1], -points[:, 0])) # x descending, then y descending
+    xs, ys = points[order, 0], points[order, 1]
+    best_y = np.maximum.accumulate(np.concatenate(([ref_point[1]], ys)))[:-1] # highest y among the points with a larger x
+    return float(np.sum((xs - ref_point[0]) * np.maximum(ys - best_y, 0.0)))
+
+
+def _hypervolume_3d(points: np.ndarray, ref_point: np.ndarray) -> float:
+    order = np.argsort(-points[:, 2], kind="stable")
+    zs = np.append(points[order, 2], ref_point[2])
+    staircase = _Staircase(ref_point[0], ref_point[1])
+    volume = 0.0
+    for k, i in enumerate(order):
+        staircase.add(points[i, 0], points[i, 1])
+        volume += staircase.area * (zs[k] - zs[k + 1])
+    return volume
+
+
+def _hypervolume_3d_batched(fronts: np.ndarray, ref_point: np.ndarray) -> np.ndarray:
+    """Hypervolumes of fronts of shape (num_fronts, num_points, 3), all of whose points dominate or equal the reference point.
+
+    The fronts are sliced along the last objective: the slice between the l-th and (l+1)-th highest z is the area
+    dominated by the l+1 points with the highest z, computed for all slices at once with O(num_points^2) memory per front.
+    """
+    num_fronts, num_points = fronts.shape[:2]
+    if num_points == 0:
+        return np.zeros(num_fronts)
+    z_order = np.argsort(-fronts[..., 2], axis=1, kind="stable")
+    z_rank = np.argsort(z_order, axis=1)
+    zs = np.concatenate((np.take_along_axis(fronts[..., 2], z_order, axis=1), np.full((num_fronts, 1), ref_point[2])), axis=1)
+
+    x_order = np.argsort(fronts[..., 0], axis=1, kind="stable")
+    xs = np.take_along_axis(fronts[..., 0], x_order, axis=1)
+    ys = np.take_along_axis(fronts[..., 1], x_order, axis=1)
+    widths = np.diff(xs, axis=1, prepend=ref_point[0])
+    in_slice = np.take_along_axis(z_rank, x_order, axis=1)[:, None, :] <= np.arange(num_points)[None, :, None]
+    # above x in (x_{j-1}, x_j], a slice dominates up to the highest y among its points with a larger (or equal) x
+    heights = np.maximum.accumulate(np.where(in_slice, ys[:, None, :], ref_point[1])[..., ::-1], axis=2)[..., ::-1]
+    areas = np.einsum("bj,blj->bl", widths, heights - ref_point[1])
+    return np.einsum("bl,bl->b", areas, zs[:, :-1] - zs[:, 1:])
+
+
+def _batched_hypervolume_3d(fronts: np.ndarray, ref_point: np.ndarray) -> np.ndarray:
+    # bounds the memory of the slices to about _MAX_BATCH_ELEMENTS floats
+    batch_size = max(1, _MAX_BATCH_ELEMENTS // max(1, fronts.shape[1] ** 2))
+    return np.concatenate(
+        [_hypervolume_3d_batched(fronts[i : i + batch_size], ref_point) for i in range(0, len(fronts), batch_size)] or [np.zeros(0)]
+    )
+
+
+def _hypervolume_4d(points: np.ndarray, ref_point: np.ndarray) -> float:
+    # slices along the last objective: the k+1 points with the highest w dominate a 3D volume between the k-th and (k+1)-th highest w
+    order = np.argsort(-points[:, 3], kind="stable")
+    points = points[order]
+    ws = np.append(points[:, 3], ref_point[3])
+    prefixes = np.where(np.tri(len(points), dtype=bool)[..., None], points[None, :, :3], ref_point[:3])
+    return float(np.dot(_batched_hypervolume_3d(prefixes, ref_point[:3]), ws[:-1] - ws[1:]))
+
+
+def exact_hypervolume(ref_point: np.ndarray, points: Union[np.ndarray, List[npt.ArrayLike]]) -> float:
+    """Computes the hypervolume of a set of points w.r.t. a reference point (maximization), for 2 to 4 objectives.
+
+    Args:
+        ref_point: Reference point
+        points: Value vectors, of shape (num_points, num_objectives). Dominated points and points not dominating the reference point are allowed.
+
+    Returns:
+        float: Hypervolume
+    """
+    ref_point = np.asarray(ref_point, dtype=np.float64)
+    points = np.asarray(points, dtype=np.float64).reshape(-1, len(ref_point))
+    points = points[np.all(points > ref_point, axis=1)]
+    if len(points) == 0:
+        return 0.0
+    if len(ref_point) == 2:
+        return _hypervolume_2d(points, ref_point)
+    elif moocore is not None and len(ref_point) <= 4:
+        return float(moocore.hypervolume(points, ref=ref_point, maximise=True))
+    elif len(ref_point) == 3:
+        return _hypervolume_3d(points, ref_point)
+    elif len(ref_point) == 4:
+        return _hypervolume_4d(points[get_non_pareto_dominated_mask_batched(points[None])[0]], ref_point)
+    raise ValueError(f"Exact hypervolume is implemented for 2 to 4 objectives, got {len(ref_point)}.")
+
+
+def hypervolume_contributions(
+    ref_point: np.ndarray, front: Union[np.ndarray, List[npt.ArrayLike]], candidates: Union[np.ndarray, List[npt.ArrayLike]]
+) -> np.ndarray:
+    """Computes how much each candidate point would add to the hypervolume of a fixed front, i.e. HV(front + [p]) - HV(front).
+
+    The contribution of p is the volume of the box between the reference point and p, minus the hypervolume of the
+    front clipped to that box, so each candidate only involves the part of the front it overlaps.
+
+    Args:
+        ref_point: Reference point
+        front: Value vectors of the fixed front, of shape (num_points, num_objectives)
+        candidates: Candidate points, of shape (num_candidates, num_objectives)
+
+    Returns:
+        np.ndarray: Hypervolume contribution of each candidate, of shape (num_candidates,)
+    """
+    ref_point = np.asarray(ref_point, dtype=np.float64)
+    front = np.asarray(front, dtype=np.float64).reshape(-1, len(ref_point))
+    front = front[np.all(front > ref_point, axis=1)]
+    candidates = np.asarray(candidates, dtype=np.float64).reshape(-1, len(ref_point))
+    boxes = np.prod(np.maximum(candidates - ref_point, 0.0), axis=1)
+
+    if len(ref_point) == 2 and len(front) > 0:
+        # the front dominates, above x in (x_{j-1}, x_j], up to the highest y among the points with a larger (or equal) x
+        order = np.argsort(front[:, 0], kind="stable")
+        xs, ys = front[order, 0], front[order, 1]
+        lefts = np.concatenate(([ref_point[0]], xs))
+        rights = np.concatenate((xs, [np.inf]))
+        heights = np.concatenate((np.maximum.accumulate(ys[::-1])[::-1], [ref_point[1]]))
+        widths = np.clip(np.minimum(candidates[:, :1], rights) - lefts, 0.0, None)
+        depths = np.clip(candidates[:, 1:] - heights, 0.0, None)
+        return np.sum(widths * depths, axis=1) * (boxes > 0)
+
+    # the front clipped to the box of each candidate, points outside of the box collapsing onto the reference point
+    clipped = np.maximum(np.minimum(front[None], candidates[:, None]), ref_point)
+    contributions = np.zeros(len(candidates))
+    if moocore is not None:
+        for i in np.flatnonzero(boxes > 0):
+            contributions[i] = boxes[i] - moocore.hypervolume(clipped[i], ref=ref_point, maximise=True)
+        return contributions
+    if len(ref_point) == 3:
+        return boxes - _batched_hypervolume_3d(clipped, ref_point)
+
+    relevant = get_non_pareto_dominated_mask_batched(clipped) & np.all(clipped > ref_point, axis=2)
+    for i in np.flatnonzero(boxes > 0):
+        contributions[i] = boxes[i] - (_hypervolume_4d(clipped[i][relevant[i]], ref_point) if relevant[i].any() else 0.0)
+    return contributions
+
+
+def hypervolume_with_candidates(
+    ref_point: np.ndarray, front: Union[np.ndarray, List[npt.ArrayLike]], candidates: Union[np.ndarray, List[npt.ArrayLike]]
+) -> np.ndarray:
+    """Computes HV(front + [p]) for each candidate point p, without recomputing the hypervolume of the whole front each time.
+
+    Above 4 objectives, the hypervolume of each extended front is computed from scratch with Pymoo.
+
+    Args:
+        ref_point: Reference point
+        front: Value vectors of the fixed front, of shape (num_points, num_objectives)
+        candidates: Candidate points, of shape (num_candidates, num_objectives)
+
+    Returns:
+        np.ndarray: Hypervolume of the front extended by each candidate, of shape (num_candidates,)
+    """
+    ref_point = np.asarray(ref_point, dtype=np.float64)
+    if not 2 <= len(ref_point) <= 4:
+        indicator = HV(ref_point=ref_point * -1)
+        front = np.asarray(front, dtype=np.float64).reshape(-1, len(ref_point))
+        return np.array([indicator(np.vstack((front, candidate)) * -1) for candidate in np.asarray(candidates, dtype=np.float64)])
+    return exact_hypervolume(ref_point, front) + hypervolume_contributions(ref_point, front, candidates)
@@ -0,0 +1,250 @@
+"""Buffered logging of metrics, written in bulk by a background thread to wandb, local Arrow files or nowhere."""
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import wandb
+from wandb.sdk.data_types.base_types.wb_value import WBValue
+from gymnasium import error
+
+
+class Table(NamedTuple):
+    """A table logged as a metric (e.g. a Pareto front), converted to the format of the backend when written."""
+
+    columns: List[str]
+    data: List[list]
+
+
+class MetricsBackend:
+    """Destination of the records of a `MetricsSink`."""
+
+    def write(self, records: Sequence[Dict]):
+        """Writes records, in the order they were logged.
+
+        Args:
+            records: Dictionaries of metrics (one per committed `MetricsSink.log` call)
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Releases the resources of the backend."""
+
+
+class NoOpBackend(MetricsBackend):
+    """Drops all the records, e.g. for benchmarking without any logging."""
+
+    def write(self, records: Sequence[Dict]):
+        pass
+
+
+class RecordingBackend(MetricsBackend):
+    """Keeps the records in memory, e.g. to send the logs of a worker process to the process writing them."""
+
+    def __init__(self):
+        self.records: List[Dict] = []
+
+    def write(self, records: Sequence[Dict]):
+        self.records.extend(records)
+
+    def pop_records(self) -> List[Dict]:
+        """Returns the records written so far (flush the sink first) and forgets them."""
+        records, self.records = self.records, []
+        return records
+
+
+class WandbBackend(MetricsBackend):
+    """Logs the records to the current wandb run, one `wandb.log` call per record."""
+
+    def write(self, records: Sequence[Dict]):
+        for record in records:
+            wandb.log(
+                {key: wandb.Table(columns=value.columns, data=value.data) if isinstance(value, Table) else value for key, value in record.items()}
+            )
+
+
+class ArrowBackend(MetricsBackend):
+    """Writes the records to local Parquet files, one file per flushed batch.
+
+    Scalar metrics of a batch are stored in `<root>/metrics/part-<n>.parquet`, one row per record and one column per metric
+    (null where a record does not have the metric). Each table metric is stored in `<root>/tables/<key>/part-<n>.parquet`,
+    with the `global_step` of its record as an extra column. wandb media (e.g. `wandb.Image`) are not stored. Parts may
+    have different columns, e.g. read them back with
+    `pandas.concat([pandas.read_parquet(part) for part in sorted(glob.glob(f"{root}/metrics/*.parquet"))])`.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory of the Parquet files
+        """
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise error.DependencyNotInstalled("pyarrow is not installed, run `pip install pyarrow`") from e
+
+        self.pa = pyarrow
+        self.pq = pyarrow.parquet
+        self.root = root
+        self._num_parts = 0
+
+    def _write_part(self, directory: str, rows: List[Dict]):
+        os.makedirs(directory, exist_ok=True)
+        keys = list(dict.fromkeys(key for row in rows for key in row)) # rows may have different metrics
+        table = self.pa.table({key: [row.get(key) for row in rows] for key in keys})
+        self.pq.write_table(table, os.path.join(directory, f"part-{self._num_parts:05d}.parquet"))
+
+    def write(self, records: Sequence[Dict]):
+        scalar_rows = []
+        table_rows = {}
+        for record in records:
+            scalars = {}
+            for key, value in record.items():
+                if isinstance(value, Table):
+                    rows = [dict(zip(value.columns, row)) for row in value.data]
+                    if "global_step" in record:
+                        for row in rows:
+                            row["global_step"] = record["global_step"]
+                    table_rows.setdefault(key, []).extend(rows)
+                elif not isinstance(value, WBValue):
+                    scalars[key] = value.item() if isinstance(value, np.generic) else value
+            if scalars:
+                scalar_rows.append(scalars)
+
+        if scalar_rows:
+            self._write_part(os.path.join(self.root, "metrics"), scalar_rows)
+        for key, rows in table_rows.items():
+            if rows:
+                self._write_part(os.path.join(self.root, "tables", key), rows)
+        self._num_parts += 1
+
+
+# queue items of the background thread, besides the records: an event (set once the previous records are written) or None (stop)
+_FLUSH_INTERVAL_ELAPSED = object()
+
+
+class MetricsSink:
+    """Buffers logged metrics and writes them in bulk from a background thread, off the critical path of the caller.
+
+    `log` mirrors `wandb.log`: records logged with `commit=False` are merged into the next committed one.
+    Errors of the backend are raised by the next call to `log` or `flush`.
+    """
+
+    def __init__(self, backend: MetricsBackend, max_batch_size: int = 1024, flush_interval: float = 5.0):
+        """
+        Args:
+            backend: Destination of the records
+            max_batch_size: Number of buffered records triggering a write
+            flush_interval: Maximum number of seconds a record stays buffered
+        """
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="metrics-sink", daemon=True)
+        self._thread.start()
+
+    def log(self, metrics: Dict, commit: bool = True):
+        """Logs a dictionary of metrics (numbers or `Table`), see `wandb.log`."""
+        self._raise_if_error()
+        self._pending.update(metrics)
+        if commit:
+            self._queue.put(self._pending)
+            self._pending = {}
+
+    def flush(self):
+        """Writes all the logged records and waits until they are written."""
+        if self._pending:
+            self._queue.put(self._pending)
+            self._pending = {}
+        if self._thread.is_alive():
+            written = threading.Event()
+            self._queue.put(written)
+            written.wait()
+        self._raise_if_error()
+
+    def close(self):
+        """Flushes the records, then stops the background thread and closes the backend."""
+        try:
+            self.flush()
+        finally:
+            if self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+            self.backend.close()
+
+    def _raise_if_error(self):
+        if self._error is not None:
+            e, self._error = self._error, None
+            raise RuntimeError("Writing the logged metrics failed.") from e
+
+    def _run(self):
+        records, deadline = [], None
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()) if records else None)
+            except queue.Empty:
+                item = _FLUSH_INTERVAL_ELAPSED
+            if isinstance(item, dict):
+                if not records:
+                    deadline = time.monotonic() + self.flush_interval
+                records.append(item)
+                if len(records) < self.max_batch_size:
+                    continue
+            if records:
+                try:
+                    self.backend.write(records)
+                except Exception as e:
+                    self._error = e
+                records = []
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is None:
+                return
+
+
+_default_sink: Optional[MetricsSink] = None
+
+
+def make_backend(name: str, root: Optional[str] = None) -> MetricsBackend:
+    """Creates a backend from its name: "wandb", "arrow" (written to `root`) or "none"."""
+    if name == "wandb":
+        return WandbBackend()
+    elif name == "arrow":
+        return ArrowBackend(root if root is not None else "metrics")
+    elif name == "none":
+        return NoOpBackend()
+    raise ValueError(f"Unknown metrics backend: {name}, must be 'wandb', 'arrow' or 'none'.")
+
+
+def get_metrics_sink() -> MetricsSink:
+    """Sink used by the evaluation helpers, agents and generalization evaluator.
+
+    Unless one was set with `set_metrics_sink`, it is created on first use with the backend named by the METRICS_BACKEND
+    environment variable (wandb by default, Arrow files are written to METRICS_DIR).
+    """
+    global _default_sink
+    if _default_sink is None:
+        backend = make_backend(os.environ.get("METRICS_BACKEND", "wandb"), os.environ.get("METRICS_DIR"))
+        set_metrics_sink(MetricsSink(backend))
+    return _default_sink
+
+
+def set_metrics_sink(sink: MetricsSink):
+    """Replaces the sink returned by `get_metrics_sink`, closing the previous one."""
+    global _default_sink
+    previous, _default_sink = _default_sink, sink
+    if previous is not None:
+        previous.close()
+
+
+@atexit.register
+def _close_metrics_sink():
+    if _default_sink is not None:
+        _default_sink.close()
@@ -14,9 +14,11 @@ from gymnasium import spaces
 from mo_gymnasium.wrappers.vector import MOSyncVectorEnv
 
 from mo_utils.evaluation import (
+    EvaluationCache,
     eval_mo_reward_conditioned,
     policy_evaluation_mo,
 )
+from mo_utils.metrics_sink import get_metrics_sink
 
 
 class MOPolicy(ABC):
@@ -77,13 +79,14 @@ class MOPolicy(ABC):
         vec_return,
         discounted_vec_return,
     ):
-        """Writes the data to wandb summary."""
+        """Writes the data to the metrics sink (wandb by default)."""
         if self.id is None:
             idstr = ""
         else:
             idstr = f"_{self.id}"
 
-        wandb.log(
+        sink = get_metrics_sink()
+        sink.log(
             {
                 f"eval{idstr}/scalarized_return": scalarized_return,
                 f"eval{idstr}/scalarized_discounted_return": scalarized_discounted_return,
@@ -91,7 +94,7 @@ class MOPolicy(ABC):
             }
         )
         for i in range(vec_return.shape[0]):
-            wandb.log(
+            sink.log(
                 {f"eval{idstr}/vec_{i}": vec_return[i], f"eval{idstr}/discounted_vec_{i}": discounted_vec_return[i]},
             )
 
@@ -102,6 +105,8 @@ class MOPolicy(ABC):
         scalarization=np.dot,
         weights: Optional[np.ndarray] = None,
         log: bool = False,
+        cache: Optional[EvaluationCache] = None,
+        tol: Optional[float] = None,
     ):
         """Runs a policy evaluation (typically over a few episodes) on eval_env and logs some metrics if asked.
 
@@ -111,6 +116,8 @@ class MOPolicy(ABC):
             scalarization: scalarization function
             weights: weights to use in the evaluation
             log: whether to log the results
+            cache: evaluation cache, reused while the parameters of the policy do not change
+            tol: if given, num_episodes is the maximum number of episodes, fewer are run once the returns converged (see `policy_evaluation_mo`)
 
         Returns:
              a tuple containing the average evaluations
@@ -120,7 +127,9 @@ class MOPolicy(ABC):
             scalarized_discounted_return,
             vec_return,
             discounted_vec_return,
-        ) = policy_evaluation_mo(self, eval_env, scalarization=scalarization, w=weights, rep=num_episodes)
+        ) = policy_evaluation_mo(
+            self, eval_env, scalarization=scalarization, w=weights, rep=num_episodes, cache=cache, tol=tol
+        )
 
         if log:
             self.__report(
@@ -303,9 +312,10 @@ class MOAgent(ABC):
         wandb.define_metric("*", step_metric="global_step")
 
     def close_wandb(self) -> None:
-        """Closes the wandb writer and finishes the run."""
+        """Writes the buffered metrics, then closes the wandb writer and finishes the run."""
         import wandb
 
+        get_metrics_sink().flush()
         wandb.finish()
 
 class MORLAlgo(MOAgent, MOPolicy):
@@ -1,14 +1,60 @@
 """Pareto utilities."""
-from copy import deepcopy
 from typing import List, Union
 
 import numpy as np
 from scipy.spatial import ConvexHull
 
+from mo_utils.utils import inference_snapshot
+
+
+# number of vectors compared at once with each other, bounding the memory of the comparisons to _BLOCK_SIZE^2 * dim booleans
+_BLOCK_SIZE = 1024
+
+
+def _dominated_by(points: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Mask of the points Pareto dominated by at least one of the other vectors, comparing them block by block."""
+    dominated = np.zeros(len(points), dtype=bool)
+    for i in range(0, len(points), _BLOCK_SIZE):
+        block = points[i : i + _BLOCK_SIZE, None]
+        for j in range(0, len(others), _BLOCK_SIZE):
+            other_block = others[None, j : j + _BLOCK_SIZE]
+            dominated[i : i + _BLOCK_SIZE] |= np.any(
+                np.all(other_block >= block, axis=-1) & np.any(other_block > block, axis=-1), axis=1
+            )
+    return dominated
+
+
+def _non_dominated_mask_unique(uniques: np.ndarray) -> np.ndarray:
+    """Mask of the non-dominated vectors among distinct vectors, in O(n log n) for 2D and with O(n * dim) memory otherwise."""
+    if uniques.shape[1] == 2:
+        # sorted by decreasing x (then y), a vector is dominated iff a previous one has a higher (or equal) y
+        order = np.lexsort((-uniques[:, 1], -uniques[:, 0]))
+        ys = uniques[order, 1]
+        best_y = np.maximum.accumulate(np.concatenate(([-np.inf], ys)))[:-1]
+        mask = np.zeros(len(uniques), dtype=bool)
+        mask[order] = ys > best_y
+        return mask
+
+    # vectors are added to the front by decreasing sum, so that they are rarely dominated by the ones added after them;
+    # removing the vectors of the front dominated by the new ones keeps the result exact when rounded sums are equal
+    order = np.argsort(-uniques.sum(axis=1), kind="stable")
+    front = np.zeros(0, dtype=int)
+    for i in range(0, len(order), _BLOCK_SIZE):
+        block = order[i : i + _BLOCK_SIZE]
+        block = block[~_dominated_by(uniques[block], uniques[front])]
+        block = block[~_dominated_by(uniques[block], uniques[block])]
+        front = np.concatenate((front[~_dominated_by(uniques[front], uniques[block])], block))
+    mask = np.zeros(len(uniques), dtype=bool)
+    mask[front] = True
+    return mask
+
 
 def get_non_pareto_dominated_inds(candidates: Union[np.ndarray, List], remove_duplicates: bool = True) -> np.ndarray:
     """A batched and fast version of the Pareto coverage set algorithm.
 
+    Duplicate vectors are compared once, 2D vectors are filtered with a sort-and-sweep in O(n log n), and higher dimensional
+    vectors block by block against the front found so far, so that memory stays linear in the number of candidates.
+
     Args:
         candidates (ndarray): A numpy array of vectors.
         remove_duplicates (bool, optional): Whether to remove duplicate vectors. Defaults to True.
@@ -17,19 +63,16 @@ def get_non_pareto_dominated_inds(candidates: Union[np.ndarray, List], remove_du
         ndarray: The indices of the elements that should be kept to form the Pareto front or coverage set.
     """
     candidates = np.array(candidates)
-    uniques, indcs, invs, counts = np.unique(candidates, return_index=True, return_inverse=True, return_counts=True, axis=0)
+    candidates = candidates.reshape(len(candidates), -1)
+    uniques, indcs, invs = np.unique(candidates, return_index=True, return_inverse=True, axis=0)
 
-    res_eq = np.all(candidates[:, None, None] <= candidates, axis=-1).squeeze()
-    res_g = np.all(candidates[:, None, None] < candidates, axis=-1).squeeze()
-    c1 = np.sum(res_eq, axis=-1) == counts[invs]
-    c2 = np.any(~res_g, axis=-1)
+    to_keep = _non_dominated_mask_unique(uniques)[invs.reshape(-1)]
     if remove_duplicates:
-        to_keep = np.zeros(len(candidates), dtype=bool)
-        to_keep[indcs] = 1
-    else:
-        to_keep = np.ones(len(candidates), dtype=bool)
+        first = np.zeros(len(candidates), dtype=bool)
+        first[indcs] = 1
+        to_keep &= first
 
-    return np.logical_and(c1, c2) & to_keep
+    return to_keep
 
 
 def filter_pareto_dominated(candidates: Union[np.ndarray, List], remove_duplicates: bool = True) -> np.ndarray:
@@ -48,6 +91,26 @@ def filter_pareto_dominated(candidates: Union[np.ndarray, List], remove_duplicat
     return candidates[get_non_pareto_dominated_inds(candidates, remove_duplicates=remove_duplicates)]
 
 
+def get_non_pareto_dominated_mask_batched(candidates: np.ndarray, remove_duplicates: bool = True) -> np.ndarray:
+    """Batched version of `get_non_pareto_dominated_inds` over several sets of candidates of the same size.
+
+    Args:
+        candidates (ndarray): Vectors of shape (num_sets, num_candidates, dim).
+        remove_duplicates (bool, optional): Whether to keep only the first of duplicate vectors. Defaults to True.
+
+    Returns:
+        ndarray: Boolean mask of shape (num_sets, num_candidates) of the vectors forming the Pareto coverage set of their set.
+    """
+    candidates = np.asarray(candidates)
+    # [s, i, j]: whether vector i of set s is weakly dominated by (resp. equal to) vector j
+    res_eq = np.all(candidates[:, :, None] <= candidates[:, None], axis=-1)
+    equal = np.all(candidates[:, :, None] == candidates[:, None], axis=-1)
+    to_keep = np.sum(res_eq, axis=-1) == np.sum(equal, axis=-1)
+    if remove_duplicates:
+        to_keep &= ~np.any(np.tril(equal, k=-1), axis=-1)
+    return to_keep
+
+
 def filter_convex_dominated(candidates: Union[np.ndarray, List]) -> np.ndarray:
     """A fast version to prune a set of points to its convex hull. This leverages the QuickHull algorithm.
 
@@ -101,15 +164,8 @@ def get_non_dominated(candidates: set) -> set:
 
 
 def get_non_dominated_inds(solutions: np.ndarray) -> np.ndarray:
-    """Returns a boolean array indicating which points are non-dominated."""
-    is_efficient = np.ones(solutions.shape[0], dtype=bool)
-    for i, c in enumerate(solutions):
-        if is_efficient[i]:
-            # Remove dominated points, will also remove itself
-            is_efficient[is_efficient] = np.any(solutions[is_efficient] > c, axis=1)
-            # keep this solution as non-dominated
-            is_efficient[i] = 1
-    return is_efficient
+    """Returns a boolean array indicating which points are non-dominated (keeping the first of duplicate points)."""
+    return get_non_pareto_dominated_inds(solutions, remove_duplicates=True)
 
 
 class ParetoArchive:
@@ -121,30 +177,36 @@ class ParetoArchive:
         self.individuals: list = []
         self.evaluations: List[np.ndarray] = []
 
-    def add(self, candidate, evaluation: np.ndarray):
-        """Adds the candidate to the memory and removes Pareto inefficient points.
+    def add(self, candidate, evaluation: np.ndarray) -> bool:
+        """Adds the candidate to the memory if it is not dominated, and removes the points it dominates.
+
+        The evaluation is only compared with the current archive, in O(|archive|) for Pareto archives. Accepted candidates
+        are stored as an inference snapshot (see `inference_snapshot`), without their environments, replay buffers and
+        optimizers; rejected candidates are not copied.
 
         Args:
             candidate: The candidate to add.
             evaluation: The evaluation of the candidate.
-        """
-        self.evaluations.append(evaluation)
-        self.individuals.append(deepcopy(candidate))
 
-        # Non-dominated sorting
+        Returns:
+            bool: Whether the candidate was added to the archive.
+        """
         if self.convex_hull:
-            nd_candidates = {tuple(x) for x in filter_convex_dominated(self.evaluations)}
+            # a new vertex of the hull may also remove points which it does not dominate
+            nd_candidates = {tuple(x) for x in filter_convex_dominated(self.evaluations + [evaluation])}
+            accepted = tuple(evaluation) in nd_candidates and not any(np.array_equal(e, evaluation) for e in self.evaluations)
+            to_keep = [tuple(e) in nd_candidates for e in self.evaluations]
+        elif self.evaluations:
+            evaluations = np.array(self.evaluations)
+            # not weakly dominated (nor equal), so it dominates the points it is better than or equal to
+            accepted = not np.any(np.all(evaluations >= evaluation, axis=1))
+            to_keep = ~np.all(evaluation >= evaluations, axis=1) if accepted else np.ones(len(evaluations), dtype=bool)
         else:
-            nd_candidates = {tuple(x) for x in filter_pareto_dominated(self.evaluations)}
-
-        # Reconstruct the pareto archive (because Non-Dominated sorting might change the order of candidates)
-        non_dominated_evals = []
-        non_dominated_evals_tuples = []
-        non_dominated_individuals = []
-        for e, i in zip(self.evaluations, self.individuals):
-            if tuple(e) in nd_candidates and tuple(e) not in non_dominated_evals_tuples:
-                non_dominated_evals.append(e)
-                non_dominated_evals_tuples.append(tuple(e))
-                non_dominated_individuals.append(i)
-        self.evaluations = non_dominated_evals
-        self.individuals = non_dominated_individuals
+            accepted, to_keep = True, []
+
+        self.evaluations = [e for e, keep in zip(self.evaluations, to_keep) if keep]
+        self.individuals = [i for i, keep in zip(self.individuals, to_keep) if keep]
+        if accepted:
+            self.evaluations.append(evaluation)
+            self.individuals.append(inference_snapshot(candidate))
+        return accepted
@@ -1,18 +1,21 @@
 """Performance indicators for multi-objective RL algorithms.
 
 We mostly rely on pymoo for the computation of axiomatic indicators (HV and IGD), but some are customly made.
+The hypervolume of fronts with 2 to 4 objectives is computed exactly by `mo_utils.hypervolume`, which is much faster.
 """
-from copy import deepcopy
-from typing import Callable, List
+from typing import Callable, Dict, List, Union
 
 import numpy as np
 import numpy.typing as npt
 from pymoo.indicators.hv import HV
 from pymoo.indicators.igd import IGD
 
+from mo_utils.hypervolume import exact_hypervolume
+from mo_utils.pareto import get_non_pareto_dominated_mask_batched
+
 
 def hypervolume(ref_point: np.ndarray, points: List[npt.ArrayLike]) -> float:
-    """Computes the hypervolume metric for a set of points (value vectors) and a reference point (from Pymoo).
+    """Computes the hypervolume metric for a set of points (value vectors) and a reference point (from Pymoo above 4 objectives).
 
     Args:
         ref_point (np.ndarray): Reference point
@@ -21,6 +24,8 @@ def hypervolume(ref_point: np.ndarray, points: List[npt.ArrayLike]) -> float:
     Returns:
         float: Hypervolume metric
     """
+    if 2 <= len(ref_point) <= 4:
+        return exact_hypervolume(ref_point, points)
     return HV(ref_point=ref_point * -1)(np.array(points) * -1)
 
 
@@ -38,33 +43,36 @@ def igd(known_front: List[np.ndarray], current_estimate: List[np.ndarray]) -> fl
     return ind(np.array(current_estimate))
 
 
-def sparsity(front: List[np.ndarray]) -> float:
+def _utilities(fronts: np.ndarray, weights_set: np.ndarray, utility: Callable) -> np.ndarray:
+    """Utility of every point for every weight, of shape (..., num_weights, num_points) for fronts of shape (..., num_points, dim)."""
+    if utility is np.dot:
+        return np.asarray(weights_set, dtype=np.float64) @ np.swapaxes(fronts, -1, -2)
+    # custom utilities are called on (weight, point) pairs, broadcast over all the weights and points at once
+    return np.vectorize(utility, signature="(d),(d)->()")(np.asarray(weights_set)[:, None, :], fronts[..., None, :, :])
+
+
+def sparsity(front: Union[List[np.ndarray], np.ndarray]) -> Union[float, np.ndarray]:
     """Sparsity metric from PGMORL.
 
     Basically, the sparsity is the average distance between each point in the front.
 
     Args:
-        front: current pareto front to compute the sparsity on
+        front: current pareto front to compute the sparsity on, or a batch of fronts of the same size (num_fronts, num_points, dim)
 
     Returns:
-        float: sparsity metric
+        float: sparsity metric (one per front for a batch of fronts)
     """
-    if len(front) < 2:
-        return 0.0
-
-    sparsity_value = 0.0
-    m = len(front[0])
-    front = np.array(front)
-    for dim in range(m):
-        objs_i = np.sort(deepcopy(front.T[dim]))
-        for i in range(1, len(objs_i)):
-            sparsity_value += np.square(objs_i[i] - objs_i[i - 1])
-    sparsity_value /= len(front) - 1
+    front = np.asarray(front, dtype=np.float64)
+    if front.shape[-2 if front.ndim > 1 else 0] < 2:
+        return 0.0 if front.ndim < 3 else np.zeros(len(front))
 
-    return sparsity_value
+    gaps = np.diff(np.sort(front, axis=-2), axis=-2)
+    return np.sum(np.square(gaps), axis=(-2, -1)) / (front.shape[-2] - 1)
 
 
-def expected_utility(front: List[np.ndarray], weights_set: List[np.ndarray], utility: Callable = np.dot) -> float:
+def expected_utility(
+    front: Union[List[np.ndarray], np.ndarray], weights_set: List[np.ndarray], utility: Callable = np.dot
+) -> Union[float, np.ndarray]:
     """Expected Utility Metric.
 
     Expected utility of the policies on the PF for various weights.
@@ -72,19 +80,14 @@ def expected_utility(front: List[np.ndarray], weights_set: List[np.ndarray], uti
     Paper: L. M. Zintgraf, T. V. Kanters, D. M. Roijers, F. A. Oliehoek, and P. Beau, “Quality Assessment of MORL Algorithms: A Utility-Based Approach,” 2015.
 
     Args:
-        front: current pareto front to compute the eum on
+        front: current pareto front to compute the eum on, or a batch of fronts of the same size (num_fronts, num_points, dim)
         weights_set: weights to use for the utility computation
         utility: utility function to use (default: dot product)
 
     Returns:
-        float: eum metric
+        float: eum metric (one per front for a batch of fronts)
     """
-    maxs = []
-    for weights in weights_set:
-        scalarized_front = np.array([utility(weights, point) for point in front])
-        maxs.append(np.max(scalarized_front))
-
-    return np.mean(np.array(maxs), axis=0)
+    return np.mean(np.max(_utilities(np.asarray(front), weights_set, utility), axis=-1), axis=-1)
 
 
 def cardinality(front: List[np.ndarray]) -> float:
@@ -102,23 +105,67 @@ def cardinality(front: List[np.ndarray]) -> float:
 
 
 def maximum_utility_loss(
-    front: List[np.ndarray], reference_set: List[np.ndarray], weights_set: np.ndarray, utility: Callable = np.dot
-) -> float:
+    front: Union[List[np.ndarray], np.ndarray], reference_set: List[np.ndarray], weights_set: np.ndarray, utility: Callable = np.dot
+) -> Union[float, np.ndarray]:
     """Maximum Utility Loss Metric.
 
     Maximum utility loss of the policies on the PF for various weights.
     Paper: L. M. Zintgraf, T. V. Kanters, D. M. Roijers, F. A. Oliehoek, and P. Beau, “Quality Assessment of MORL Algorithms: A Utility-Based Approach,” 2015.
 
     Args:
-        front: current pareto front to compute the mul on
+        front: current pareto front to compute the mul on, or a batch of fronts of the same size (num_fronts, num_points, dim)
         reference_set: reference set (e.g. true Pareto front) to compute the mul on
         weights_set: weights to use for the utility computation
         utility: utility function to use (default: dot product)
 
     Returns:
-        float: mul metric
+        float: mul metric (one per front for a batch of fronts)
+    """
+    max_scalarized_values_ref = np.max(_utilities(np.asarray(reference_set), weights_set, utility), axis=-1)
+    max_scalarized_values = np.max(_utilities(np.asarray(front), weights_set, utility), axis=-1)
+    return np.max(max_scalarized_values_ref - max_scalarized_values, axis=-1)
+
+
+def multi_front_metrics(fronts: np.ndarray, ref_points: np.ndarray, weights_set: np.ndarray) -> Dict[str, np.ndarray]:
+    """Computes the Pareto fronts of several sets of value vectors and their hypervolume, sparsity, EUM and cardinality at once.
+
+    The value vectors of all sets (e.g. the returns of every evaluation weight on every test environment) are filtered and
+    scored together with array operations, instead of once per set with `filter_pareto_dominated`, `hypervolume`,
+    `sparsity`, `expected_utility` and `cardinality`.
+
+    Args:
+        fronts: value vectors, of shape (num_sets, num_points, num_objectives)
+        ref_points: hypervolume reference point, shared (num_objectives,) or one per set (num_sets, num_objectives)
+        weights_set: weights to use for the EUM computation, of shape (num_weights, num_objectives)
+
+    Returns:
+        Dict with the mask of the non-dominated points of each set ("non_dominated", shape (num_sets, num_points)) and
+        the "hypervolume", "sparsity", "eum" and "cardinality" of each front (shape (num_sets,)).
     """
-    max_scalarized_values_ref = [np.max([utility(weight, point) for point in reference_set]) for weight in weights_set]
-    max_scalarized_values = [np.max([utility(weight, point) for point in front]) for weight in weights_set]
-    utility_losses = [max_scalarized_values_ref[i] - max_scalarized_values[i] for i in range(len(max_scalarized_values))]
-    return np.max(utility_losses)
+    fronts = np.asarray(fronts, dtype=np.float64)
+    num_sets = len(fronts)
+    ref_points = np.broadcast_to(np.asarray(ref_points, dtype=np.float64), (num_sets, fronts.shape[-1]))
+    non_dominated = get_non_pareto_dominated_mask_batched(fronts)
+    card = non_dominated.sum(axis=1)
+
+    # dominated points are excluded with -inf utilities and nan coordinates (sorted last)
+    utilities = np.einsum("wd,snd->swn", np.asarray(weights_set, dtype=np.float64), fronts)
+    utilities = np.where(non_dominated[:, None], utilities, -np.inf)
+    eum = utilities.max(axis=2).mean(axis=1)
+
+    sorted_objs = np.sort(np.where(non_dominated[..., None], fronts, np.nan), axis=1)
+    gaps = np.nansum(np.square(np.diff(sorted_objs, axis=1)), axis=(1, 2))
+    sp = np.where(card > 1, gaps / np.maximum(card - 1, 1), 0.0)
+
+    hv = np.empty(num_sets)
+    hv_indicators = {}
+    for s in range(num_sets):
+        if 2 <= fronts.shape[-1] <= 4:
+            hv[s] = exact_hypervolume(ref_points[s], fronts[s][non_dominated[s]])
+            continue
+        key = ref_points[s].tobytes()
+        if key not in hv_indicators:
+            hv_indicators[key] = HV(ref_point=ref_points[s] * -1)
+        hv[s] = hv_indicators[key](fronts[s][non_dominated[s]] * -1)
+
+    return {"non_dominated": non_dominated, "hypervolume": hv, "sparsity": sp, "eum": eum, "cardinality": card}
@@ -1,8 +1,12 @@
 """General utils for the MORL baselines."""
+import hashlib
 import math
+import numbers
 import os
+from copy import deepcopy
 from typing import Callable, List
 
+import gymnasium as gym
 import numpy as np
 import torch as th
 
@@ -46,6 +50,152 @@ def unique_tol(a: List[np.ndarray], tol=1e-4) -> List[np.ndarray]:
     return list(a[~delete])
 
 
+def group_rows_by_weight(w: np.ndarray) -> List[tuple]:
+    """Groups the rows of a batch of weight vectors by distinct weight vector.
+
+    Args:
+        w: weight vectors, one per row (e.g. one per environment of a vectorized environment)
+
+    Returns:
+        List of (weight vector, indices of the rows using it), in order of first appearance.
+    """
+    w = np.atleast_2d(w)
+    unique_w, first_inds, inverse = np.unique(w, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return [(unique_w[j], np.flatnonzero(inverse == j)) for j in np.argsort(first_inds)]
+
+
+# attributes holding training-only state, which is not needed to act
+SNAPSHOT_EXCLUDED_ATTRIBUTES = (
+    "env",
+    "envs",
+    "replay_buffer",
+    "dynamics_buffer",
+    "buffer",
+    "batch",
+    "experience_replay",
+    "eval_cache",
+    "_train_pools",
+)
+
+
+def _is_excluded_from_snapshot(name, value) -> bool:
+    if isinstance(value, (gym.Env, gym.vector.VectorEnv, th.optim.Optimizer)):
+        return True
+    # primitives may be shared (e.g. interned ints), they must never be replaced
+    return name in SNAPSHOT_EXCLUDED_ATTRIBUTES and not isinstance(value, (numbers.Number, str, bytes, type(None)))
+
+
+def _walk_repo_objects(obj, visit: Callable, visited: set):
+    """Calls visit(owner, name, value) on the attributes of every object of this repo reachable from obj."""
+    if id(obj) in visited:
+        return
+    visited.add(id(obj))
+    if isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            _walk_repo_objects(item, visit, visited)
+    elif isinstance(obj, dict):
+        for item in obj.values():
+            _walk_repo_objects(item, visit, visited)
+    # instances of the classes of this repo, or of subclasses of them
+    elif hasattr(obj, "__dict__") and any(cls.__module__.split(".")[0] in ("algos", "mo_utils") for cls in type(obj).__mro__):
+        for name, value in list(vars(obj).items()):
+            if not visit(obj, name, value):
+                _walk_repo_objects(value, visit, visited)
+
+
+def inference_snapshot(agent):
+    """Deep copies an agent without its environments, replay buffers and optimizers, which are set to None in the copy.
+
+    The snapshot keeps everything needed to act (networks, weight support, conditioning commands, ...), so that it can
+    be evaluated (e.g. in another process) while the original agent keeps training.
+
+    Args:
+        agent: the agent to copy
+
+    Returns:
+        The snapshot of the agent.
+    """
+    # excluded objects are mapped to None in the deepcopy memo so they are never copied...
+    memo = {}
+
+    def _exclude(owner, name, value):
+        if _is_excluded_from_snapshot(name, value):
+            memo[id(value)] = None
+            return True
+        return False
+
+    _walk_repo_objects(agent, _exclude, set())
+    snapshot = deepcopy(agent, memo)
+
+    # ...except by objects implementing their own __deepcopy__, which may keep references to them
+    def _detach(owner, name, value):
+        if _is_excluded_from_snapshot(name, value):
+            setattr(owner, name, None)
+            return True
+        return False
+
+    _walk_repo_objects(snapshot, _detach, set())
+    return snapshot
+
+
+# bookkeeping counters, which change without changing how the policy acts
+FINGERPRINT_EXCLUDED_ATTRIBUTES = ("global_step", "num_episodes")
+
+
+def policy_fingerprint(policy) -> str:
+    """Hashes the parameters of a policy (networks, tensors, arrays and scalars reachable from it).
+
+    Environments and replay buffers are ignored (see `inference_snapshot`), as well as the counters in
+    `FINGERPRINT_EXCLUDED_ATTRIBUTES`, so the fingerprint only changes when something the policy acts with changes,
+    e.g. after a gradient step, or when its epsilon or weights are updated. State which is not an attribute of an object
+    of this repo (e.g. the state of a random number generator) is not hashed.
+
+    Args:
+        policy: the agent or policy to hash
+
+    Returns:
+        Hex digest of the parameters.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    visited = set()
+
+    def _update(name, value) -> bool:
+        if isinstance(value, th.nn.Module):
+            visited.add(id(value))
+            for key, tensor in value.state_dict().items():
+                digest.update(f"{name}.{key}".encode())
+                digest.update(tensor.detach().cpu().numpy().tobytes())
+            return True
+        if isinstance(value, th.Tensor):
+            value = value.detach().cpu().numpy()
+        if isinstance(value, np.ndarray):
+            digest.update(str(name).encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+            return True
+        if isinstance(value, (numbers.Number, np.generic, str, bytes)):
+            digest.update(f"{name}={value!r}".encode())
+            return True
+        return False
+
+    def _hash(owner, name, value):
+        if _is_excluded_from_snapshot(name, value) or name in FINGERPRINT_EXCLUDED_ATTRIBUTES:
+            return True
+        if _update(name, value):
+            return True
+        # arrays and networks stored in containers (e.g. a dict of Q-tables, a list of weight vectors)
+        if isinstance(value, dict):
+            for key, item in value.items():
+                _update(f"{name}[{key!r}]", item)
+        elif isinstance(value, (list, tuple)):
+            for i, item in enumerate(value):
+                _update(f"{name}[{i}]", item)
+        return False
+
+    _walk_repo_objects(policy, _hash, visited)
+    return digest.hexdigest()
+
+
 def make_gif(env, agent, weight: np.ndarray, fullpath: str, fps: int = 50, length: int = 300):
     """Render an episode and save it as a gif."""
     assert "rgb_array" in env.metadata["render_modes"], "Environment does not have rgb_array rendering."
@@ -1,9 +1,12 @@
 """Utilities related to weight vectors."""
 
+import hashlib
+import os
 from functools import lru_cache
 from typing import List, Optional
 
 import numpy as np
+import pymoo
 from pymoo.util.ref_dirs import get_reference_directions
 
 
@@ -35,18 +38,66 @@ def random_weights(
     return w
 
 
+def reference_directions_cache_dir() -> str:
+    """Directory of the reference directions cached by `reference_directions`.
+
+    It is set by the MORL_CACHE_DIR environment variable (default: ~/.cache/morl_generalization), e.g. to share the
+    cache between the workers of a sweep.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(os.environ.get("MORL_CACHE_DIR", os.path.join(cache_home, "morl_generalization")), "reference_directions")
+
+
+@lru_cache
+def reference_directions(dim: int, n: int, seed: int = 42, method: str = "energy") -> np.ndarray:
+    """Reference directions from pymoo, cached on disk across processes.
+
+    Optimizing the Riesz s-Energy directions takes seconds for a hundred weights in 3-4 objectives, so they are computed
+    once and stored in a file named after a hash of (method, dim, n, seed) and the pymoo version. Files are written
+    atomically so that concurrent processes can share the cache; if it is not writable, the directions are only
+    cached in memory.
+
+    Args:
+        dim: size of the weight vectors
+        n: number of weight vectors to generate
+        seed: random seed
+        method: name of the pymoo method, see https://pymoo.org/misc/reference_directions.html
+
+    Returns:
+        np.ndarray: Reference directions, of shape (n, dim)
+    """
+    key = hashlib.sha256(f"{method}|{dim}|{n}|{seed}|pymoo-{pymoo.__version__}".encode()).hexdigest()
+    path = os.path.join(reference_directions_cache_dir(), f"{key}.npy")
+    try:
+        return np.load(path)
+    except (OSError, ValueError): # not cached yet, or unreadable
+        pass
+
+    ref_dirs = get_reference_directions(method, dim, n, seed=seed)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, ref_dirs)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return ref_dirs
+
+
 @lru_cache
 def equally_spaced_weights(dim: int, n: int, seed: int = 42) -> List[np.ndarray]:
     """Generate weight vectors that are equally spaced in the weight simplex.
 
     It uses the Riesz s-Energy method from pymoo: https://pymoo.org/misc/reference_directions.html
+    The weights are cached on disk, see `reference_directions`.
 
     Args:
         dim: size of the weight vector
         n: number of weight vectors to generate
         seed: random seed
     """
-    return list(get_reference_directions("energy", dim, n, seed=seed))
+    return list(reference_directions(dim, n, seed=seed))
 
 
 def extrema_weights(dim: int) -> List[np.ndarray]:
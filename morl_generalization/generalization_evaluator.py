@@ -1,4 +1,9 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
 from typing import Dict, Optional, Tuple, List, Union
+import cloudpickle
 import numpy as np
 import gymnasium as gym
 from gymnasium.envs.registration import _find_spec
@@ -6,16 +11,16 @@ import mo_gymnasium as mo_gym
 import wandb
 import time
 
-from mo_utils.pareto import filter_pareto_dominated
-from mo_utils.performance_indicators import (
-    cardinality,
-    expected_utility,
-    hypervolume,
-    sparsity,
-)
+from mo_utils.evaluation import EvaluationCache, returns_converged
+from mo_utils.metrics_sink import Table, get_metrics_sink
+from mo_utils.pareto import get_non_pareto_dominated_mask_batched
+from mo_utils.performance_indicators import multi_front_metrics
+from mo_utils.utils import inference_snapshot
 from mo_utils.weights import equally_spaced_weights
+from morl_generalization.scheduler import EpisodeTask, EpisodeTaskScheduler
+from morl_generalization.table_store import AppendOnlyTableStore
 from morl_generalization.utils import make_test_envs
-from morl_generalization.wrappers import MOAsyncVectorEnv
+from morl_generalization.wrappers import MOAsyncVectorEnv, MOSyncVectorEnv
 from experiments.evaluation import get_minmax_values
 
 
@@ -33,11 +38,19 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
             record_video_ep_freq: Optional[int] = None,
             num_eval_weights: int = 100,
             num_eval_episodes: int = 5,
+            eval_episodes_tol: Optional[float] = None,
+            eval_weight_batch_size: int = 1,
+            envs_per_worker: int = 1,
             fixed_weights: List[List[float]] = None,
             save_weights: bool = False,
             save_metric: str = 'hypervolume',
             normalization: bool = True,
             recover_single_objective: bool = True,
+            async_eval: bool = False,
+            num_async_eval_workers: int = 1,
+            cache_evaluations: bool = False,
+            table_dir: Optional[str] = None,
+            table_export_freq: Optional[int] = None,
             **kwargs
         ):
         """Wrapper records generalization evaluation metrics for multi-objective reinforcement learning algorithms.
@@ -54,8 +67,22 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
             record_video_ep_freq: Episodic frequency of recording videos (preferably high number, if agent keeps dying, vectorised test environments will reset, resulting in more frequent video recordings)
             num_eval_weights: Number of weights to evaluate the agent on (for LS methods to condition on and for EUM calculation)
             num_eval_episodes: Number of episodes to average over for policy evaluation for each weight (total episodes = num_eval_weights * num_eval_episodes)
+            eval_episodes_tol: If set, the episodes of a weight on a test environment stop once the standard error of its average vector return is at most
+                this tolerance (after two episodes if they have identical returns), `num_eval_episodes` being the maximum number of episodes
+            eval_weight_batch_size: Number of weights K evaluated at once on each test environment. Each test environment is replicated K times so that
+                all K * num_test_envs observations go through a single batched `agent.eval` call (the agent must accept one weight per row).
+            envs_per_worker: Number of test sub-environments hosted by each worker process of the asynchronous vectorised test environments
             save_weights: Whether to save the best weights for each test environment
             save_metric: Metrics to save the best front (and weights if `save_weights` is set) for
+            async_eval: Whether to evaluate a snapshot of the agent in background processes while training continues. The metrics are logged
+                under the `global_step` of the snapshot once its evaluation is done (call `wait_for_background_evals` before closing wandb).
+            num_async_eval_workers: Number of background evaluation processes, each one with its own test environments
+            cache_evaluations: Whether to reuse the returns of the weights (or sub-policies) whose policy parameters did not change since
+                their last evaluation instead of running their episodes again
+            table_dir: Directory of the tables appended at every evaluation (best single-objective weights, fronts). Defaults to the
+                `eval_tables` folder of the wandb run, or to `eval_tables/<algo>/seed<seed>` without a wandb run.
+            table_export_freq: Number of evaluations between exports of the tables to wandb. They are only exported by
+                `wait_for_background_evals` (end of training) if None.
         """
         gym.utils.RecordConstructorArgs.__init__(
             self, 
@@ -69,6 +96,14 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
             save_metrics=save_metric, 
             normalization=normalization,
             recover_single_objective=recover_single_objective,
+            eval_weight_batch_size=eval_weight_batch_size,
+            eval_episodes_tol=eval_episodes_tol,
+            envs_per_worker=envs_per_worker,
+            async_eval=async_eval,
+            num_async_eval_workers=num_async_eval_workers,
+            cache_evaluations=cache_evaluations,
+            table_dir=table_dir,
+            table_export_freq=table_export_freq,
             **kwargs
         )
         super().__init__(env)
@@ -76,23 +111,28 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
 
         # ============ Evaluation Parameters ============
         self.test_env_names = test_envs
+        self.num_test_envs = len(test_envs)
+        assert eval_weight_batch_size >= 1, "eval_weight_batch_size must be a positive integer"
+        self.eval_weight_batch_size = eval_weight_batch_size
         gym_specs = [_find_spec(env_name) for env_name in test_envs]
+        # sub-environment e * K + k is the k-th replica of test environment e (only the first replica records videos).
+        # Replicas are interchangeable: each episode is seeded by its task when the sub-environment is reset (see `_start_tasks`)
         make_fn = [
-            lambda env_spec=env_spec: make_test_envs(
+            lambda env_spec=env_spec, replica=replica, algo_name=self.algo_name: make_test_envs(
                 env_spec, 
-                self.algo_name, 
+                algo_name, 
                 seed,
-                record_video=record_video,
+                record_video=record_video and replica == 0,
                 record_video_w_freq=record_video_w_freq,
                 record_video_ep_freq=record_video_ep_freq,
                 **kwargs
-            ) for env_spec in gym_specs
+            ) for env_spec in gym_specs for replica in range(self.eval_weight_batch_size)
         ]
 
         if async_envs:
-            self.test_envs = MOAsyncVectorEnv(make_fn, copy=False)
+            self.test_envs = MOAsyncVectorEnv(make_fn, copy=False, envs_per_worker=envs_per_worker)
         else:
-            self.test_envs = mo_gym.wrappers.vector.MOSyncVectorEnv(make_fn)
+            self.test_envs = MOSyncVectorEnv(make_fn)
 
         if fixed_weights:
             self.eval_weights = [np.array(w) for w in fixed_weights]
@@ -103,6 +143,7 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
 
         self.reward_dim = env.unwrapped.reward_space.shape[0]
         self.num_eval_episodes = num_eval_episodes
+        self.eval_episodes_tol = eval_episodes_tol
         self.normalization = normalization # whether to calculate normalised results
         self.recover_single_objective = recover_single_objective # whether to log single-objective rewards
 
@@ -114,18 +155,6 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
         if self.recover_single_objective:
             # should only be True if env provides `info['original_scalar_reward']` in `step` function
             print("Plotting single-objective rewards. Please make sure the environment provides `info['original_scalar_reward']` in the `step` function.")
-            self.best_single_objective_weights = [
-                wandb.Table(
-                    columns=["global_step"] + [f"objective_{j}" for j in range(1, self.reward_dim + 1)],
-                    data=[],
-                ) for _ in test_envs
-            ]
-            self.best_disc_single_objective_weights = [
-                wandb.Table(
-                    columns=["global_step"] + [f"objective_{j}" for j in range(1, self.reward_dim + 1)],
-                    data=[],
-                ) for _ in test_envs
-            ]
 
         # ============ Weights Saving ============
         self.save_weights = save_weights
@@ -133,104 +162,252 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
         self.best_metrics = -np.inf * np.ones(len(test_envs))
         self.seed = seed 
 
-    def eval_mo(
+        # ============ Evaluation Tables ============
+        self.table_dir = table_dir
+        self.table_export_freq = table_export_freq
+        self._tables = None # created on first use, once the wandb run is known
+        self._num_logged_evals = 0
+        self._num_exported_evals = 0
+
+        # ============ Evaluation Cache ============
+        self.eval_cache = EvaluationCache() if cache_evaluations else None
+
+        # ============ Background Evaluation ============
+        self.async_eval = async_eval
+        self.num_async_eval_workers = num_async_eval_workers
+        self._eval_pool = None
+        self._pending_evals = deque() # (future, snapshot, ref_point, global_step), in submission order
+        # background workers build the same evaluator, minus the background evaluation and logging parts
+        self._background_evaluator_kwargs = dict(
+            algo_name=algo_name,
+            seed=seed,
+            test_envs=test_envs,
+            algo_suffix=algo_suffix,
+            async_envs=async_envs,
+            record_video=record_video,
+            record_video_w_freq=record_video_w_freq,
+            record_video_ep_freq=record_video_ep_freq,
+            num_eval_weights=num_eval_weights,
+            num_eval_episodes=num_eval_episodes,
+            eval_episodes_tol=eval_episodes_tol,
+            eval_weight_batch_size=eval_weight_batch_size,
+            envs_per_worker=envs_per_worker,
+            fixed_weights=fixed_weights,
+            normalization=False,
+            recover_single_objective=recover_single_objective,
+            cache_evaluations=cache_evaluations,
+            **kwargs
+        )
+
+    def _agent_rows(self, active: np.ndarray) -> np.ndarray:
+        """Sub-environments whose observations are passed to `agent.eval`: the active ones, padded with an idle one when a single
+        sub-environment is left (agents treat `num_envs=1` as a single unbatched observation). Actions of the padding are dropped."""
+        if len(active) > 1 or self.test_envs.num_envs == 1:
+            return active
+        idle = np.flatnonzero(np.arange(self.test_envs.num_envs) != active[0])
+        return np.append(active, idle[0])
+
+    def _store_actions(self, prev_actions: Optional[np.ndarray], actions: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Records the last actions of the given sub-environments (passed as `prev_actions` to recurrent agents)."""
+        actions = np.asarray(actions)
+        if prev_actions is None:
+            prev_actions = np.zeros((self.test_envs.num_envs,) + actions.shape[1:], dtype=actions.dtype)
+        prev_actions[rows] = actions
+        return prev_actions
+
+    def _readjust_pcn_commands(self, agent, env_desired_returns, env_desired_horizons, active, r):
+        """Readjusts the PCN desired returns and horizons of the stepped sub-environments with their rewards."""
+        agent.set_desired_return_and_horizon(env_desired_returns[active], env_desired_horizons[active])
+        agent.readjust_desired_return_and_horizon(r)
+        env_desired_returns[active], env_desired_horizons[active] = agent.desired_return, agent.desired_horizon
+
+    def evaluate_weights(
         self,
         agent,
-        w: np.ndarray,
-        return_original_scalar=False # when `recover_single_objective` is set to True in the evaluation parameters and the environment's `step` function provides `info['original_scalar_reward']`.
+        weights: np.ndarray,
+        rep: int = 5,
+        return_original_scalar=False,
+        desired_returns: Optional[np.ndarray] = None,
+        desired_horizons: Optional[np.ndarray] = None,
+        policy_indices: Optional[np.ndarray] = None,
+        tol: Optional[float] = None,
     ) -> Tuple[np.ndarray, np.ndarray, Union[np.ndarray, None], Union[np.ndarray, None]]:
-        """Evaluates one episode of the agent in the vectorised test environments.
+        """Evaluates every weight `rep` times on every test environment and returns the average returns.
+
+        Episodes are scheduled as (test environment, weight, repetition) tasks: a sub-environment is reset with its next task
+        as soon as its episode ends, instead of waiting for the slowest sub-environment of the round. With a tolerance, the
+        remaining repetitions of a weight are dropped as soon as its returns converged, so the freed sub-environments move on.
 
         Args:
             agent: Agent
-            scalarization: scalarization function, taking weights and reward as parameters
-            w (np.ndarray): Weight vector
+            weights (np.ndarray): Weight vectors of shape (num_weights, reward_dim)
+            rep (int, optional): Number of episodes for averaging. Defaults to 5.
+            desired_returns (np.ndarray, optional): PCN desired return of each weight, shape (num_weights, reward_dim)
+            desired_horizons (np.ndarray, optional): PCN desired horizon of each weight, shape (num_weights, 1)
+            policy_indices (np.ndarray, optional): Sub-policy of the agent to follow for each weight (see `select_eval_policies` of nearest-policy agents)
+            tol (float, optional): Tolerance on the standard error of the average vector returns (see `returns_converged`), rep being the
+                maximum number of episodes. All `rep` episodes are run if None.
 
         Returns:
-            (np.ndarray, np.ndarray, np.ndarray, np.ndarray): Scalarized return, scalarized discounted return, vectorized return, vectorized discounted return. 
-            Each is an array where each element corresponds to a sub-environment in the vectorized environment.
+            (np.ndarray, np.ndarray, np.ndarray, np.ndarray): Avg vectorized return, Avg vectorized discounted return, Avg original scalar return,
+            Avg discounted original scalar return. Vector returns have shape (num_test_envs, num_weights, reward_dim), scalar returns (num_test_envs, num_weights).
         """
-        obs, _ = self.test_envs.reset(options={"weights": w, "step":agent.global_step}) # pass in the weight as an option in case video recording is enabled
-        done = np.array([False] * self.test_envs.num_envs)
-        vec_return = np.zeros((self.test_envs.num_envs, len(w)))
+        weights = np.asarray(weights)
+        num_envs = self.test_envs.num_envs
+        scheduler = EpisodeTaskScheduler(self.num_test_envs, self.eval_weight_batch_size, len(weights), rep)
+
+        all_vec_returns = np.zeros((self.num_test_envs, len(weights), rep, self.reward_dim))
+        all_disc_vec_returns = np.zeros_like(all_vec_returns)
+        all_original_returns = np.zeros((self.num_test_envs, len(weights), rep)) if return_original_scalar else None
+        all_disc_original_returns = np.zeros_like(all_original_returns) if return_original_scalar else None
+        completed = np.zeros((self.num_test_envs, len(weights), rep), dtype=bool)
+
+        # returns of the episodes currently running in each sub-environment
+        vec_return = np.zeros((num_envs, self.reward_dim))
         disc_vec_return = np.zeros_like(vec_return)
-        original_return = None
-        disc_original_return = None
-        if return_original_scalar:
-            original_return = np.zeros(self.test_envs.num_envs)
-            disc_original_return = np.zeros(self.test_envs.num_envs)
-        gamma = np.ones(self.test_envs.num_envs)
-        mask = np.ones(self.test_envs.num_envs, dtype=bool)
-
+        original_return = np.zeros(num_envs)
+        disc_original_return = np.zeros(num_envs)
+        gamma = np.ones(num_envs)
+        env_weights = np.tile(weights[0], (num_envs, 1)) # idle sub-environments keep their last weight
+        env_policies = np.full(num_envs, policy_indices[0]) if policy_indices is not None else None
+        policy_kwargs = {"policy_indices": env_policies} if policy_indices is not None else {}
+
+        env_desired_returns, env_desired_horizons = None, None
         if self.algo_name == 'pcn':
-            orig_desired_return, orig_desired_horizon = agent.desired_return.copy(), agent.desired_horizon.copy()
-
-        actions = None
-        while not all(done):
+            orig_desired_return, orig_desired_horizon = agent.desired_return, agent.desired_horizon
+            env_desired_returns = np.tile(desired_returns[0], (num_envs, 1)).astype(np.float32)
+            env_desired_horizons = np.tile(desired_horizons[0], (num_envs, 1)).astype(np.float32)
+
+        task_kwargs = dict(
+            weights=weights,
+            env_weights=env_weights,
+            desired_returns=desired_returns,
+            desired_horizons=desired_horizons,
+            env_desired_returns=env_desired_returns,
+            env_desired_horizons=env_desired_horizons,
+            policy_indices=policy_indices,
+            env_policies=env_policies,
+        )
+        obs = self._start_tasks(agent, scheduler, scheduler.assign(range(num_envs)), **task_kwargs)
+        # idle sub-environments (no task left) are no longer stepped, the agent only acts in the active ones
+        prev_actions = None
+        while not scheduler.finished:
+            active = np.flatnonzero(scheduler.active)
+            rows = self._agent_rows(active)
+            if self.algo_name == 'pcn':
+                agent.set_desired_return_and_horizon(env_desired_returns[rows], env_desired_horizons[rows])
+            if policy_indices is not None:
+                policy_kwargs["policy_indices"] = env_policies[rows]
             actions = agent.eval(
-                            obs, 
-                            np.tile(w, (self.test_envs.num_envs, 1)), 
-                            num_envs = self.test_envs.num_envs,
-                            disc_vec_return = disc_vec_return, # used for ESR only
-                            prev_actions = actions, # used for recurrent agents only
+                            obs[rows], 
+                            env_weights[rows], 
+                            num_envs = len(rows),
+                            disc_vec_return = disc_vec_return[rows], # used for ESR only
+                            prev_actions = prev_actions[rows] if prev_actions is not None else None, # used for recurrent agents only
+                            **policy_kwargs, # used for nearest-policy agents only
                         )
-            obs, r, terminated, truncated, info = self.test_envs.step(actions)
-
-            if return_original_scalar:
-                if 'original_scalar_reward' in info:
-                    original_return[mask] += info['original_scalar_reward'][mask]
-                    disc_original_return[mask] += gamma[mask] * info['original_scalar_reward'][mask]
-                
-                if 'final_info' in info: # done step in vectorized env moves info to final_info
-                    final_info = info['final_info']
-                    for i, finfo in enumerate(final_info):
-                        if mask[i] and finfo and 'original_scalar_reward' in finfo:
-                            original_return[i] += finfo['original_scalar_reward']
-                            disc_original_return[i] += gamma[i] * finfo['original_scalar_reward']
-                    
-            vec_return[mask] += r[mask]
-            disc_vec_return[mask] += gamma[mask, None] * r[mask]
-            gamma[mask] *= agent.gamma
-
-            mask &= ~terminated  # Update the mask
-            done |= np.logical_or(terminated, truncated)
-
-            if self.algo_name == 'pcn':
-                agent.readjust_desired_return_and_horizon(r)
+            prev_actions = self._store_actions(prev_actions, actions, rows)
+            obs[active], r, terminated, truncated, info = self.test_envs.step_subset(actions[:len(active)], active)
 
-        if self.algo_name == 'pcn': # reset the desired return and horizon to the original values for next repetition
-            agent.set_desired_return_and_horizon(orig_desired_return, orig_desired_horizon)
+            if return_original_scalar and 'original_scalar_reward' in info:
+                original_return[active] += info['original_scalar_reward']
+                disc_original_return[active] += gamma[active] * info['original_scalar_reward']
 
-        return (vec_return, disc_vec_return, original_return, disc_original_return)
+            vec_return[active] += r
+            disc_vec_return[active] += gamma[active, None] * r
+            gamma[active] *= agent.gamma
 
+            if self.algo_name == 'pcn':
+                self._readjust_pcn_commands(agent, env_desired_returns, env_desired_horizons, active, r)
+
+            ended = active[np.logical_or(terminated, truncated)]
+            if len(ended) == 0:
+                continue
+
+            for slot in ended:
+                task = scheduler.complete(slot)
+                completed[task] = True
+                all_vec_returns[task] = vec_return[slot]
+                all_disc_vec_returns[task] = disc_vec_return[slot]
+                if return_original_scalar:
+                    all_original_returns[task] = original_return[slot]
+                    all_disc_original_returns[task] = disc_original_return[slot]
+                env_idx, weight_idx = task.env_idx, task.weight_idx
+                if tol is not None and returns_converged(all_vec_returns[env_idx, weight_idx][completed[env_idx, weight_idx]], tol):
+                    scheduler.cancel(env_idx, weight_idx)
+
+            started = scheduler.assign(ended)
+            vec_return[ended] = 0.0
+            disc_vec_return[ended] = 0.0
+            original_return[ended] = 0.0
+            disc_original_return[ended] = 0.0
+            gamma[ended] = 1.0
+            if started:
+                obs = self._start_tasks(agent, scheduler, started, prev_actions=prev_actions, **task_kwargs)
+
+        if self.algo_name == 'pcn': # reset the desired return and horizon to the original values
+            agent.set_desired_return_and_horizon(orig_desired_return, orig_desired_horizon)
 
-    def policy_evaluation_mo(
-        self, agent, w: Optional[np.ndarray], rep: int = 5, return_original_scalar=False
-    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
-        """Evaluates the value of a policy by running the policy for multiple episodes. Returns the average returns.
+        # returns of the dropped repetitions are left to zero
+        num_episodes = completed.sum(axis=2)
+        return (
+            all_vec_returns.sum(axis=2) / num_episodes[..., None],
+            all_disc_vec_returns.sum(axis=2) / num_episodes[..., None],
+            all_original_returns.sum(axis=2) / num_episodes if return_original_scalar else None,
+            all_disc_original_returns.sum(axis=2) / num_episodes if return_original_scalar else None,
+        )
 
-        Args:
-            agent: Agent
-            w (np.ndarray): Weight vector
-            scalarization: scalarization function, taking reward and weight as parameters
-            rep (int, optional): Number of episodes for averaging. Defaults to 5.
+    def _start_tasks(
+        self,
+        agent,
+        scheduler,
+        slots,
+        weights,
+        env_weights,
+        desired_returns=None,
+        desired_horizons=None,
+        env_desired_returns=None,
+        env_desired_horizons=None,
+        policy_indices=None,
+        env_policies=None,
+        prev_actions=None,
+    ):
+        """Resets the given sub-environments for the tasks they were just assigned and returns the new batch of observations.
 
-        Returns:
-            (float, float, np.ndarray, np.ndarray): Avg scalarized return, Avg scalarized discounted return, Avg vectorized return, Avg vectorized discounted return
+        Each episode is seeded by its (weight, repetition) task, so that its returns depend neither on the sub-environment
+        running it nor on the episodes run before, i.e. not on `eval_weight_batch_size`. The last actions of the sub-environments
+        (`prev_actions`, if any) are zeroed, so that recurrent agents do not start the new episodes with the actions of the
+        previous ones.
         """
-        evals = [self.eval_mo(agent=agent, w=w, return_original_scalar=return_original_scalar) for _ in range(rep)]
-        avg_vec_return = np.mean([eval[0] for eval in evals], axis=0)
-        avg_disc_vec_return = np.mean([eval[1] for eval in evals], axis=0)
-        avg_original_return = np.mean([eval[2] for eval in evals], axis=0) if evals[0][2] is not None else None
-        avg_disc_original_return = np.mean([eval[3] for eval in evals], axis=0) if evals[0][3] is not None else None
+        if prev_actions is not None:
+            prev_actions[slots] = 0
+        task_weights = np.full(self.test_envs.num_envs, -1)
+        seeds = [None] * self.test_envs.num_envs
+        for slot in slots:
+            task = scheduler.tasks[slot]
+            weight_idx = task.weight_idx
+            task_weights[slot] = weight_idx
+            seeds[slot] = self._episode_seed(task)
+            env_weights[slot] = weights[weight_idx]
+            if policy_indices is not None:
+                env_policies[slot] = policy_indices[weight_idx]
+            if self.algo_name == 'pcn':
+                env_desired_returns[slot] = desired_returns[weight_idx]
+                env_desired_horizons[slot] = desired_horizons[weight_idx]
+
+        # sub-environments are reset once per distinct weight, which is passed as an option in case video recording is enabled
+        obs = None
+        for weight_idx in np.unique(task_weights[slots]):
+            obs, _ = self.test_envs.reset(
+                seed=seeds,
+                options={"reset_mask": task_weights == weight_idx, "weights": weights[weight_idx], "step": agent.global_step},
+            )
+        return obs
+
+    def _episode_seed(self, task: EpisodeTask) -> int:
+        """Seed of the test environment reset of an evaluation episode, the same on every test environment."""
+        return int(np.random.SeedSequence((self.seed, task.weight_idx, task.rep)).generate_state(1)[0])
 
-        return (
-            avg_vec_return,
-            avg_disc_vec_return,
-            avg_original_return,
-            avg_disc_original_return
-        )
-    
     def log_all_multi_policy_metrics(
         self,
         agent,
@@ -239,7 +416,8 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
         reward_dim: int,
         global_step: int,
         idstr: str = "",
-        log_metrics: List[str] = ['hypervolume', 'sparsity', 'eum', 'cardinality']
+        log_metrics: List[str] = ['hypervolume', 'sparsity', 'eum', 'cardinality'],
+        front_metrics: Optional[Dict[str, np.ndarray]] = None,
     ):
         """Logs all metrics for multi-policy training (one for each test environment).
 
@@ -256,19 +434,18 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
             global_step: global step for logging
             ref_front: reference front, if known
             idstr: for identifying MOO metrics of different types, e.g. "discounted_", "normalised_"
+            front_metrics: `multi_front_metrics` of current_fronts, if already computed
         """
-        for i, current_front in enumerate(current_fronts):
-            filtered_front = list(filter_pareto_dominated(current_front))
-            hv = hypervolume(hv_ref_point, filtered_front)
-            sp = sparsity(filtered_front)
-            eum = expected_utility(filtered_front, weights_set=self.eval_weights)
-            card = cardinality(filtered_front)
+        if front_metrics is None:
+            front_metrics = multi_front_metrics(current_fronts, hv_ref_point, np.array(self.eval_weights))
 
+        for i, current_front in enumerate(current_fronts):
+            filtered_front = current_front[front_metrics["non_dominated"][i]]
             metrics = {
-                'hypervolume': hv,
-                'sparsity': sp,
-                'eum': eum,
-                'cardinality': card
+                'hypervolume': front_metrics["hypervolume"][i],
+                'sparsity': front_metrics["sparsity"][i],
+                'eum': front_metrics["eum"][i],
+                'cardinality': int(front_metrics["cardinality"][i])
             }
 
             metrics_to_log = {}
@@ -278,21 +455,21 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
                     metrics_to_log[f"eval/{idstr}{metric}/{self.test_env_names[i]}"] = metrics[metric]
             
             metrics_to_log["global_step"] = global_step
-            wandb.log(metrics_to_log, commit=False)
+            get_metrics_sink().log(metrics_to_log, commit=False)
 
-            front = wandb.Table(
+            front = Table(
                 columns=[f"objective_{j}" for j in range(1, reward_dim + 1)],
                 data=[p.tolist() for p in filtered_front],
             )
-            wandb.log({f"eval/{idstr}front/{self.test_env_names[i]}": front})
+            get_metrics_sink().log({f"eval/{idstr}front/{self.test_env_names[i]}": front})
 
             if metrics[self.save_metric] > self.best_metrics[i]:
                 self.best_metrics[i] = metrics[self.save_metric]
-                best_front = wandb.Table(
+                best_front = Table(
                     columns=[f"objective_{j}" for j in range(1, reward_dim + 1)],
                     data=[p.tolist() for p in filtered_front],
                 )
-                wandb.log({f"eval/best_{self.save_metric}_front/{self.test_env_names[i]}": best_front})
+                get_metrics_sink().log({f"eval/best_{self.save_metric}_front/{self.test_env_names[i]}": best_front})
                 if self.save_weights:
                     agent.save(
                         save_dir=f"weights/{self.algo_name}/best_{self.save_metric}/seed{self.seed}/{self.test_env_names[i]}",
@@ -324,7 +501,7 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
                     f"eval/vec_{j}/{self.test_env_names[i]}": vec_return[i][j],
                     f"eval/discounted_vec_{j}/{self.test_env_names[i]}": disc_vec_return[i][j]
                 })
-            wandb.log(metrics)
+            get_metrics_sink().log(metrics)
 
     def get_normalized_vec_returns(self, all_vec_returns, minmax_range):
         minmax_array = np.array([minmax_range[str(i)] for i in range(all_vec_returns.shape[-1])])
@@ -341,55 +518,206 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
     def eval(self, agent, ref_point, global_step, **kwargs):
         print('Evaluating agent on test environments at step: ', global_step)
         start_time = time.time()
+        desired_returns, desired_horizons = self._pcn_commands(agent)
 
-        vec_returns = []
-        disc_vec_returns = []
-        original_scalar_returns = []
-        disc_original_scalar_returns = []
+        if self.async_eval:
+            self._submit_background_eval(agent, ref_point, global_step, desired_returns, desired_horizons)
+            return
 
-        if self.algo_name == 'pcn':
-            n = min(len(self.eval_weights), len(agent.experience_replay))
-            episodes = agent._nlargest(n)
-            desired_returns, desired_horizons = list(zip(*[(e[2][0].reward, len(e[2])) for e in episodes]))
-            desired_returns = np.float32(desired_returns)
-            desired_horizons = np.float32(desired_horizons)
-
-            # for fair comparison, repeat the returns and horizons to match the number of eval_weights
-            if n < len(self.eval_weights):
-                repeat_factor = int(np.ceil(len(self.eval_weights) / n))
-                desired_returns = np.repeat(desired_returns, repeat_factor, axis=0)[:len(self.eval_weights)]
-                desired_horizons = np.repeat(desired_horizons, repeat_factor, axis=0)[:len(self.eval_weights)]
-            
-            desired_horizons = np.expand_dims(desired_horizons, axis=-1)
-            desired_horizons = np.tile(desired_horizons, (self.test_envs.num_envs, 1, 1))
-            desired_returns = np.tile(desired_returns, (self.test_envs.num_envs, 1, 1))
+        results = self.collect(agent, desired_returns, desired_horizons)
+        self._log_evaluation(agent, results, ref_point, global_step)
+        print(f"Time taken to complete evaluation: {(time.time() - start_time):.2f} seconds")
 
-        for i, ew in enumerate(self.eval_weights):
-            if self.algo_name == 'pcn':
-                agent.set_desired_return_and_horizon(desired_returns[:, i], desired_horizons[:, i])
-            
-            (
-                vec_return, 
-                disc_vec_return,
-                original_scalar_return,
-                disc_original_scalar_return
-            ) = self.policy_evaluation_mo(agent, ew, rep=self.num_eval_episodes, return_original_scalar=self.recover_single_objective)
-            vec_returns.append(vec_return)
-            disc_vec_returns.append(disc_vec_return)
-            if self.recover_single_objective:
-                original_scalar_returns.append(original_scalar_return)
-                disc_original_scalar_returns.append(disc_original_scalar_return)
-
-        mean_vec_returns = np.mean(vec_returns, axis=0)
-        mean_disc_vec_returns = np.mean(disc_vec_returns, axis=0)
+    def _pcn_commands(self, agent) -> Tuple[Union[np.ndarray, None], Union[np.ndarray, None]]:
+        """Desired returns and horizons (one per evaluation weight) PCN is conditioned on, None for the other algorithms."""
+        if self.algo_name != 'pcn':
+            return None, None
+
+        n = min(len(self.eval_weights), len(agent.experience_replay))
+        episodes = agent._nlargest(n)
+        desired_returns, desired_horizons = list(zip(*[(e[2][0].reward, len(e[2])) for e in episodes]))
+        desired_returns = np.float32(desired_returns)
+        desired_horizons = np.float32(desired_horizons)
+
+        # for fair comparison, repeat the returns and horizons to match the number of eval_weights
+        if n < len(self.eval_weights):
+            repeat_factor = int(np.ceil(len(self.eval_weights) / n))
+            desired_returns = np.repeat(desired_returns, repeat_factor, axis=0)[:len(self.eval_weights)]
+            desired_horizons = np.repeat(desired_horizons, repeat_factor, axis=0)[:len(self.eval_weights)]
+        
+        desired_horizons = np.expand_dims(desired_horizons, axis=-1)
+        return desired_returns, desired_horizons
+
+    def collect(self, agent, desired_returns=None, desired_horizons=None):
+        """Runs the evaluation episodes of all evaluation weights on all test environments.
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray, np.ndarray): see `evaluate_weights`
+        """
+        weights = np.array(self.eval_weights)
+        policy_indices = agent.select_eval_policies(weights) if hasattr(agent, "select_eval_policies") else None
+        if policy_indices is None:
+            if self.eval_cache is None:
+                return self.evaluate_weights(
+                    agent,
+                    weights,
+                    rep=self.num_eval_episodes,
+                    tol=self.eval_episodes_tol,
+                    return_original_scalar=self.recover_single_objective,
+                    desired_returns=desired_returns,
+                    desired_horizons=desired_horizons,
+                )
+
+            fingerprint = self.eval_cache.fingerprint(agent)
+            # PCN's returns depend on its commands rather than on the weights
+            commands = [()] * len(weights) if desired_returns is None else [
+                (returns.tobytes(), horizon.tobytes()) for returns, horizon in zip(desired_returns, desired_horizons)
+            ]
+            keys = [self._cache_key(w, *command) for w, command in zip(weights, commands)]
+            return self._evaluate_uncached(
+                agent,
+                weights,
+                [fingerprint] * len(weights),
+                keys,
+                desired_returns=desired_returns,
+                desired_horizons=desired_horizons,
+            )
+
+        # the agent follows one of a few sub-policies whose rollouts do not depend on the weight,
+        # so each distinct sub-policy is evaluated once (with the first weight mapped to it) and its returns are shared
+        distinct_policies, first_weights, weight_to_policy = np.unique(policy_indices, return_index=True, return_inverse=True)
+        if self.eval_cache is None:
+            results = self.evaluate_weights(
+                agent,
+                weights[first_weights],
+                rep=self.num_eval_episodes,
+                tol=self.eval_episodes_tol,
+                return_original_scalar=self.recover_single_objective,
+                policy_indices=distinct_policies,
+            )
+        else:
+            results = self._evaluate_uncached(
+                agent,
+                weights[first_weights],
+                [self.eval_cache.fingerprint(agent.get_eval_policy(i)) for i in distinct_policies],
+                [self._cache_key(None)] * len(distinct_policies),
+                policy_indices=distinct_policies,
+            )
+        return tuple(r[:, weight_to_policy.reshape(-1)] if r is not None else None for r in results)
+
+    def _cache_key(self, w: Optional[np.ndarray], *extra) -> tuple:
+        """Key of the returns of weight w in the evaluation cache (w is None for sub-policies, whose rollouts do not depend on it)."""
+        w = None if w is None else np.asarray(w, dtype=np.float64).tobytes()
+        return (
+            tuple(self.test_env_names), self.seed, w, self.num_eval_episodes, self.eval_episodes_tol, self.recover_single_objective
+        ) + extra
+
+    def _evaluate_uncached(self, agent, weights: np.ndarray, fingerprints: List[str], keys: List[tuple], **weight_kwargs):
+        """Evaluates the weights whose returns are not in the evaluation cache and reads the others from it.
+
+        Args:
+            agent: Agent to evaluate
+            weights: Weights to evaluate
+            fingerprints: Fingerprint of the policy evaluated with each weight
+            keys: Cache key of each weight (see `_cache_key`)
+            weight_kwargs: Per-weight arguments of `evaluate_weights` (desired returns, policy indices, ...), None if unused
+
+        Returns:
+            (np.ndarray, np.ndarray, np.ndarray, np.ndarray): see `evaluate_weights`
+        """
+        cached = [self.eval_cache.lookup(fingerprint, key) for fingerprint, key in zip(fingerprints, keys)]
+        missing = np.array([i for i, result in enumerate(cached) if result is None], dtype=int)
+        if len(missing) > 0:
+            results = self.evaluate_weights(
+                agent,
+                weights[missing],
+                rep=self.num_eval_episodes,
+                tol=self.eval_episodes_tol,
+                return_original_scalar=self.recover_single_objective,
+                **{name: value[missing] if value is not None else None for name, value in weight_kwargs.items()},
+            )
+            for j, i in enumerate(missing):
+                cached[i] = tuple(r[:, j] if r is not None else None for r in results)
+                self.eval_cache.store(fingerprints[i], keys[i], cached[i])
+        return tuple(
+            np.stack([result[k] for result in cached], axis=1) if cached[0][k] is not None else None for k in range(4)
+        )
+
+    def _submit_background_eval(self, agent, ref_point, global_step, desired_returns, desired_horizons):
+        """Evaluates a snapshot of the agent in a background process. Finished evaluations are logged in submission order."""
+        if self._eval_pool is None:
+            self._eval_pool = ProcessPoolExecutor(
+                max_workers=self.num_async_eval_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_background_evaluator,
+                initargs=(self.unwrapped.spec.id, self._background_evaluator_kwargs),
+            )
+
+        snapshot = inference_snapshot(agent)
+        payload = cloudpickle.dumps((snapshot, desired_returns, desired_horizons))
+        future = self._eval_pool.submit(_collect_in_background, payload)
+        self._pending_evals.append((future, snapshot, ref_point, global_step))
+
+        # at most one snapshot waiting per worker, otherwise training would outpace the evaluation indefinitely
+        self._log_background_evals(max_pending=self.num_async_eval_workers)
+
+    def _log_background_evals(self, max_pending: Optional[int] = None):
+        """Logs the finished background evaluations, waiting for the oldest ones while more than `max_pending` are left."""
+        while self._pending_evals:
+            future, snapshot, ref_point, global_step = self._pending_evals[0]
+            if not future.done() and (max_pending is None or len(self._pending_evals) <= max_pending):
+                break
+            results = future.result()
+            self._pending_evals.popleft()
+            print('Logging background evaluation of step: ', global_step)
+            self._log_evaluation(snapshot, results, ref_point, global_step)
+
+    def wait_for_background_evals(self):
+        """Waits for all background evaluations and logs them (no-op when `async_eval` is False), then exports the evaluation tables to wandb."""
+        self._log_background_evals(max_pending=0)
+        self._export_tables()
+
+    def _export_tables(self):
+        """Exports the evaluation tables to wandb, unless no evaluation was logged since the last export."""
+        if self._tables is not None and self._num_exported_evals < self._num_logged_evals:
+            self._tables.export(prefix="eval/")
+            self._num_exported_evals = self._num_logged_evals
+
+    @property
+    def tables(self) -> AppendOnlyTableStore:
+        """Append-only store of the tables growing with every evaluation (see `table_dir`)."""
+        if self._tables is None:
+            table_dir = self.table_dir
+            if table_dir is None:
+                table_dir = os.path.join(wandb.run.dir, "eval_tables") if wandb.run is not None else f"eval_tables/{self.algo_name}/seed{self.seed}"
+            self._tables = AppendOnlyTableStore(table_dir)
+        return self._tables
+
+    def close(self):
+        self.wait_for_background_evals()
+        if self._eval_pool is not None:
+            self._eval_pool.shutdown()
+            self._eval_pool = None
+        self.test_envs.close()
+        super().close()
+
+    def _log_evaluation(self, agent, results, ref_point, global_step):
+        """Logs the metrics of the returns collected by `collect` on the given agent."""
+        (
+            vec_returns, # (num_test_envs, num_eval_weights, reward_dim)
+            disc_vec_returns,
+            original_scalar_returns, # (num_test_envs, num_eval_weights)
+            disc_original_scalar_returns
+        ) = results
+
+        mean_vec_returns = np.mean(vec_returns, axis=1)
+        mean_disc_vec_returns = np.mean(disc_vec_returns, axis=1)
         
         # Recover single-objective reward
         # Ideally, we want to evaluate using the exact weight used by the single-objective environment. However, each MORL algorithm 
         # interprets the scale of the weights differently (especially if there's adaptive normalisation) so it's hard to recover the exact weight.
         # So, best compromise would be to use the max original scalar reward across multiple evaluation/weights.
         if self.recover_single_objective:
-            original_scalar_returns = np.stack(original_scalar_returns, axis=1)
-            disc_original_scalar_returns = np.stack(disc_original_scalar_returns, axis=1)
             # Calculate the index of the maximum single-objective return for each environment
             max_original_indices = np.argmax(original_scalar_returns, axis=1)
             max_disc_original_indices = np.argmax(disc_original_scalar_returns, axis=1)
@@ -405,23 +733,17 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
                     f"eval/single_objective_discounted_return/{self.test_env_names[i]}": max_disc_original_scalar_returns[i],
                     "global_step": global_step
                 }
-                wandb.log(metrics)
+                get_metrics_sink().log(metrics)
 
-                new_best_weight = [global_step] + best_weight.tolist()
-                new_best_disc_weight = [global_step] + best_disc_weight.tolist()
-                self.best_single_objective_weights[i].add_data(*new_best_weight)
-                self.best_disc_single_objective_weights[i].add_data(*new_best_disc_weight)
-
-                # workaround: have to duplicate the table in order to update it on wandb api
-                # see https://github.com/wandb/wandb/issues/2981
-                new_table = wandb.Table(
-                    columns=self.best_single_objective_weights[i].columns, data=self.best_single_objective_weights[i].data
+                objective_columns = ["global_step"] + [f"objective_{j}" for j in range(1, self.reward_dim + 1)]
+                self.tables.append(
+                    f"best_single_objective_weights/{self.test_env_names[i]}", objective_columns, [[global_step] + best_weight.tolist()]
                 )
-                new_disc_table = wandb.Table(
-                    columns=self.best_disc_single_objective_weights[i].columns, data=self.best_disc_single_objective_weights[i].data
+                self.tables.append(
+                    f"best_discounted_single_objective_weights/{self.test_env_names[i]}",
+                    objective_columns,
+                    [[global_step] + best_disc_weight.tolist()],
                 )
-                wandb.log({f"eval/best_single_objective_weights/{self.test_env_names[i]}": new_table})
-                wandb.log({f"eval/best_discounted_single_objective_weights/{self.test_env_names[i]}": new_disc_table})
 
         self._report(
             mean_vec_returns,
@@ -429,17 +751,35 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
             global_step=global_step
         )
 
-        vec_returns = np.stack(vec_returns, axis=1)
-        disc_vec_returns = np.stack(disc_vec_returns, axis=1)
-        
         # Undiscounted front
+        non_dominated = get_non_pareto_dominated_mask_batched(vec_returns)
         for i, current_front in enumerate(vec_returns):
-            filtered_front = list(filter_pareto_dominated(current_front))
-            front = wandb.Table(
+            filtered_front = current_front[non_dominated[i]]
+            front = Table(
                 columns=[f"objective_{j}" for j in range(1, self.reward_dim + 1)],
                 data=[p.tolist() for p in filtered_front],
             )
-            wandb.log({f"eval/front/{self.test_env_names[i]}": front})
+            get_metrics_sink().log({f"eval/front/{self.test_env_names[i]}": front})
+            self.tables.append(
+                f"front_history/{self.test_env_names[i]}",
+                ["global_step"] + [f"objective_{j}" for j in range(1, self.reward_dim + 1)],
+                [[global_step] + p.tolist() for p in filtered_front],
+            )
+
+        # the metrics of the discounted and normalized fronts of all test environments are computed in a single pass
+        fronts = [disc_vec_returns]
+        ref_points = [np.broadcast_to(ref_point, (self.num_test_envs, self.reward_dim))]
+        if self.normalization:
+            # currently only normalizing using discounted vec returns, current minmax ranges cannot be applied to undiscounted returns!
+            normalized_returns = np.empty_like(disc_vec_returns)
+            for env_idx, env in enumerate(self.test_env_names):
+                minmax_range = self.minmax_ranges[env]
+                disc_vec_return_for_env = disc_vec_returns[env_idx]
+                normalized_returns_for_env = self.get_normalized_vec_returns(disc_vec_return_for_env, minmax_range)
+                normalized_returns[env_idx] = normalized_returns_for_env
+            fronts.append(normalized_returns)
+            ref_points.append(np.zeros((self.num_test_envs, self.reward_dim))) # use origin as reference point for normalised metrics
+        front_metrics = multi_front_metrics(np.concatenate(fronts), np.concatenate(ref_points), np.array(self.eval_weights))
 
         # Discounted MOO metrics
         self.log_all_multi_policy_metrics(
@@ -448,30 +788,45 @@ class MORLGeneralizationEvaluator(gym.Wrapper, gym.utils.RecordConstructorArgs):
             hv_ref_point=ref_point,
             reward_dim=self.reward_dim,
             global_step=global_step,
-            idstr="discounted_"
+            idstr="discounted_",
+            front_metrics={name: values[:self.num_test_envs] for name, values in front_metrics.items()},
         )
 
         # Normalized MOO metrics
         if self.normalization:
-            # currently only normalizing using discounted vec returns, current minmax ranges cannot be applied to undiscounted returns!
-            normalized_returns = np.empty_like(disc_vec_returns)
-            for env_idx, env in enumerate(self.test_env_names):
-                minmax_range = self.minmax_ranges[env]
-                disc_vec_return_for_env = disc_vec_returns[env_idx]
-                normalized_returns_for_env = self.get_normalized_vec_returns(disc_vec_return_for_env, minmax_range)
-                normalized_returns[env_idx] = normalized_returns_for_env
-
             self.log_all_multi_policy_metrics(
                 agent=agent,
                 current_fronts=normalized_returns,
-                hv_ref_point=np.zeros(self.reward_dim), # use origin as reference point for normalised metrics
+                hv_ref_point=np.zeros(self.reward_dim),
                 reward_dim=self.reward_dim,
                 global_step=global_step,
                 idstr="normalized_",
-                log_metrics=["hypervolume", "eum"]
+                log_metrics=["hypervolume", "eum"],
+                front_metrics={name: values[self.num_test_envs:] for name, values in front_metrics.items()},
             )
 
-        print(f"Time taken to complete evaluation: {(time.time() - start_time):.2f} seconds")
+        self._num_logged_evals += 1
+        if self.table_export_freq is not None and self._num_logged_evals % self.table_export_freq == 0:
+            self._export_tables()
+
+
+# evaluator of the background evaluation processes
+_background_evaluator = None
+
+
+def _init_background_evaluator(env_id: str, evaluator_kwargs: dict):
+    global _background_evaluator
+    from envs.register_envs import register_envs
+
+    register_envs()
+    _background_evaluator = MORLGeneralizationEvaluator(mo_gym.make(env_id), **evaluator_kwargs)
+
+
+def _collect_in_background(payload: bytes):
+    # the snapshot is serialized with cloudpickle since agents may hold lambdas (e.g. MORL/D distance metric)
+    agent, desired_returns, desired_horizons = cloudpickle.loads(payload)
+    return _background_evaluator.collect(agent, desired_returns, desired_horizons)
+
 
 def make_generalization_evaluator(env, args) -> MORLGeneralizationEvaluator:
     env = MORLGeneralizationEvaluator(
@@ -0,0 +1,86 @@
+from collections import deque
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+
+class EpisodeTask(NamedTuple):
+    """A single evaluation episode: test environment, index of the evaluated weight and repetition."""
+    env_idx: int
+    weight_idx: int
+    rep: int
+
+
+class EpisodeTaskScheduler:
+    """Distributes evaluation episodes over the sub-environments (slots) of a vectorized test environment.
+
+    Every (test environment, weight, repetition) triple is a task. Slot `s` runs the tasks of test environment
+    `s // slots_per_env` and pulls its next task as soon as its current episode ends, so that the evaluation time
+    depends on the total number of steps rather than on the longest episode of each round.
+    """
+
+    def __init__(self, num_test_envs: int, slots_per_env: int, num_weights: int, num_reps: int):
+        """
+        Args:
+            num_test_envs: Number of test environments
+            slots_per_env: Number of sub-environments (replicas) of each test environment
+            num_weights: Number of weights to evaluate
+            num_reps: Number of episodes per weight
+        """
+        self.num_test_envs = num_test_envs
+        self.slots_per_env = slots_per_env
+        self.num_slots = num_test_envs * slots_per_env
+        self.queues = [
+            deque(EpisodeTask(env_idx, weight_idx, rep) for weight_idx in range(num_weights) for rep in range(num_reps))
+            for env_idx in range(num_test_envs)
+        ]
+        self.tasks: List[Optional[EpisodeTask]] = [None] * self.num_slots
+
+    def env_of(self, slot: int) -> int:
+        """Test environment run by the given slot."""
+        return slot // self.slots_per_env
+
+    @property
+    def active(self) -> np.ndarray:
+        """Boolean mask of the slots currently running a task."""
+        return np.array([task is not None for task in self.tasks], dtype=bool)
+
+    @property
+    def finished(self) -> bool:
+        """Whether all tasks have been completed."""
+        return not any(self.queues) and all(task is None for task in self.tasks)
+
+    def assign(self, slots: Sequence[int]) -> List[int]:
+        """Pulls the next task of each given (idle) slot.
+
+        Returns:
+            The slots that received a new task. The other slots stay idle since their test environment has no task left.
+        """
+        started = []
+        for slot in slots:
+            assert self.tasks[slot] is None, f"Slot {slot} is still running {self.tasks[slot]}."
+            queue = self.queues[self.env_of(slot)]
+            if queue:
+                self.tasks[slot] = queue.popleft()
+                started.append(slot)
+        return started
+
+    def cancel(self, env_idx: int, weight_idx: int) -> int:
+        """Drops the queued repetitions of a weight on a test environment (e.g. once its returns converged).
+
+        Returns:
+            The number of dropped tasks. Repetitions already running are not affected.
+        """
+        queue = self.queues[env_idx]
+        remaining = [task for task in queue if task.weight_idx != weight_idx]
+        dropped = len(queue) - len(remaining)
+        if dropped:
+            self.queues[env_idx] = deque(remaining)
+        return dropped
+
+    def complete(self, slot: int) -> EpisodeTask:
+        """Marks the task of the given slot as done and returns it."""
+        task = self.tasks[slot]
+        assert task is not None, f"Slot {slot} is not running any task."
+        self.tasks[slot] = None
+        return task
@@ -0,0 +1,63 @@
+import csv
+import os
+from typing import Dict, List, Optional, Sequence
+
+from mo_utils.metrics_sink import Table, get_metrics_sink
+
+
+def _parse(value: str):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+class AppendOnlyTableStore:
+    """Local store of tables which grow with every evaluation (e.g. best weights per global step, fronts).
+
+    Each table is a CSV file under `root`, so logging an evaluation only appends its own rows instead of rebuilding
+    (and uploading) the whole table. The tables are sent to the metrics sink (wandb by default) with `export`, e.g.
+    every few evaluations.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory of the CSV files. Tables created by this store overwrite existing files.
+        """
+        self.root = root
+        self.columns: Dict[str, List[str]] = {}
+
+    def path(self, name: str) -> str:
+        """CSV file of the table (names may contain '/', e.g. one table per test environment)."""
+        return os.path.join(self.root, f"{name}.csv")
+
+    def append(self, name: str, columns: Sequence[str], rows: Sequence[Sequence]):
+        """Appends rows to a table, creating it with the given columns on first use."""
+        path = self.path(name)
+        new_table = name not in self.columns
+        if new_table:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.columns[name] = list(columns)
+        with open(path, "w" if new_table else "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_table:
+                writer.writerow(columns)
+            writer.writerows(rows)
+
+    def read(self, name: str) -> List[list]:
+        """Rows of a table."""
+        with open(self.path(name), newline="") as f:
+            reader = csv.reader(f)
+            next(reader)
+            return [[_parse(value) for value in row] for row in reader]
+
+    def export(self, prefix: str = "", names: Optional[Sequence[str]] = None):
+        """Logs the tables to the metrics sink (e.g. wandb), under `prefix + name`.
+
+        Args:
+            prefix: Prefix of the keys
+            names: Tables to export, all of them if None
+        """
+        for name in self.columns if names is None else names:
+            get_metrics_sink().log({f"{prefix}{name}": Table(columns=self.columns[name], data=self.read(name))})
@@ -4,40 +4,179 @@ from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 from copy import deepcopy
 
 import sys
+import time
+import ctypes
 import traceback
-import numpy as np
 import multiprocessing
-from multiprocessing import Array, Queue
+from multiprocessing import Queue, resource_tracker
 from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
 
 import gymnasium as gym
+import mo_gymnasium as mo_gym
 from gymnasium import error, logger
 from gymnasium.core import ActType, ObsType, RenderFrame
 from gymnasium.wrappers import FlattenObservation, FrameStackObservation
 from gymnasium.vector import AsyncVectorEnv
 from gymnasium.vector.async_vector_env import AsyncState
-from gymnasium.error import NoAsyncCallError
+from gymnasium.error import AlreadyPendingCallError, CustomSpaceError, NoAsyncCallError
 from gymnasium.spaces.utils import is_space_dtype_shape_equiv
 from gymnasium.vector.vector_env import AutoresetMode
-from gymnasium.vector.utils import create_empty_array, concatenate, write_to_shared_memory
+from gymnasium.vector.utils import (
+    CloudpickleWrapper,
+    batch_differing_spaces,
+    batch_space,
+    clear_mpi_env_vars,
+    concatenate,
+    create_empty_array,
+    create_shared_memory,
+    iterate,
+    read_from_shared_memory,
+    write_to_shared_memory,
+)
+
+
+
+class _ObservationSharedMemory(SharedMemory):
+    """Shared-memory block whose `close` leaves the mapping to the arrays still viewing it (e.g. observations returned with `copy=False`).
+
+    The block is then unmapped once these arrays are garbage collected, instead of `close` raising a `BufferError`.
+    """
+
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            pass
+
+
+class _NamedSharedArray:
+    """Array in named shared memory, with the `get_obj` interface of `multiprocessing.Array` used by gymnasium's shared-memory utilities.
+
+    Unlike `multiprocessing.Array`, it can be sent to worker processes that are already running, so the observation buffers
+    can be created once the workers have reported their observation space.
+    """
 
+    def __init__(self, typecode_or_type, size: int, name: Optional[str] = None):
+        self.typecode_or_type = typecode_or_type
+        self.size = size
+        itemsize = ctypes.sizeof(typecode_or_type) if isinstance(typecode_or_type, type) else np.dtype(typecode_or_type).itemsize
+        self.nbytes = size * itemsize
+        self.shm = _ObservationSharedMemory(name=name, create=name is None, size=max(self.nbytes, 1))
+
+    @classmethod
+    def Array(cls, typecode_or_type, size: int) -> "_NamedSharedArray":
+        """Mirrors `multiprocessing.Array`, so that the class can be given as `ctx` to `create_shared_memory`."""
+        return cls(typecode_or_type, size)
+
+    def get_obj(self) -> memoryview:
+        return self.shm.buf[:self.nbytes]
+
+    def __reduce__(self):
+        # the receiving process attaches to the same block
+        return type(self), (self.typecode_or_type, self.size, self.shm.name)
+
+
+def _iter_shared_arrays(shared_memory) -> List[_NamedSharedArray]:
+    """Flattens the (possibly nested) observation buffers created by `create_shared_memory`."""
+    if isinstance(shared_memory, dict):
+        return [array for memory in shared_memory.values() for array in _iter_shared_arrays(memory)]
+    if isinstance(shared_memory, tuple):
+        return [array for memory in shared_memory for array in _iter_shared_arrays(memory)]
+    return [] if shared_memory is None else [shared_memory]
+
+
+def _select_envs(batch, env_indices: np.ndarray):
+    """Selects the entries of the given sub-environments in a (possibly nested) batch of observations or infos."""
+    if isinstance(batch, dict):
+        return {key: _select_envs(value, env_indices) for key, value in batch.items()}
+    if isinstance(batch, tuple):
+        return tuple(_select_envs(value, env_indices) for value in batch)
+    return batch[env_indices]
+
+
+def _attach_step_buffers(specs: Dict[str, Tuple[str, Tuple[int, ...], str]]):
+    """Attaches the shared-memory step buffers created by :class:`MOAsyncVectorEnv` (see `_create_step_buffers`)."""
+    shms, buffers = [], {}
+    for key, (name, shape, dtype) in specs.items():
+        shm = SharedMemory(name=name)
+        shms.append(shm)
+        buffers[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    return shms, buffers
+
+
+def _write_step_buffers(buffers: Dict[str, np.ndarray], index: int, reward, terminated, truncated, info: dict) -> dict:
+    """Writes the step results of sub-environment `index` to the shared step buffers.
+
+    Returns:
+        The info entries which are not transported through shared memory.
+    """
+    buffers["rewards"][index] = reward
+    buffers["terminations"][index] = terminated
+    buffers["truncations"][index] = truncated
+    info = dict(info)
+    for key in buffers:
+        if not key.startswith("info/"):
+            continue
+        info_key = key[len("info/"):]
+        has_key = info_key in info and np.ndim(info[info_key]) == 0 # only scalar entries fit the buffers
+        buffers[key][index] = info.pop(info_key) if has_key else 0.0 # missing entries are zeros, as in `VectorEnv._add_info`
+        buffers[f"info_mask/{info_key}"][index] = has_key
+    return info
+
+
+def _mo_env_step(env: gym.Env, action, autoreset: bool, autoreset_mode: AutoresetMode):
+    """Steps a sub-environment of a worker, resetting it according to `autoreset_mode`.
+
+    Returns:
+        The step results (observation, vector reward, terminated, truncated, info) and whether the sub-environment must be reset at the next step.
+    """
+    if autoreset_mode == AutoresetMode.NEXT_STEP:
+        if autoreset:
+            observation, info = env.reset()
+            reward, terminated, truncated = np.zeros(env.unwrapped.reward_space.shape[0], dtype=np.float32), False, False
+        else:
+            observation, reward, terminated, truncated, info = env.step(action)
+        autoreset = terminated or truncated
+    elif autoreset_mode == AutoresetMode.SAME_STEP:
+        observation, reward, terminated, truncated, info = env.step(action)
+
+        if terminated or truncated:
+            reset_observation, reset_info = env.reset()
+
+            info = {
+                "final_info": info,
+                "final_obs": observation,
+                **reset_info,
+            }
+            observation = reset_observation
+    elif autoreset_mode == AutoresetMode.DISABLED:
+        assert autoreset is False
+        observation, reward, terminated, truncated, info = env.step(action)
+    else:
+        raise ValueError(f"Unexpected autoreset_mode: {autoreset_mode}")
+    return (observation, reward, terminated, truncated, info), autoreset
 
 
 def _mo_async_worker(
     index: int,
-    env_fn: callable,
+    env_fns: Sequence[Callable[[], gym.Env]],
     pipe: Connection,
     parent_pipe: Connection,
-    shared_memory: Union[Array, Dict[str, Any], Tuple[Any, ...]],
     error_queue: Queue,
     autoreset_mode: AutoresetMode,
+    env_indices: Sequence[int],
 ):
-    env = env_fn()
-    observation_space = env.observation_space
-    action_space = env.action_space
-    reward_space = env.unwrapped.reward_space
-    autoreset = False
-    observation = None
+    """Worker process `index` of :class:`MOAsyncVectorEnv`, hosting the sub-environments `env_indices`.
+
+    Every command carries (and every answer returns) one entry per hosted sub-environment, which are run one after the other.
+    The shared-memory buffers are attached with the `_attach_shared_memory` command, after the `_check_spaces` handshake.
+    """
+    envs = [env_fn() for env_fn in env_fns]
+    autoresets = [False] * len(envs)
+    observations = [None] * len(envs)
+    shared_memory = None
+    step_shms, step_buffers = [], None
 
     parent_pipe.close()
 
@@ -46,107 +185,88 @@ def _mo_async_worker(
             command, data = pipe.recv()
 
             if command == "reset":
-                observation, info = env.reset(**data)
-                if shared_memory:
-                    write_to_shared_memory(
-                        observation_space, index, observation, shared_memory
-                    )
-                    observation = None
-                    autoreset = False
-                pipe.send(((observation, info), True))
-            elif command == "reset-noop":
-                pipe.send(((observation, {}), True))
+                # `data` holds the reset kwargs of each sub-environment, None for the ones left out by the `reset_mask` option
+                results = []
+                for i, (env, env_index, env_kwargs) in enumerate(zip(envs, env_indices, data)):
+                    if env_kwargs is None:
+                        results.append((observations[i], {}))
+                        continue
+                    observation, info = env.reset(**env_kwargs)
+                    if shared_memory:
+                        write_to_shared_memory(
+                            env.observation_space, env_index, observation, shared_memory
+                        )
+                        observation = None
+                    observations[i] = observation
+                    autoresets[i] = False
+                    results.append((observation, info))
+                pipe.send((results, True))
             elif command == "step":
-                if autoreset_mode == AutoresetMode.NEXT_STEP:
-                    if autoreset:
-                        observation, info = env.reset()
-                        reward, terminated, truncated = np.zeros(reward_space.shape[0], dtype=np.float32), False, False
-                    else:
-                        (
-                            observation,
-                            reward,
-                            terminated,
-                            truncated,
-                            info,
-                        ) = env.step(data)
-                    autoreset = terminated or truncated
-                elif autoreset_mode == AutoresetMode.SAME_STEP:
-                    (
-                        observation,
-                        reward,
-                        terminated,
-                        truncated,
-                        info,
-                    ) = env.step(data)
-
-                    if terminated or truncated:
-                        reset_observation, reset_info = env.reset()
-
-                        info = {
-                            "final_info": info,
-                            "final_obs": observation,
-                            **reset_info,
-                        }
-                        observation = reset_observation
-                elif autoreset_mode == AutoresetMode.DISABLED:
-                    assert autoreset is False
-                    (
-                        observation,
-                        reward,
-                        terminated,
-                        truncated,
-                        info,
-                    ) = env.step(data)
-                else:
-                    raise ValueError(f"Unexpected autoreset_mode: {autoreset_mode}")
-
-                if shared_memory:
-                    write_to_shared_memory(
-                        observation_space, index, observation, shared_memory
+                # `data` holds (position, action) pairs of the hosted sub-environments to step, the others are left untouched
+                results = []
+                for i, action in data:
+                    env, env_index = envs[i], env_indices[i]
+                    (observation, reward, terminated, truncated, info), autoresets[i] = _mo_env_step(
+                        env, action, autoresets[i], autoreset_mode
                     )
-                    observation = None
-
-                pipe.send(((observation, reward, terminated, truncated, info), True))
+                    if shared_memory:
+                        write_to_shared_memory(
+                            env.observation_space, env_index, observation, shared_memory
+                        )
+                        observation = None
+                    observations[i] = observation
+
+                    if step_buffers is not None:
+                        info = _write_step_buffers(step_buffers, env_index, reward, terminated, truncated, info)
+                        results.append(None if observation is None and not info else (observation, info))
+                    else:
+                        results.append((observation, reward, terminated, truncated, info))
+                # nothing left to send for most environments, the message is then just a token
+                pipe.send((None if all(result is None for result in results) else results, True))
             elif command == "close":
                 pipe.send((None, True))
                 break
             elif command == "_call":
                 name, args, kwargs = data
-                if name in ["reset", "step", "close", "_setattr", "_check_spaces"]:
+                if name in ["reset", "step", "close", "_setattr", "_attach_shared_memory", "_check_spaces"]:
                     raise ValueError(
                         f"Trying to call function `{name}` with `call`, use `{name}` directly instead."
                     )
 
-                attr = env.get_wrapper_attr(name)
-                if callable(attr):
-                    pipe.send((attr(*args, **kwargs), True))
-                else:
-                    pipe.send((attr, True))
+                results = []
+                for env in envs:
+                    attr = env.get_wrapper_attr(name)
+                    results.append(attr(*args, **kwargs) if callable(attr) else attr)
+                pipe.send((results, True))
             elif command == "_setattr":
-                name, value = data
-                env.set_wrapper_attr(name, value)
+                name, values = data
+                for env, value in zip(envs, values):
+                    env.set_wrapper_attr(name, value)
+                pipe.send((None, True))
+            elif command == "_attach_shared_memory":
+                shared_memory, step_specs = data
+                step_shms, step_buffers = _attach_step_buffers(step_specs)
                 pipe.send((None, True))
             elif command == "_check_spaces":
-                obs_mode, single_obs_space, single_action_space = data
-
+                # the workers report the spaces of their sub-environments, which the main process checks
                 pipe.send(
                     (
-                        (
+                        [
                             (
-                                single_obs_space == observation_space
-                                if obs_mode == "same"
-                                else is_space_dtype_shape_equiv(
-                                    single_obs_space, observation_space
-                                )
-                            ),
-                            single_action_space == action_space,
-                        ),
+                                env.metadata,
+                                env.render_mode,
+                                env.observation_space,
+                                env.action_space,
+                                env.unwrapped.reward_space,
+                            )
+                            for env in envs
+                        ],
                         True,
                     )
                 )
             else:
                 raise RuntimeError(
-                    f"Received unknown command `{command}`. Must be one of [`reset`, `step`, `close`, `_call`, `_setattr`, `_check_spaces`]."
+                    f"Received unknown command `{command}`. Must be one of [`reset`, `step`, `close`, `_call`, `_setattr`, `_attach_shared_memory`, `_check_spaces`]."
                 )
     except (KeyboardInterrupt, Exception):
         error_type, error_message, _ = sys.exc_info()
@@ -155,7 +275,13 @@ def _mo_async_worker(
         error_queue.put((index, error_type, error_message, trace))
         pipe.send((None, False))
     finally:
-        env.close()
+        step_buffers = None # release the views before closing the shared memory
+        for shm in step_shms:
+            shm.close()
+        for array in _iter_shared_arrays(shared_memory):
+            array.shm.close()
+        for env in envs:
+            env.close()
 
 
 class ObsToNumpy(gym.ObservationWrapper):
@@ -527,25 +653,339 @@ class MORecordVideo(gym.Wrapper[ObsType, ActType, ObsType, ActType], gym.utils.R
 class MOAsyncVectorEnv(AsyncVectorEnv):
     """Vectorized environment that runs multiple environments in parallel.
 
-    It uses ``multiprocessing`` processes, and pipes for communication.
+    It uses ``multiprocessing`` processes, and pipes for communication. Each process hosts a contiguous slice of
+    `envs_per_worker` sub-environments and runs them one after the other for every command, so that many sub-environments
+    can be run without starting (and importing the simulators in) as many processes.
+    Vector rewards, termination and truncation flags and the scalar info entries listed in `shared_info_keys` are written by
+    the workers to shared memory, so that the pipes only carry a token (plus the observations if `shared_memory=False`
+    and the remaining info entries).
 
     Mofified from gymnasium.vector.async_vector_env.AsyncVectorEnv to allow for multi-objective rewards.
     """
     def __init__(
         self,
         env_fns: Sequence[Callable[[], gym.Env]],
-        **kwargs
+        shared_memory: bool = True,
+        copy: bool = True,
+        context: Optional[str] = None,
+        daemon: bool = True,
+        observation_mode: Union[str, gym.Space] = "same",
+        autoreset_mode: Union[str, AutoresetMode] = AutoresetMode.NEXT_STEP,
+        envs_per_worker: int = 1,
+        shared_info_keys: Sequence[str] = ("original_scalar_reward",),
     ):
-        super().__init__(env_fns=env_fns, worker=_mo_async_worker, **kwargs)
+        """
+        Args:
+            env_fns: Functions that create the environments.
+            shared_memory: If ``True``, then the observations from the worker processes are communicated back through shared variables.
+            copy: If ``True``, then the :meth:`reset` and :meth:`step` methods return a copy of the observations.
+            context: Context for `multiprocessing`. If ``None``, then the default context is used.
+            daemon: If ``True``, then subprocesses have ``daemon`` flag turned on.
+            observation_mode: Defines how environment observation spaces should be batched ('same', 'different' or a tuple of
+                single and batched observation spaces), see :class:`gymnasium.vector.AsyncVectorEnv`.
+            autoreset_mode: The Autoreset Mode used, see https://farama.org/Vector-Autoreset-Mode for more information.
+            envs_per_worker: Number of sub-environments hosted by each worker process (the last one may host fewer).
+            shared_info_keys: Scalar info entries transported through shared memory.
+        """
+        assert envs_per_worker >= 1, "envs_per_worker must be a positive integer"
+        self.env_fns = env_fns
+        self.shared_memory = shared_memory
+        self.copy = copy
+        self.context = context
+        self.daemon = daemon
+        self.worker = _mo_async_worker
+        self.observation_mode = observation_mode
+        self.autoreset_mode = (
+            autoreset_mode
+            if isinstance(autoreset_mode, AutoresetMode)
+            else AutoresetMode(autoreset_mode)
+        )
+        self.num_envs = len(env_fns)
+        self.envs_per_worker = envs_per_worker
+        # worker w hosts the sub-environments worker_env_indices[w]
+        self.worker_env_indices = [
+            list(range(start, min(start + envs_per_worker, self.num_envs)))
+            for start in range(0, self.num_envs, envs_per_worker)
+        ]
+        self._step_shms, self._step_buffers, self._observation_memory = {}, None, None
+        self._stepped_envs = {} # worker -> (position, action) pairs of the pending step
+
+        # workers must share the resource tracker of this process, otherwise they unlink the shared buffers when exiting
+        resource_tracker.ensure_running()
+        ctx = multiprocessing.get_context(context)
+        self.parent_pipes, self.processes = [], []
+        self.error_queue = ctx.Queue()
+        with clear_mpi_env_vars():
+            for idx, env_indices in enumerate(self.worker_env_indices):
+                parent_pipe, child_pipe = ctx.Pipe()
+                process = ctx.Process(
+                    target=self.worker,
+                    name=f"Worker<{type(self).__name__}>-{idx}",
+                    args=(
+                        idx,
+                        [CloudpickleWrapper(self.env_fns[i]) for i in env_indices],
+                        child_pipe,
+                        parent_pipe,
+                        self.error_queue,
+                        self.autoreset_mode,
+                        env_indices,
+                    ),
+                )
+
+                self.parent_pipes.append(parent_pipe)
+                self.processes.append(process)
 
-        # extract reward space from first vector env and create 2d array to store vector rewards
-        dummy_env = env_fns[0]()
-        self.reward_space = dummy_env.unwrapped.reward_space
-        dummy_env.close()
-        del dummy_env
+                process.daemon = daemon
+                process.start()
+                child_pipe.close()
+
+        self._state = AsyncState.DEFAULT
+        # the spaces are reported by the workers, so the main process never builds an environment itself
+        self._check_spaces()
+
+        # create 2d array to store vector rewards
         self.rewards = create_empty_array(self.reward_space, n=self.num_envs, fn=np.zeros)
 
-    
+        self.shared_info_keys = tuple(shared_info_keys)
+        self._create_shared_buffers()
+
+    def _split(self, values: Sequence[Any]) -> List[List[Any]]:
+        """Splits per-sub-environment values into the list of values of each worker."""
+        return [[values[i] for i in env_indices] for env_indices in self.worker_env_indices]
+
+    def _merge(self, worker_values: Sequence[Sequence[Any]]) -> List[Any]:
+        """Concatenates the per-sub-environment values returned by the workers."""
+        return [value for values in worker_values for value in values]
+
+    def _create_shared_buffers(self):
+        """Creates the shared-memory observation and step buffers and attaches the workers to them."""
+        self._observation_memory = None
+        if self.shared_memory:
+            try:
+                self._observation_memory = create_shared_memory(self.single_observation_space, n=self.num_envs, ctx=_NamedSharedArray)
+                self.observations = read_from_shared_memory(self.single_observation_space, self._observation_memory, n=self.num_envs)
+            except CustomSpaceError as e:
+                raise ValueError(
+                    "Using `MOAsyncVectorEnv(..., shared_memory=True)` caused an error, you can disable this feature with `shared_memory=False` however this is slower."
+                ) from e
+        else:
+            self.observations = create_empty_array(self.single_observation_space, n=self.num_envs, fn=np.zeros)
+
+        layout = {
+            "rewards": ((self.num_envs,) + self.reward_space.shape, self.reward_space.dtype),
+            "terminations": ((self.num_envs,), np.bool_),
+            "truncations": ((self.num_envs,), np.bool_),
+        }
+        for key in self.shared_info_keys:
+            layout[f"info/{key}"] = ((self.num_envs,), np.float64)
+            layout[f"info_mask/{key}"] = ((self.num_envs,), np.bool_)
+
+        specs = {}
+        self._step_buffers = {}
+        for key, (shape, dtype) in layout.items():
+            dtype = np.dtype(dtype)
+            shm = SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+            self._step_shms[key] = shm
+            self._step_buffers[key] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            specs[key] = (shm.name, shape, dtype.str)
+
+        for pipe in self.parent_pipes:
+            pipe.send(("_attach_shared_memory", (self._observation_memory, specs)))
+        _, successes = zip(*[pipe.recv() for pipe in self.parent_pipes])
+        self._raise_if_errors(successes)
+
+    def close_extras(self, timeout: int | float | None = None, terminate: bool = False):
+        super().close_extras(timeout=timeout, terminate=terminate)
+        self._step_buffers = None # release the views before closing the shared memory
+        for shm in self._step_shms.values():
+            shm.close()
+            shm.unlink()
+        self._step_shms = {}
+        if self.shared_memory:
+            self.observations = None
+        for array in _iter_shared_arrays(self._observation_memory):
+            array.shm.close()
+            array.shm.unlink()
+        self._observation_memory = None
+
+    def reset_async(
+        self,
+        seed: int | list[int] | None = None,
+        options: dict | None = None,
+    ):
+        """Send calls to the :obj:`reset` methods of the sub-environments.
+
+        To get the results of these calls, you may invoke :meth:`reset_wait`.
+
+        Args:
+            seed: List of seeds for each environment
+            options: The reset option. `options["reset_mask"]` selects the sub-environments to reset.
+
+        Raises:
+            ClosedEnvironmentError: If the environment was closed (if :meth:`close` was previously called).
+            AlreadyPendingCallError: If the environment is already waiting for a pending call to another method.
+        """
+        self._assert_is_running()
+
+        if seed is None:
+            seed = [None for _ in range(self.num_envs)]
+        elif isinstance(seed, int):
+            seed = [seed + i for i in range(self.num_envs)]
+        assert (
+            len(seed) == self.num_envs
+        ), f"If seeds are passed as a list the length must match num_envs={self.num_envs} but got length={len(seed)}."
+
+        if self._state != AsyncState.DEFAULT:
+            raise AlreadyPendingCallError(
+                f"Calling `reset_async` while waiting for a pending call to `{self._state.value}` to complete",
+                str(self._state.value),
+            )
+
+        reset_mask = np.ones(self.num_envs, dtype=bool)
+        if options is not None and "reset_mask" in options:
+            reset_mask = options.pop("reset_mask")
+            assert isinstance(
+                reset_mask, np.ndarray
+            ), f"`options['reset_mask': mask]` must be a numpy array, got {type(reset_mask)}"
+            assert reset_mask.shape == (
+                self.num_envs,
+            ), f"`options['reset_mask': mask]` must have shape `({self.num_envs},)`, got {reset_mask.shape}"
+            assert (
+                reset_mask.dtype == np.bool_
+            ), f"`options['reset_mask': mask]` must have `dtype=np.bool_`, got {reset_mask.dtype}"
+            assert np.any(
+                reset_mask
+            ), f"`options['reset_mask': mask]` must contain a boolean array, got reset_mask={reset_mask}"
+
+        env_kwargs = [
+            {"seed": env_seed, "options": options} if env_reset else None
+            for env_seed, env_reset in zip(seed, reset_mask)
+        ]
+        for pipe, worker_kwargs in zip(self.parent_pipes, self._split(env_kwargs)):
+            pipe.send(("reset", worker_kwargs))
+
+        self._state = AsyncState.WAITING_RESET
+
+    def reset_wait(
+        self,
+        timeout: int | float | None = None,
+    ) -> tuple[ObsType, dict[str, Any]]:
+        """Waits for the calls triggered by :meth:`reset_async` to finish and returns the results.
+
+        Args:
+            timeout: Number of seconds before the call to ``reset_wait`` times out. If `None`, the call to ``reset_wait`` never times out.
+
+        Returns:
+            A tuple of batched observations and list of dictionaries
+
+        Raises:
+            ClosedEnvironmentError: If the environment was closed (if :meth:`close` was previously called).
+            NoAsyncCallError: If :meth:`reset_wait` was called without any prior call to :meth:`reset_async`.
+            TimeoutError: If :meth:`reset_wait` timed out.
+        """
+        self._assert_is_running()
+        if self._state != AsyncState.WAITING_RESET:
+            raise NoAsyncCallError(
+                "Calling `reset_wait` without any prior " "call to `reset_async`.",
+                AsyncState.WAITING_RESET.value,
+            )
+
+        if not self._poll_pipe_envs(timeout):
+            self._state = AsyncState.DEFAULT
+            raise multiprocessing.TimeoutError(
+                f"The call to `reset_wait` has timed out after {timeout} second(s)."
+            )
+
+        results, successes = zip(*[pipe.recv() for pipe in self.parent_pipes])
+        self._raise_if_errors(successes)
+
+        infos = {}
+        results, info_data = zip(*self._merge(results))
+        for i, info in enumerate(info_data):
+            infos = self._add_info(infos, info, i)
+
+        if not self.shared_memory:
+            self.observations = concatenate(
+                self.single_observation_space, results, self.observations
+            )
+
+        self._state = AsyncState.DEFAULT
+        return (deepcopy(self.observations) if self.copy else self.observations), infos
+
+    def step_async(self, actions: np.ndarray):
+        """Send the calls to :meth:`Env.step` to each sub-environment.
+
+        Args:
+            actions: Batch of actions. element of :attr:`VectorEnv.action_space`
+
+        Raises:
+            ClosedEnvironmentError: If the environment was closed (if :meth:`close` was previously called).
+            AlreadyPendingCallError: If the environment is already waiting for a pending call to another method.
+        """
+        self._assert_is_running()
+        if self._state != AsyncState.DEFAULT:
+            raise AlreadyPendingCallError(
+                f"Calling `step_async` while waiting for a pending call to `{self._state.value}` to complete.",
+                str(self._state.value),
+            )
+
+        self._send_steps(list(iterate(self.action_space, actions)), range(self.num_envs))
+
+    def step_subset(
+        self, actions: np.ndarray, env_indices: Sequence[int]
+    ) -> tuple[ObsType, np.ndarray, np.ndarray, np.ndarray, dict]:
+        """Steps only the sub-environments `env_indices`. The other ones are not simulated, in particular finished episodes are not autoreset.
+
+        Args:
+            actions: Actions of the stepped sub-environments, one row per index of `env_indices`
+            env_indices: Indices of the sub-environments to step
+
+        Returns:
+            The step information (obs, reward, terminated, truncated, info) of the stepped sub-environments only, in the order of `env_indices`.
+        """
+        env_indices = np.asarray(env_indices, dtype=int)
+        self._assert_is_running()
+        if self._state != AsyncState.DEFAULT:
+            raise AlreadyPendingCallError(
+                f"Calling `step_subset` while waiting for a pending call to `{self._state.value}` to complete.",
+                str(self._state.value),
+            )
+
+        self._send_steps([actions[i] for i in range(len(env_indices))], env_indices)
+        return tuple(_select_envs(batch, env_indices) for batch in self.step_wait())
+
+    def _send_steps(self, actions: Sequence[Any], env_indices: Sequence[int]):
+        """Sends the actions of the sub-environments `env_indices` to the workers hosting them."""
+        self._stepped_envs = {}
+        for env_index, action in zip(env_indices, actions):
+            worker, position = divmod(int(env_index), self.envs_per_worker)
+            self._stepped_envs.setdefault(worker, []).append((position, action))
+        for worker, steps in self._stepped_envs.items():
+            self.parent_pipes[worker].send(("step", steps))
+        self._state = AsyncState.WAITING_STEP
+
+    def _poll_pipe_envs(self, timeout: int | None = None):
+        self._assert_is_running()
+
+        if timeout is None:
+            return True
+
+        # while stepping, only the workers hosting stepped sub-environments answer
+        pipes = (
+            [self.parent_pipes[worker] for worker in self._stepped_envs]
+            if self._state == AsyncState.WAITING_STEP
+            else self.parent_pipes
+        )
+        end_time = time.perf_counter() + timeout
+        for pipe in pipes:
+            delta = max(end_time - time.perf_counter(), 0)
+
+            if pipe is None:
+                return False
+            if pipe.closed or (not pipe.poll(delta)):
+                return False
+        return True
+
     def step_wait(
         self, timeout: int | float | None = None
     ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, dict]:
@@ -575,40 +1015,247 @@ class MOAsyncVectorEnv(AsyncVectorEnv):
                 f"The call to `step_wait` has timed out after {timeout} second(s)."
             )
 
-        observations, rewards, terminations, truncations, infos = [], [], [], [], {}
+        observations, infos = {}, {}
         successes = []
-        for env_idx, pipe in enumerate(self.parent_pipes):
-            env_step_return, success = pipe.recv()
+        for worker, steps in self._stepped_envs.items():
+            worker_step_return, success = self.parent_pipes[worker].recv()
 
             successes.append(success)
-            if success:
-                observations.append(env_step_return[0])
-                rewards.append(env_step_return[1])
-                terminations.append(env_step_return[2])
-                truncations.append(env_step_return[3])
-                infos = self._add_info(infos, env_step_return[4], env_idx)
+            if not success or worker_step_return is None:
+                continue
+            for (position, _), env_step_return in zip(steps, worker_step_return):
+                if env_step_return is not None:
+                    env_idx = self.worker_env_indices[worker][position]
+                    observations[env_idx] = env_step_return[0]
+                    infos = self._add_info(infos, env_step_return[1], env_idx)
 
         self._raise_if_errors(successes)
 
+        # the workers wrote rewards, flags and scalar info entries to the step buffers
+        terminations = self._step_buffers["terminations"].copy()
+        truncations = self._step_buffers["truncations"].copy()
+        for key in self.shared_info_keys:
+            mask = self._step_buffers[f"info_mask/{key}"]
+            if mask.any():
+                infos[key] = self._step_buffers[f"info/{key}"].copy()
+                infos[f"_{key}"] = mask.copy()
+
         if not self.shared_memory:
+            # sub-environments which were not stepped keep their last observation
             self.observations = concatenate(
                 self.single_observation_space,
-                observations,
+                [
+                    observations.get(env_idx, observation)
+                    for env_idx, observation in enumerate(iterate(self.observation_space, self.observations))
+                ],
                 self.observations,
             )
         
         # modify to allow return of vector rewards
-        self.rewards = concatenate(
-            self.reward_space,
-            rewards,
-            self.rewards,
-        )
+        np.copyto(self.rewards, self._step_buffers["rewards"])
 
         self._state = AsyncState.DEFAULT
         return (
             deepcopy(self.observations) if self.copy else self.observations,
             deepcopy(self.rewards) if self.copy else self.rewards,
-            np.array(terminations, dtype=np.bool_),
-            np.array(truncations, dtype=np.bool_),
+            terminations,
+            truncations,
             infos,
-        )
\ No newline at end of file
+        )
+
+    def call_wait(self, timeout: int | float | None = None) -> tuple[Any, ...]:
+        """Calls all parent pipes and waits for the results.
+
+        Args:
+            timeout: Number of seconds before the call to :meth:`call_wait` times out.
+                If ``None`` (default), the call to :meth:`call_wait` never times out.
+
+        Returns:
+            List of the results of the individual calls to the method or property for each environment.
+
+        Raises:
+            NoAsyncCallError: Calling :meth:`call_wait` without any prior call to :meth:`call_async`.
+            TimeoutError: The call to :meth:`call_wait` has timed out after timeout second(s).
+        """
+        return tuple(self._merge(super().call_wait(timeout)))
+
+    def set_attr(self, name: str, values: list[Any] | tuple[Any] | object):
+        """Sets an attribute of the sub-environments.
+
+        Args:
+            name: Name of the property to be set in each individual environment.
+            values: Values of the property to be set to. If ``values`` is a list or
+                tuple, then it corresponds to the values for each individual
+                environment, otherwise a single value is set for all environments.
+
+        Raises:
+            ValueError: Values must be a list or tuple with length equal to the number of environments.
+            AlreadyPendingCallError: Calling :meth:`set_attr` while waiting for a pending call to complete.
+        """
+        self._assert_is_running()
+        if not isinstance(values, (list, tuple)):
+            values = [values for _ in range(self.num_envs)]
+        if len(values) != self.num_envs:
+            raise ValueError(
+                "Values must be a list or tuple with length equal to the number of environments. "
+                f"Got `{len(values)}` values for {self.num_envs} environments."
+            )
+
+        if self._state != AsyncState.DEFAULT:
+            raise AlreadyPendingCallError(
+                f"Calling `set_attr` while waiting for a pending call to `{self._state.value}` to complete.",
+                str(self._state.value),
+            )
+
+        for pipe, worker_values in zip(self.parent_pipes, self._split(values)):
+            pipe.send(("_setattr", (name, worker_values)))
+        _, successes = zip(*[pipe.recv() for pipe in self.parent_pipes])
+        self._raise_if_errors(successes)
+
+    def _check_spaces(self):
+        """Gathers the metadata and spaces reported by the workers and checks that the sub-environments can be batched."""
+        self._assert_is_running()
+
+        for pipe in self.parent_pipes:
+            pipe.send(("_check_spaces", None))
+
+        results, successes = zip(*[pipe.recv() for pipe in self.parent_pipes])
+        self._raise_if_errors(successes)
+        metadatas, render_modes, observation_spaces, action_spaces, reward_spaces = zip(*self._merge(results))
+
+        self.metadata = dict(metadatas[0])
+        self.metadata["autoreset_mode"] = self.autoreset_mode
+        self.render_mode = render_modes[0]
+        self.single_action_space = action_spaces[0]
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+        self.reward_space = reward_spaces[0]
+
+        if isinstance(self.observation_mode, tuple) and len(self.observation_mode) == 2:
+            assert isinstance(self.observation_mode[0], gym.Space)
+            assert isinstance(self.observation_mode[1], gym.Space)
+            self.observation_space, self.single_observation_space = self.observation_mode
+        elif self.observation_mode == "same":
+            self.single_observation_space = observation_spaces[0]
+            self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+        elif self.observation_mode == "different":
+            self.single_observation_space = observation_spaces[0]
+            self.observation_space = batch_differing_spaces(observation_spaces)
+        else:
+            raise ValueError(
+                f"Invalid `observation_mode`, expected: 'same' or 'different' or tuple of single and batch observation space, actual got {self.observation_mode}"
+            )
+
+        if self.observation_mode == "same":
+            same_observation_spaces = [space == self.single_observation_space for space in observation_spaces]
+        else:
+            same_observation_spaces = [is_space_dtype_shape_equiv(self.single_observation_space, space) for space in observation_spaces]
+        if not all(same_observation_spaces):
+            if self.observation_mode == "same":
+                raise RuntimeError(
+                    "MOAsyncVectorEnv(..., observation_mode='same') however some of the sub-environments observation spaces are not equivalent. If this is intentional, use `observation_mode='different'` instead."
+                )
+            else:
+                raise RuntimeError(
+                    "MOAsyncVectorEnv(..., observation_mode='different' or custom space) however the sub-environment's observation spaces do not share a common shape and dtype."
+                )
+
+        if not all(space == self.single_action_space for space in action_spaces):
+            raise RuntimeError(
+                f"Some environments have an action space different from `{self.single_action_space}`. "
+                "In order to batch actions, the action spaces from all environments must be equal."
+            )
+
+        if not all(space == self.reward_space for space in reward_spaces):
+            raise RuntimeError(
+                f"Some environments have a reward space different from `{self.reward_space}`. "
+                "In order to batch vector rewards, the reward spaces from all environments must be equal."
+            )
+
+    def _raise_if_errors(self, successes: list[bool] | tuple[bool]):
+        if all(successes):
+            return
+
+        # errors are reported per worker (`index` is the index of the worker process)
+        num_errors = len(successes) - sum(successes)
+        for i in range(num_errors):
+            index, exctype, value, trace = self.error_queue.get()
+
+            logger.error(
+                f"Received the following error from Worker-{index} (sub-environments {self.worker_env_indices[index]}) - Shutting it down"
+            )
+            logger.error(f"{trace}")
+
+            self.parent_pipes[index].close()
+            self.parent_pipes[index] = None
+
+            if i == num_errors - 1:
+                logger.error("Raising the last exception back to the main process.")
+                self._state = AsyncState.DEFAULT
+                raise exctype(value)
+
+
+class MOSyncVectorEnv(mo_gym.wrappers.vector.MOSyncVectorEnv):
+    """Multi-objective vectorized environment that serially runs multiple environments.
+
+    Extends mo_gymnasium's MOSyncVectorEnv with `step_subset`, as in :class:`MOAsyncVectorEnv`.
+    """
+
+    def __init__(self, env_fns: Sequence[Callable[[], gym.Env]], copy: bool = True):
+        """Vectorized environment that serially runs multiple environments.
+
+        Args:
+            env_fns: env constructors
+            copy: If ``True``, then the :meth:`reset` and :meth:`step` methods return a copy of the observations.
+        """
+        super().__init__(env_fns, copy=copy)
+        # sub-environments which were never reset hold empty observations (as in MOAsyncVectorEnv), so that the
+        # first reset can already be restricted by a `reset_mask`
+        self._env_obs = list(iterate(self.observation_space, create_empty_array(self.single_observation_space, n=self.num_envs)))
+
+    def step(self, actions: ActType) -> Tuple[ObsType, np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        results = super().step(actions)
+        # the observations of the sub-environments are concatenated again by `reset` with a `reset_mask` and by `step_subset`
+        self._env_obs = list(iterate(self.observation_space, deepcopy(self._observations)))
+        return results
+
+    def step_subset(
+        self, actions: np.ndarray, env_indices: Sequence[int]
+    ) -> Tuple[ObsType, np.ndarray, np.ndarray, np.ndarray, Dict[str, Any]]:
+        """Steps only the sub-environments `env_indices`. The other ones are not simulated, in particular finished episodes are not autoreset.
+
+        Args:
+            actions: Actions of the stepped sub-environments, one row per index of `env_indices`
+            env_indices: Indices of the sub-environments to step
+
+        Returns:
+            The step information (obs, reward, terminated, truncated, info) of the stepped sub-environments only, in the order of `env_indices`.
+        """
+        env_indices = np.asarray(env_indices, dtype=int)
+        infos = {}
+        for i, env_index in enumerate(env_indices):
+            if self._autoreset_envs[env_index]:
+                self._env_obs[env_index], env_info = self.envs[env_index].reset()
+
+                self._rewards[env_index] = np.zeros(self.reward_space.shape[0])
+                self._terminations[env_index] = False
+                self._truncations[env_index] = False
+            else:
+                (
+                    self._env_obs[env_index],
+                    self._rewards[env_index],
+                    self._terminations[env_index],
+                    self._truncations[env_index],
+                    env_info,
+                ) = self.envs[env_index].step(actions[i])
+            infos = self._add_info(infos, env_info, env_index)
+
+        self._observations = concatenate(self.single_observation_space, self._env_obs, self._observations)
+        self._autoreset_envs[env_indices] = np.logical_or(self._terminations[env_indices], self._truncations[env_indices])
+
+        return (
+            _select_envs(self._observations, env_indices),
+            self._rewards[env_indices],
+            self._terminations[env_indices],
+            self._truncations[env_indices],
+            _select_envs(infos, env_indices),
+        )
@@ -0,0 +1,126 @@
+import unittest
+from unittest import mock
+
+import mo_gymnasium as mo_gym
+import numpy as np
+
+from algos.single_policy.ser.mo_q_learning import MOQLearning
+from mo_utils import evaluation
+from mo_utils.evaluation import EvaluationCache, policy_evaluation_mo, returns_converged
+from mo_utils.utils import policy_fingerprint
+
+
+class QLearning(MOQLearning):
+    # subclass of a policy of the repo, which must be fingerprinted as well
+    def save(self, *args, **kwargs):
+        pass
+
+
+class TestEvaluationCache(unittest.TestCase):
+    test_seed = 0
+
+    def setUp(self):
+        self.env = mo_gym.make("deep-sea-treasure-v0")
+        self.env.reset(seed=self.test_seed)
+        self.agent = QLearning(self.env, weights=np.array([0.9, 0.1]), initial_epsilon=0.0, log=False, seed=self.test_seed)
+        self.agent.train(total_timesteps=200, start_time=0.0)
+
+    def test_fingerprint_invalidation(self):
+        fingerprint = policy_fingerprint(self.agent)
+        self.assertEqual(policy_fingerprint(self.agent), fingerprint)
+
+        # bookkeeping counters do not change how the policy acts
+        self.agent.global_step += 1
+        self.agent.num_episodes += 1
+        self.assertEqual(policy_fingerprint(self.agent), fingerprint)
+
+        obs = next(iter(self.agent.q_table))
+        self.agent.q_table[obs] = self.agent.q_table[obs] + 1.0
+        q_table_fingerprint = policy_fingerprint(self.agent)
+        self.assertNotEqual(q_table_fingerprint, fingerprint)
+
+        self.agent.epsilon = 0.5
+        epsilon_fingerprint = policy_fingerprint(self.agent)
+        self.assertNotEqual(epsilon_fingerprint, q_table_fingerprint)
+
+        self.agent.weights = np.array([0.1, 0.9])
+        self.assertNotEqual(policy_fingerprint(self.agent), epsilon_fingerprint)
+
+    def test_evaluations_reused_until_parameters_change(self):
+        cache = EvaluationCache()
+        w = np.array([0.9, 0.1])
+        result = policy_evaluation_mo(self.agent, self.env, w, rep=2, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        cached_result = policy_evaluation_mo(self.agent, self.env, w, rep=2, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        for value, cached_value in zip(result, cached_result):
+            np.testing.assert_array_equal(value, cached_value)
+
+        # other evaluation settings are other entries
+        policy_evaluation_mo(self.agent, self.env, w, rep=3, cache=cache)
+        policy_evaluation_mo(self.agent, self.env, np.array([0.1, 0.9]), rep=2, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        # new parameters: the results of the previous ones are evicted
+        previous_fingerprint = policy_fingerprint(self.agent)
+        self.agent.epsilon = 0.5
+        policy_evaluation_mo(self.agent, self.env, w, rep=2, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+        self.assertIsNone(cache.lookup(previous_fingerprint, cache.key(self.env, w, 2)))
+
+    def test_lookup_returns_copy(self):
+        cache = EvaluationCache()
+        key = cache.key(self.env, np.array([0.5, 0.5]), 1)
+        cache.store("policy", key, np.zeros(2))
+        cache.lookup("policy", key)[0] = 1.0
+        np.testing.assert_array_equal(cache.lookup("policy", key), np.zeros(2))
+
+    def test_least_recently_used_policies_evicted(self):
+        cache = EvaluationCache(max_policies=2)
+        key = cache.key(self.env, np.array([0.5, 0.5]), 1)
+        cache.store("a", key, 1.0)
+        cache.store("b", key, 2.0)
+        # "a" is used after "b", so "b" is evicted first
+        self.assertEqual(cache.lookup("a", key), 1.0)
+        cache.store("c", key, 3.0)
+        self.assertIsNone(cache.lookup("b", key))
+        self.assertEqual(cache.lookup("a", key), 1.0)
+        self.assertEqual(cache.lookup("c", key), 3.0)
+        cache.store("d", key, 4.0)
+        self.assertIsNone(cache.lookup("a", key))
+        self.assertEqual(cache.lookup("d", key), 4.0)
+
+
+class TestReturnsConverged(unittest.TestCase):
+    def test_tolerance(self):
+        vec_returns = np.array([[0.0, 1.0], [2.0, 1.0], [1.0, 1.0]])
+        # standard errors of the average returns: 1 / sqrt(3) and 0
+        self.assertFalse(returns_converged(vec_returns, tol=0.57))
+        self.assertTrue(returns_converged(vec_returns, tol=0.58))
+
+    def test_at_least_two_episodes(self):
+        self.assertFalse(returns_converged(np.zeros((0, 2)), tol=np.inf))
+        self.assertFalse(returns_converged(np.zeros((1, 2)), tol=np.inf))
+        self.assertTrue(returns_converged(np.zeros((2, 2)), tol=0.0))
+        self.assertFalse(returns_converged(np.array([[0.0, 1.0], [0.0, 2.0]]), tol=0.0))
+
+    def test_policy_evaluation_stops_at_tolerance(self):
+        # episodes with vector returns (0, 0), (2, 0), (0, 0), (2, 0), ...
+        episodes = [(0.0, 0.0, np.array([2.0 * (i % 2), 0.0]), np.zeros(2)) for i in range(10)]
+        w = np.array([0.5, 0.5])
+        with mock.patch.object(evaluation, "eval_mo", side_effect=episodes) as eval_mo:
+            # standard error of the average return of the first objective: 1 / sqrt(n - 1) after n (even) episodes, 0.67 after 3
+            result = policy_evaluation_mo(None, None, w, rep=10, tol=0.6)
+            self.assertEqual(eval_mo.call_count, 4)
+            np.testing.assert_array_equal(result[2], [1.0, 0.0])
+        with mock.patch.object(evaluation, "eval_mo", side_effect=episodes) as eval_mo:
+            policy_evaluation_mo(None, None, w, rep=6, tol=0.1)
+            self.assertEqual(eval_mo.call_count, 6)
+        with mock.patch.object(evaluation, "eval_mo", return_value=episodes[0]) as eval_mo:
+            # identical returns: converged after two episodes
+            policy_evaluation_mo(None, None, w, rep=10, tol=0.0)
+            self.assertEqual(eval_mo.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
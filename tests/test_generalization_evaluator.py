@@ -0,0 +1,92 @@
+import unittest
+
+import mo_gymnasium as mo_gym
+import numpy as np
+
+from morl_generalization.generalization_evaluator import MORLGeneralizationEvaluator
+
+
+class WeightedAgent:
+    """Deterministic agent pushing the car with a weighted sum of its position and velocity."""
+
+    gamma = 0.99
+    global_step = 0
+
+    def eval(self, obs, w, num_envs=1, **kwargs):
+        return np.tanh(3.0 * w[:, :1] * obs[:, :1] + 50.0 * w[:, 1:] * obs[:, 1:2])
+
+
+class RecurrentAgent:
+    """Agent recording the previous actions it is given."""
+
+    gamma = 0.99
+    global_step = 0
+
+    def __init__(self):
+        self.prev_actions = []
+
+    def eval(self, obs, w, num_envs=1, prev_actions=None, **kwargs):
+        self.prev_actions.append(None if prev_actions is None else prev_actions.copy())
+        return np.ones((num_envs, 1), dtype=np.float32)
+
+
+class TestMORLGeneralizationEvaluator(unittest.TestCase):
+    env_id = "mo-mountaincarcontinuous-v0"
+    weights = np.array([[1.0, 0.0], [0.5, 0.5], [0.2, 0.8]])
+
+    def make_evaluator(self, eval_weight_batch_size, async_envs=False):
+        evaluator = MORLGeneralizationEvaluator(
+            mo_gym.make(self.env_id),
+            algo_name="test",
+            seed=0,
+            test_envs=[self.env_id],
+            async_envs=async_envs,
+            eval_weight_batch_size=eval_weight_batch_size,
+            normalization=False,
+            recover_single_objective=False,
+            max_episode_steps=50,
+        )
+        self.addCleanup(evaluator.test_envs.close)
+        return evaluator
+
+    def test_returns_independent_of_batch_size(self):
+        returns = self.make_evaluator(1).evaluate_weights(WeightedAgent(), self.weights, rep=3)
+        self.assertEqual(returns[0].shape, (1, len(self.weights), 2))
+        # the initial position of the car is random, so repetitions differ
+        self.assertTrue(np.all(returns[0] < 0.0))
+
+        for batch_size, async_envs in ((2, False), (len(self.weights), False), (2, True)):
+            batched_returns = self.make_evaluator(batch_size, async_envs).evaluate_weights(WeightedAgent(), self.weights, rep=3)
+            np.testing.assert_allclose(batched_returns[0], returns[0], rtol=1e-6)
+            np.testing.assert_allclose(batched_returns[1], returns[1], rtol=1e-6)
+
+    def test_episodes_stop_at_tolerance(self):
+        evaluator = self.make_evaluator(2)
+        two_episodes = evaluator.evaluate_weights(WeightedAgent(), self.weights, rep=2)
+        # the remaining repetitions are dropped once the returns of a weight converged, after two episodes at least
+        converged = evaluator.evaluate_weights(WeightedAgent(), self.weights, rep=5, tol=np.inf)
+        np.testing.assert_allclose(converged[0], two_episodes[0], rtol=1e-6)
+        self.assertFalse(np.allclose(evaluator.evaluate_weights(WeightedAgent(), self.weights, rep=5)[0], two_episodes[0]))
+
+    def test_previous_actions_reset_with_tasks(self):
+        evaluator = self.make_evaluator(2)
+        agent = RecurrentAgent()
+        # 3 episodes of 50 steps on 2 sub-environments: the second round only runs on the first one (padded with the second)
+        evaluator.evaluate_weights(agent, self.weights, rep=1)
+        self.assertEqual(len(agent.prev_actions), 100)
+        self.assertIsNone(agent.prev_actions[0])
+        np.testing.assert_array_equal(agent.prev_actions[1], np.ones((2, 1)))
+        np.testing.assert_array_equal(agent.prev_actions[50][0], np.zeros(1))
+        np.testing.assert_array_equal(agent.prev_actions[51][0], np.ones(1))
+
+    def test_repetitions_seeded_differently(self):
+        evaluator = self.make_evaluator(1)
+        one_episode = evaluator.evaluate_weights(WeightedAgent(), self.weights[:1], rep=1)
+        two_episodes = evaluator.evaluate_weights(WeightedAgent(), self.weights[:1], rep=2)
+        self.assertFalse(np.allclose(one_episode[1], two_episodes[1]))
+        # the same episodes are run again
+        np.testing.assert_array_equal(evaluator.evaluate_weights(WeightedAgent(), self.weights[:1], rep=2)[1], two_episodes[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+from pymoo.indicators.hv import HV
+
+from mo_utils.hypervolume import exact_hypervolume, hypervolume_contributions, hypervolume_with_candidates
+
+
+def pymoo_hypervolume(ref_point, points):
+    return HV(ref_point=ref_point * -1)(np.array(points) * -1)
+
+
+class TestExactHypervolume(unittest.TestCase):
+    test_seed = 0
+
+    def make_points(self, num_points, dims, rng):
+        # rounded values so that the points have duplicates, ties and points not dominating the reference point
+        return np.around(rng.normal(size=(num_points, dims)), 1)
+
+    def test_matches_pymoo(self):
+        rng = np.random.default_rng(self.test_seed)
+        for dims in (2, 3, 4):
+            ref_point = np.full(dims, -1.5)
+            for num_points in (1, 5, 60):
+                points = self.make_points(num_points, dims, rng)
+                self.assertAlmostEqual(exact_hypervolume(ref_point, points), pymoo_hypervolume(ref_point, points))
+
+    def test_matches_pymoo_without_moocore(self):
+        with mock.patch("mo_utils.hypervolume.moocore", None):
+            self.test_matches_pymoo()
+            self.test_with_candidates()
+
+    def test_no_point_dominates_reference(self):
+        self.assertEqual(exact_hypervolume(np.zeros(3), -np.ones((4, 3))), 0.0)
+
+    def test_with_candidates(self):
+        rng = np.random.default_rng(self.test_seed)
+        for dims in (2, 3, 4, 5):
+            ref_point = np.full(dims, -1.5)
+            front = self.make_points(30, dims, rng)
+            candidates = self.make_points(20, dims, rng)
+            candidates[0] = front[0]
+            expected = [pymoo_hypervolume(ref_point, np.vstack((front, candidate))) for candidate in candidates]
+            np.testing.assert_allclose(hypervolume_with_candidates(ref_point, front, candidates), expected, atol=1e-9)
+            if dims <= 4:
+                self.assertAlmostEqual(hypervolume_contributions(ref_point, front, candidates)[0], 0.0)
+
+    def test_with_candidates_empty_front(self):
+        ref_point = np.zeros(2)
+        candidates = np.array([[1.0, 2.0], [-1.0, 3.0]])
+        np.testing.assert_allclose(hypervolume_with_candidates(ref_point, np.empty((0, 2)), candidates), [2.0, 0.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import itertools
+import unittest
+from unittest import mock
+
+import numpy as np
+from scipy.optimize import linprog
+
+from algos.multi_policy.linear_support import linear_support
+from algos.multi_policy.linear_support.linear_support import LinearSupport
+
+
+def brute_force_corner_weights(ccs):
+    """Vertices of {(w, u): w in the simplex, v . w <= u for all v in ccs}, enumerating all the sets of tight constraints."""
+    ccs = np.round(np.array(ccs, dtype=np.float64), decimals=4)
+    dim = ccs.shape[1]
+    # rows of A @ (w, u) <= 0, with the equality sum(w) = 1
+    A = np.vstack((np.hstack((ccs, -np.ones((len(ccs), 1)))), np.hstack((-np.eye(dim), np.zeros((dim, 1))))))
+    equality = np.concatenate((np.ones(dim), [0.0]))
+    corners = []
+    for rows in itertools.combinations(range(len(A)), dim):
+        M = np.vstack((A[list(rows)], equality))
+        if abs(np.linalg.det(M)) < 1e-12:
+            continue
+        x = np.linalg.solve(M, np.eye(dim + 1)[-1])
+        if np.all(A @ x <= 1e-7 * max(1.0, np.abs(ccs).max())):
+            corners.append(np.abs(x[:dim]) / np.abs(x[:dim]).sum())
+    return np.unique(np.round(corners, 5), axis=0)
+
+
+class TestLinearSupport(unittest.TestCase):
+    test_seed = 0
+
+    def assert_corners_match(self, ls):
+        corners = np.unique(np.round(ls.compute_corner_weights(), 5), axis=0)
+        np.testing.assert_allclose(corners, brute_force_corner_weights(ls.ccs), atol=2e-5)
+
+    def test_corner_weights_match_brute_force(self):
+        rng = np.random.default_rng(self.test_seed)
+        for dim in (2, 3, 4):
+            ls = LinearSupport(num_objectives=dim, verbose=False)
+            for _ in range(15):
+                # rounded values so that several values are tied at some corners
+                value = np.round(rng.uniform(size=dim), 1)
+                ls.add_solution(value, rng.dirichlet(np.ones(dim)))
+                self.assert_corners_match(ls)
+
+    def test_ccs_modified_directly(self):
+        rng = np.random.default_rng(self.test_seed)
+        ls = LinearSupport(num_objectives=3, verbose=False)
+        for _ in range(10):
+            ls.add_solution(rng.uniform(size=3), rng.dirichlet(np.ones(3)))
+        ls.ccs.pop(0)
+        self.assert_corners_match(ls)
+
+    def test_lp_bounds_match_linprog(self):
+        rng = np.random.default_rng(self.test_seed)
+        for dim in (2, 3):
+            ls = LinearSupport(num_objectives=dim, verbose=False)
+            for _ in range(8):
+                ls.add_solution(rng.uniform(size=dim), rng.dirichlet(np.ones(dim)))
+            weights = list(rng.dirichlet(np.ones(dim), size=20)) + ls.compute_corner_weights()
+            W = np.vstack(ls.visited_weights)
+            V = np.array([ls.max_scalarized_value(w) for w in ls.visited_weights])
+            for w, bound in zip(weights, ls.max_values_lp(weights)):
+                solution = linprog(-w, A_ub=W, b_ub=V, bounds=(None, None), method="highs")
+                self.assertAlmostEqual(bound, -solution.fun if solution.status == 0 else float("inf"), places=6)
+
+    def test_lp_bound_cache(self):
+        rng = np.random.default_rng(self.test_seed)
+        ls = LinearSupport(num_objectives=3, verbose=False)
+        for _ in range(6):
+            w = ls.next_weight()
+            ls.add_solution(rng.uniform(size=3), w)
+        for w in ls.compute_corner_weights():
+            cached = ls.max_value_lp(w)
+            ls._lp_bounds.clear()
+            self.assertAlmostEqual(cached, ls.max_value_lp(w), places=4)
+
+    def test_obsolete_values_with_ties(self):
+        rng = np.random.default_rng(self.test_seed)
+        for dim in (2, 3, 4) * 5:
+            ls = LinearSupport(num_objectives=dim, verbose=False)
+            for _ in range(40):
+                # rounded values and weights, whose scalarizations are tied up to the rounding of the dot products
+                value = np.round(rng.uniform(size=dim), 1)
+                w = np.round(rng.dirichlet(np.ones(dim)), 1)
+                ccs, visited_weights = list(ls.ccs), ls.visited_weights + [w]
+                ls.add_solution(value, w)
+                if len(ccs) == 0:
+                    continue
+                # rules of is_dominated and remove_obsolete_values, one value and weight at a time
+                if not any(np.dot(value, v) >= max(np.dot(u, v) for u in ccs) for v in visited_weights):
+                    np.testing.assert_array_equal(ls.ccs, ccs)
+                    continue
+                expected_ccs = list(ccs)
+                for i in reversed(range(len(ccs))):
+                    max_values = {id(v): max(np.dot(u, v) for u in expected_ccs) for v in visited_weights}
+                    if not any(
+                        np.dot(ccs[i], v) == max_values[id(v)] and np.dot(value, v) < np.dot(ccs[i], v) for v in visited_weights
+                    ):
+                        expected_ccs.pop(i)
+                np.testing.assert_array_equal(ls.ccs, expected_ccs + [value])
+
+    def test_gpi_corner_evaluations(self):
+        ls = LinearSupport(num_objectives=2, verbose=False)
+        W_corner = [np.array([0.5, 0.5]), np.array([0.2, 0.8]), np.array([0.5, 0.5])]
+        evaluations = [(0.0, 0.0, np.zeros(2), np.array([float(i), 0.0])) for i in range(4)]
+        with mock.patch.object(linear_support, "policy_evaluation_mo", side_effect=evaluations) as policy_evaluation_mo:
+            values = ls.gpi_corner_evaluations("agent", "env", W_corner, rep_eval=3)
+            # each distinct corner weight is evaluated once
+            self.assertEqual(policy_evaluation_mo.call_count, 2)
+            np.testing.assert_array_equal(values, [[0.0, 0.0], [1.0, 0.0], [0.0, 0.0]])
+            self.assertEqual(policy_evaluation_mo.call_args.kwargs, {"rep": 3})
+            # and evaluated again by the next call
+            values = ls.gpi_corner_evaluations("agent", "env", W_corner[:1], rep_eval=3)
+            np.testing.assert_array_equal(values, [[2.0, 0.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+import glob
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import wandb
+from gymnasium.error import DependencyNotInstalled
+
+from mo_utils.metrics_sink import (
+    ArrowBackend,
+    MetricsBackend,
+    MetricsSink,
+    RecordingBackend,
+    Table,
+    WandbBackend,
+)
+
+
+class FailingBackend(MetricsBackend):
+    def write(self, records):
+        raise ValueError("write failed")
+
+
+class TestMetricsSink(unittest.TestCase):
+    def test_records_in_order(self):
+        backend = RecordingBackend()
+        sink = MetricsSink(backend, max_batch_size=3)
+        for step in range(10):
+            sink.log({"a": step, "global_step": step})
+        sink.flush()
+        self.assertEqual(backend.pop_records(), [{"a": step, "global_step": step} for step in range(10)])
+        sink.close()
+
+    def test_uncommitted_records_merged(self):
+        backend = RecordingBackend()
+        sink = MetricsSink(backend)
+        sink.log({"a": 1}, commit=False)
+        sink.log({"b": 2}, commit=False)
+        sink.log({"c": 3, "global_step": 0})
+        sink.log({"d": 4}, commit=False)
+        sink.flush()
+        # flush also writes the pending uncommitted metrics
+        self.assertEqual(backend.pop_records(), [{"a": 1, "b": 2, "c": 3, "global_step": 0}, {"d": 4}])
+        sink.close()
+
+    def test_close_flushes(self):
+        backend = RecordingBackend()
+        # records would stay buffered without the flush of close
+        sink = MetricsSink(backend, max_batch_size=100, flush_interval=3600.0)
+        sink.log({"a": 1})
+        sink.log({"b": 2}, commit=False)
+        sink.close()
+        self.assertEqual(backend.records, [{"a": 1}, {"b": 2}])
+        self.assertFalse(sink._thread.is_alive())
+
+    def test_flush_interval(self):
+        written = threading.Event()
+
+        class NotifyingBackend(RecordingBackend):
+            def write(self, records):
+                super().write(records)
+                written.set()
+
+        backend = NotifyingBackend()
+        sink = MetricsSink(backend, max_batch_size=100, flush_interval=0.01)
+        sink.log({"a": 1})
+        self.assertTrue(written.wait(timeout=5.0))
+        self.assertEqual(backend.records, [{"a": 1}])
+        sink.close()
+
+    def test_backend_error_raised(self):
+        sink = MetricsSink(FailingBackend())
+        sink.log({"a": 1})
+        with self.assertRaises(RuntimeError):
+            sink.flush()
+        sink.close()
+
+    def test_wandb_backend(self):
+        calls = []
+
+        def log(metrics, commit=True):
+            calls.append((metrics, commit, threading.current_thread()))
+
+        with mock.patch.object(wandb, "log", log), mock.patch.object(wandb, "Table", Table):
+            sink = MetricsSink(WandbBackend(), max_batch_size=100, flush_interval=3600.0)
+            sink.log({"a": 1}, commit=False)
+            sink.log({"front": Table(columns=["x"], data=[[1.0]]), "global_step": 0})
+            sink.log({"b": 2, "global_step": 1})
+            # buffered until flushed
+            self.assertEqual(calls, [])
+            sink.flush()
+            self.assertEqual(
+                calls,
+                [
+                    ({"a": 1, "front": Table(columns=["x"], data=[[1.0]]), "global_step": 0}, True, sink._thread),
+                    ({"b": 2, "global_step": 1}, True, sink._thread),
+                ],
+            )
+            sink.close()
+
+    def test_arrow_backend(self):
+        try:
+            import pandas
+        except ImportError:
+            self.skipTest("pandas is not installed")
+        with tempfile.TemporaryDirectory() as root:
+            try:
+                sink = MetricsSink(ArrowBackend(root), max_batch_size=2)
+            except DependencyNotInstalled as e:
+                self.skipTest(str(e))
+            sink.log({"a": 1.0, "global_step": 0})
+            sink.log({"b": 2.0, "front": Table(columns=["x", "y"], data=[[1.0, 2.0], [3.0, 4.0]]), "global_step": 1})
+            sink.log({"a": 3.0, "global_step": 2, "predictions": wandb.Image(np.zeros((2, 2, 3)))})
+            sink.close()
+
+            def read(directory):
+                parts = sorted(glob.glob(os.path.join(root, directory, "*.parquet")))
+                return pandas.concat([pandas.read_parquet(part) for part in parts], ignore_index=True)
+
+            metrics = read("metrics")
+            self.assertEqual(list(metrics["global_step"]), [0, 1, 2])
+            self.assertEqual(list(metrics["a"].fillna(-1.0)), [1.0, -1.0, 3.0])
+            front = read(os.path.join("tables", "front"))
+            self.assertEqual(front.to_dict("list"), {"x": [1.0, 3.0], "y": [2.0, 4.0], "global_step": [1, 1]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import time
+import unittest
+from copy import deepcopy
+
+import mo_gymnasium as mo_gym
+import numpy as np
+import torch as th
+
+from algos.single_policy.ser.mo_ppo import MOPPO, MOPPONet, make_env
+
+
+class TestMOPPOClone(unittest.TestCase):
+    test_seed = 0
+
+    def setUp(self):
+        th.manual_seed(self.test_seed)
+        envs = mo_gym.wrappers.vector.MOSyncVectorEnv(
+            [make_env("mo-mountaincarcontinuous-v0", self.test_seed + i, i, "test", 0.99) for i in range(2)]
+        )
+        networks = MOPPONet(envs.single_observation_space.shape, envs.single_action_space.shape, 2, [16, 16])
+        weights = np.array([0.5, 0.5], dtype=np.float32)
+        self.agent = MOPPO(
+            0, networks, weights, envs, log=False, steps_per_iteration=32, num_minibatches=2, update_epochs=1, device="cpu"
+        )
+        self.assertIsNone(self.agent.batch)
+        self.agent.train(time.time(), 1, 2)
+
+    def assert_same_state(self, state, other_state):
+        self.assertEqual(state.keys(), other_state.keys())
+        for key in state:
+            for name in ("exp_avg", "exp_avg_sq"):
+                th.testing.assert_close(state[key][name], other_state[key][name])
+                self.assertIsNot(state[key][name], other_state[key][name])
+
+    def test_deepcopy_shares_envs_and_not_batch(self):
+        clone = deepcopy(self.agent)
+        self.assertIs(clone.envs, self.agent.envs)
+        self.assertIsNone(clone.batch)
+        self.assertIsNotNone(self.agent.batch)
+        self.assertEqual(clone.global_step, self.agent.global_step)
+        for param, clone_param in zip(self.agent.networks.parameters(), clone.networks.parameters()):
+            th.testing.assert_close(param, clone_param)
+            self.assertIsNot(param, clone_param)
+
+    def test_deepcopy_has_independent_optimizer_state(self):
+        clone = deepcopy(self.agent)
+        state = deepcopy(self.agent.optimizer.state_dict()["state"])
+        self.assert_same_state(self.agent.optimizer.state_dict()["state"], clone.optimizer.state_dict()["state"])
+
+        clone.train(time.time(), 1, 2)
+        self.assertIsNotNone(clone.batch)
+        self.assertIsNot(clone.batch, self.agent.batch)
+        # training the clone leaves the optimizer state of the original agent unchanged
+        self.assert_same_state(state, self.agent.optimizer.state_dict()["state"])
+        self.assertFalse(th.equal(state[0]["exp_avg"], clone.optimizer.state_dict()["state"][0]["exp_avg"]))
+
+    def test_clone_without_optimizer_state(self):
+        clone = self.agent.clone(copy_optimizer=False)
+        self.assertEqual(len(clone.optimizer.state_dict()["state"]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
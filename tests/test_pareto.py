@@ -0,0 +1,75 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from mo_utils.pareto import ParetoArchive, filter_pareto_dominated, get_non_dominated_inds, get_non_pareto_dominated_inds
+
+
+def brute_force_mask(candidates, remove_duplicates):
+    mask = np.ones(len(candidates), dtype=bool)
+    for i, c in enumerate(candidates):
+        for j, other in enumerate(candidates):
+            if np.all(other >= c) and np.any(other > c):
+                mask[i] = False
+            elif remove_duplicates and j < i and np.array_equal(other, c):
+                mask[i] = False
+    return mask
+
+
+class TestParetoFilter(unittest.TestCase):
+    test_seed = 0
+
+    def test_matches_brute_force(self):
+        rng = np.random.default_rng(self.test_seed)
+        # small blocks so that the fronts span several of them
+        with mock.patch("mo_utils.pareto._BLOCK_SIZE", 8):
+            for dims in (1, 2, 3, 5):
+                # rounded values so that there are duplicates and weakly dominated points
+                candidates = np.around(rng.normal(size=(60, dims)), 1)
+                candidates[1] = candidates[0]
+                for remove_duplicates in (True, False):
+                    np.testing.assert_array_equal(
+                        get_non_pareto_dominated_inds(candidates, remove_duplicates=remove_duplicates),
+                        brute_force_mask(candidates, remove_duplicates),
+                    )
+                np.testing.assert_array_equal(get_non_dominated_inds(candidates), brute_force_mask(candidates, True))
+
+    def test_large_set(self):
+        rng = np.random.default_rng(self.test_seed)
+        candidates = rng.normal(size=(20000, 3))
+        front = filter_pareto_dominated(candidates)
+        self.assertGreater(len(front), 0)
+        for point in front[:10]:
+            self.assertFalse(np.any(np.all(candidates >= point, axis=1) & np.any(candidates > point, axis=1)))
+
+
+class Uncopyable:
+    def __deepcopy__(self, memo):
+        raise AssertionError("rejected candidates must not be copied")
+
+
+class TestParetoArchive(unittest.TestCase):
+    test_seed = 0
+
+    def test_keeps_non_dominated_points_in_order(self):
+        rng = np.random.default_rng(self.test_seed)
+        evaluations = np.around(rng.normal(size=(100, 3)), 1)
+        archive = ParetoArchive()
+        for i, evaluation in enumerate(evaluations):
+            archive.add(i, evaluation)
+        expected = np.flatnonzero(get_non_pareto_dominated_inds(evaluations))
+        self.assertEqual(archive.individuals, list(expected))
+        np.testing.assert_array_equal(archive.evaluations, evaluations[expected])
+
+    def test_rejected_candidates_are_not_copied(self):
+        archive = ParetoArchive()
+        self.assertTrue(archive.add(0, np.array([1.0, 1.0])))
+        self.assertFalse(archive.add(Uncopyable(), np.array([0.5, 1.0])))
+        self.assertFalse(archive.add(Uncopyable(), np.array([1.0, 1.0])))
+        self.assertTrue(archive.add(1, np.array([2.0, 1.0])))
+        self.assertEqual(archive.individuals, [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
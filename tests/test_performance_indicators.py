@@ -0,0 +1,79 @@
+import unittest
+
+import numpy as np
+
+from mo_utils.pareto import filter_pareto_dominated, get_non_pareto_dominated_mask_batched
+from mo_utils.performance_indicators import (
+    cardinality,
+    expected_utility,
+    hypervolume,
+    maximum_utility_loss,
+    multi_front_metrics,
+    sparsity,
+)
+
+
+class TestMultiFrontMetrics(unittest.TestCase):
+    test_seed = 0
+
+    def make_fronts(self, num_sets, num_points, dims, rng):
+        # rounded values so that the fronts have duplicates and weakly dominated points
+        fronts = np.around(rng.normal(size=(num_sets, num_points, dims)), 1)
+        fronts[0, 1] = fronts[0, 0]
+        fronts[1] = fronts[1, 0]
+        return fronts
+
+    def test_non_dominated_mask(self):
+        rng = np.random.default_rng(self.test_seed)
+        fronts = self.make_fronts(8, 50, 3, rng)
+        mask = get_non_pareto_dominated_mask_batched(fronts)
+        for front, front_mask in zip(fronts, mask):
+            np.testing.assert_array_equal(front[front_mask], filter_pareto_dominated(front))
+
+    def test_metrics_match_single_front_indicators(self):
+        rng = np.random.default_rng(self.test_seed)
+        fronts = self.make_fronts(6, 30, 3, rng)
+        weights = rng.dirichlet(np.ones(3), size=20)
+        ref_points = np.stack([np.full(3, -5.0)] * 3 + [np.full(3, -3.0)] * 3)
+        metrics = multi_front_metrics(fronts, ref_points, weights)
+        for i, front in enumerate(fronts):
+            filtered_front = list(filter_pareto_dominated(front))
+            self.assertAlmostEqual(metrics["hypervolume"][i], hypervolume(ref_points[i], filtered_front))
+            self.assertAlmostEqual(metrics["sparsity"][i], sparsity(filtered_front))
+            self.assertAlmostEqual(metrics["eum"][i], expected_utility(filtered_front, weights_set=weights))
+            self.assertEqual(metrics["cardinality"][i], cardinality(filtered_front))
+
+
+class TestUtilityIndicators(unittest.TestCase):
+    test_seed = 0
+
+    def test_match_loops(self):
+        rng = np.random.default_rng(self.test_seed)
+        front = rng.normal(size=(20, 3))
+        reference_set = rng.normal(size=(10, 3))
+        weights = rng.dirichlet(np.ones(3), size=15)
+        for utility in (np.dot, lambda w, p: np.min(w * p)):
+            utilities = np.array([[utility(w, p) for p in front] for w in weights])
+            ref_utilities = np.array([[utility(w, p) for p in reference_set] for w in weights])
+            self.assertAlmostEqual(expected_utility(list(front), weights, utility), utilities.max(axis=1).mean())
+            self.assertAlmostEqual(
+                maximum_utility_loss(list(front), list(reference_set), weights, utility),
+                np.max(ref_utilities.max(axis=1) - utilities.max(axis=1)),
+            )
+        gaps = [np.diff(np.sort(front[:, dim])) for dim in range(3)]
+        self.assertAlmostEqual(sparsity(list(front)), np.sum(np.square(gaps)) / (len(front) - 1))
+        self.assertEqual(sparsity(list(front[:1])), 0.0)
+
+    def test_batch_of_fronts(self):
+        rng = np.random.default_rng(self.test_seed)
+        fronts = rng.normal(size=(5, 20, 3))
+        weights = rng.dirichlet(np.ones(3), size=15)
+        np.testing.assert_allclose(sparsity(fronts), [sparsity(list(front)) for front in fronts])
+        np.testing.assert_allclose(expected_utility(fronts, weights), [expected_utility(list(front), weights) for front in fronts])
+        np.testing.assert_allclose(
+            maximum_utility_loss(fronts, fronts[0], weights), [maximum_utility_loss(list(front), fronts[0], weights) for front in fronts]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+from copy import deepcopy
+
+import mo_gymnasium as mo_gym
+import numpy as np
+
+from algos.multi_policy.pgmorl.pgmorl import PGMORL, PerformancePredictor, generate_weights
+
+
+def hyperbolic_model(x, A, a, b, c):
+    return A * (np.exp(a * (x - b)) - 1) / (np.exp(a * (x - b)) + 1) + c
+
+
+class TestPerformancePredictor(unittest.TestCase):
+    # parameters (A, a, b, c) of the improvement of each objective
+    model_params = [(4.0, 3.0, 0.5, 1.0), (2.0, 5.0, 0.3, 0.5)]
+    policy_eval = np.array([100.0, 80.0], dtype=np.float32)
+
+    def add_samples(self, predictor, weights):
+        # float32 samples, as stored by PGMORL
+        for w in weights:
+            delta = [hyperbolic_model(w[obj], *params) for obj, params in enumerate(self.model_params)]
+            predictor.add(w, self.policy_eval, self.policy_eval + np.array(delta, dtype=np.float32))
+
+    def test_cached_fit_matches_cold_fit(self):
+        weights = generate_weights(0.1, 2)
+        predictor = PerformancePredictor()
+        self.add_samples(predictor, weights)
+        deltas, predicted_evals = predictor.predict_next_evaluations(weights, self.policy_eval)
+        fitted_params = dict(predictor._fitted_params)
+
+        cached_deltas, cached_evals = predictor.predict_next_evaluations(weights, self.policy_eval)
+        self.assertEqual(predictor._fitted_params, fitted_params)
+        np.testing.assert_array_equal(cached_evals, predicted_evals)
+        for w, delta in zip(weights, deltas):
+            np.testing.assert_array_equal(predictor.predict_next_evaluation(w, self.policy_eval)[0], delta)
+
+        true_deltas = np.stack([hyperbolic_model(weights[:, obj], *params) for obj, params in enumerate(self.model_params)], axis=1)
+        np.testing.assert_allclose(deltas, true_deltas, atol=1e-3)
+
+    def test_warm_started_fit_matches_cold_fit(self):
+        weights = generate_weights(0.1, 2)
+        warm = PerformancePredictor()
+        self.add_samples(warm, weights[:6])
+        warm.predict_next_evaluations(weights, self.policy_eval)
+        # the new samples invalidate the fits, which are then used as initial guesses
+        self.add_samples(warm, weights[6:])
+        self.assertEqual(len(warm._fitted_params), 0)
+        self.assertEqual(len(warm._previous_params), 2)
+
+        cold = PerformancePredictor()
+        self.add_samples(cold, weights)
+        np.testing.assert_allclose(
+            warm.predict_next_evaluations(weights, self.policy_eval)[1],
+            cold.predict_next_evaluations(weights, self.policy_eval)[1],
+            atol=1e-6,
+        )
+
+    def test_warm_start_at_bounds(self):
+        # large a * (x - b) overflows exp in float32
+        weights = generate_weights(0.1, 2)
+        deltas = [np.array([hyperbolic_model(w[0], *self.model_params[0]), 0.0], dtype=np.float32) for w in weights]
+        next_perfs = [self.policy_eval + delta for delta in deltas]
+        fit = PerformancePredictor()._PerformancePredictor__fit_model
+        cold_params = fit(weights, deltas, next_perfs, 0, self.policy_eval, sigma=0.03)
+        warm_params = fit(weights, deltas, next_perfs, 0, self.policy_eval, sigma=0.03, initial_guess=np.array([500.0, 20.0, -5.0, 0.0]))
+        self.assertTrue(np.all(np.isfinite(warm_params)))
+        np.testing.assert_allclose(
+            hyperbolic_model(weights[:, 0].astype(np.float64), *warm_params),
+            hyperbolic_model(weights[:, 0].astype(np.float64), *cold_params),
+            atol=1e-3,
+        )
+
+
+class TestParallelTraining(unittest.TestCase):
+    steps_per_iteration = 32
+
+    def setUp(self):
+        self.algo = PGMORL(
+            env_id="mo-mountaincarcontinuous-v0",
+            origin=np.array([0.0, 0.0]),
+            num_envs=2,
+            pop_size=2,
+            steps_per_iteration=self.steps_per_iteration,
+            delta_weight=1.0,
+            env=mo_gym.make("mo-mountaincarcontinuous-v0"),
+            net_arch=[16, 16],
+            num_minibatches=2,
+            update_epochs=1,
+            seed=0,
+            log=False,
+            num_workers=1,
+            device="cpu",
+        )
+        self.algo.start_time = 0.0
+
+    def tearDown(self):
+        self.algo._close_train_pools()
+        self.algo.env.close()
+
+    def observation_counts(self, agent):
+        return [state["obs_rms"].count for state in agent.normalization_state]
+
+    def test_normalization_statistics_follow_agents(self):
+        # both agents are trained by the same worker, each with its own statistics
+        self.algo._PGMORL__train_all_agents(iteration=0, max_iterations=2)
+        for agent in self.algo.agents:
+            self.assertEqual(len(agent.normalization_state), 2)
+            self.assertEqual(set(agent.normalization_state[0]), {"obs_rms", "return_rms_0", "return_rms_1"})
+            # the reset of make_env, the reset of the training iteration and one observation per step
+            np.testing.assert_allclose(self.observation_counts(agent), self.steps_per_iteration + 2, atol=1e-3)
+
+        # a clone resumes with the statistics of the agent it copies
+        copied_agent = deepcopy(self.algo.agents[0])
+        copied_agent.id = 1
+        np.testing.assert_array_equal(
+            copied_agent.normalization_state[0]["obs_rms"].mean, self.algo.agents[0].normalization_state[0]["obs_rms"].mean
+        )
+        self.assertIsNot(copied_agent.normalization_state[0]["obs_rms"], self.algo.agents[0].normalization_state[0]["obs_rms"])
+        self.algo.agents[1] = copied_agent
+        self.algo._PGMORL__train_all_agents(iteration=1, max_iterations=2)
+        for agent in self.algo.agents:
+            np.testing.assert_allclose(self.observation_counts(agent), 2 * self.steps_per_iteration + 3, atol=1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+
+from morl_generalization.scheduler import EpisodeTask, EpisodeTaskScheduler
+
+
+class TestEpisodeTaskScheduler(unittest.TestCase):
+    def test_slots_run_tasks_of_their_environment(self):
+        scheduler = EpisodeTaskScheduler(num_test_envs=2, slots_per_env=2, num_weights=2, num_reps=2)
+        self.assertEqual(scheduler.assign(range(4)), [0, 1, 2, 3])
+        self.assertEqual(
+            scheduler.tasks, [EpisodeTask(0, 0, 0), EpisodeTask(0, 0, 1), EpisodeTask(1, 0, 0), EpisodeTask(1, 0, 1)]
+        )
+
+        # a slot pulls the next task of its environment as soon as its episode ends
+        self.assertEqual(scheduler.complete(1), EpisodeTask(0, 0, 1))
+        self.assertEqual(scheduler.assign([1]), [1])
+        self.assertEqual(scheduler.tasks[1], EpisodeTask(0, 1, 0))
+
+    def test_all_tasks_run_once(self):
+        scheduler = EpisodeTaskScheduler(num_test_envs=2, slots_per_env=3, num_weights=3, num_reps=2)
+        completed = []
+        started = scheduler.assign(range(scheduler.num_slots))
+        while not scheduler.finished:
+            # slots finish in turn, from the last one
+            slot = started.pop()
+            completed.append(scheduler.complete(slot))
+            started = scheduler.assign([slot]) + started
+        self.assertEqual(
+            sorted(completed), [EpisodeTask(e, w, r) for e in range(2) for w in range(3) for r in range(2)]
+        )
+        self.assertFalse(scheduler.active.any())
+
+    def test_cancel(self):
+        scheduler = EpisodeTaskScheduler(num_test_envs=1, slots_per_env=1, num_weights=2, num_reps=3)
+        scheduler.assign([0])
+        # the running repetition is not affected
+        self.assertEqual(scheduler.cancel(0, 0), 2)
+        self.assertEqual(scheduler.cancel(0, 0), 0)
+        scheduler.complete(0)
+        scheduler.assign([0])
+        self.assertEqual(scheduler.tasks[0], EpisodeTask(0, 1, 0))
+
+    def test_idle_slots(self):
+        scheduler = EpisodeTaskScheduler(num_test_envs=1, slots_per_env=3, num_weights=1, num_reps=2)
+        self.assertEqual(scheduler.assign(range(3)), [0, 1])
+        self.assertEqual(list(scheduler.active), [True, True, False])
+        scheduler.complete(0)
+        self.assertEqual(scheduler.assign([0]), [])
+        self.assertFalse(scheduler.finished)
+        scheduler.complete(1)
+        self.assertTrue(scheduler.finished)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from mo_utils.metrics_sink import MetricsSink, RecordingBackend, Table
+from morl_generalization import table_store
+from morl_generalization.table_store import AppendOnlyTableStore
+
+
+class TestAppendOnlyTableStore(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.root = tmp_dir.name
+
+    def test_append(self):
+        store = AppendOnlyTableStore(self.root)
+        store.append("test_env/front", ["x", "y", "global_step"], [[1.5, 2.0, 100]])
+        store.append("test_env/front", ["x", "y", "global_step"], [[3.0, -1.0, 200], [0.5, 4.0, 200]])
+        self.assertTrue(os.path.isfile(os.path.join(self.root, "test_env", "front.csv")))
+        self.assertEqual(store.read("test_env/front"), [[1.5, 2.0, 100], [3.0, -1.0, 200], [0.5, 4.0, 200]])
+        with open(store.path("test_env/front")) as f:
+            # the header is written once
+            self.assertEqual(f.read().count("global_step"), 1)
+
+    def test_new_store_overwrites_tables(self):
+        AppendOnlyTableStore(self.root).append("best_weights", ["w0", "w1"], [[0.1, 0.9]])
+        store = AppendOnlyTableStore(self.root)
+        store.append("best_weights", ["w0", "w1"], [[0.5, 0.5]])
+        self.assertEqual(store.read("best_weights"), [[0.5, 0.5]])
+
+    def test_export(self):
+        store = AppendOnlyTableStore(self.root)
+        store.append("a", ["x"], [[1], [2]])
+        store.append("b", ["y"], [[3.0]])
+        backend = RecordingBackend()
+        sink = MetricsSink(backend)
+        with mock.patch.object(table_store, "get_metrics_sink", return_value=sink):
+            store.export(prefix="eval/")
+            store.append("a", ["x"], [[3]])
+            store.export(names=["a"])
+        sink.close()
+        self.assertEqual(
+            backend.records,
+            [
+                {"eval/a": Table(columns=["x"], data=[[1], [2]])},
+                {"eval/b": Table(columns=["y"], data=[[3.0]])},
+                {"a": Table(columns=["x"], data=[[1], [2], [3]])},
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
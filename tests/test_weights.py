@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from mo_utils import weights
+
+
+class TestReferenceDirectionsCache(unittest.TestCase):
+    def test_cached_on_disk(self):
+        with tempfile.TemporaryDirectory() as cache_dir, mock.patch.dict(os.environ, {"MORL_CACHE_DIR": cache_dir}):
+            weights.reference_directions.cache_clear()
+            ref_dirs = weights.reference_directions(3, 10, seed=1)
+            self.assertEqual(len(os.listdir(weights.reference_directions_cache_dir())), 1)
+
+            # a new process only reads the file
+            weights.reference_directions.cache_clear()
+            with mock.patch.object(weights, "get_reference_directions", side_effect=AssertionError("not cached")):
+                np.testing.assert_array_equal(weights.reference_directions(3, 10, seed=1), ref_dirs)
+            weights.reference_directions.cache_clear()
+
+            self.assertEqual(ref_dirs.shape, (10, 3))
+            np.testing.assert_allclose(ref_dirs.sum(axis=1), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
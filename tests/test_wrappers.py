@@ -0,0 +1,96 @@
+import unittest
+
+import gymnasium as gym
+import mo_gymnasium as mo_gym
+import numpy as np
+
+from morl_generalization.wrappers import MOAsyncVectorEnv, MOSyncVectorEnv
+
+
+class ScalarRewardInfo(gym.Wrapper):
+    """Adds the sum of the vector reward to the info, as the environments recovering a single-objective reward do."""
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        info["original_scalar_reward"] = float(np.sum(reward))
+        return obs, reward, terminated, truncated, info
+
+
+def make_env():
+    return ScalarRewardInfo(mo_gym.make("mo-mountaincarcontinuous-v0", max_episode_steps=7))
+
+
+class TestMOSyncVectorEnv(unittest.TestCase):
+    def test_masked_reset_after_step(self):
+        envs = MOSyncVectorEnv([make_env for _ in range(3)])
+        self.addCleanup(envs.close)
+        envs.reset(seed=0)
+        obs = envs.step(np.ones((3, 1), dtype=np.float32))[0]
+        reset_obs, _ = envs.reset(seed=[1, 2, 3], options={"reset_mask": np.array([True, False, False])})
+        # the sub-environments left out keep the observations of their last step
+        np.testing.assert_array_equal(reset_obs[1:], obs[1:])
+        self.assertFalse(np.array_equal(reset_obs[0], obs[0]))
+
+
+class TestMOAsyncVectorEnv(unittest.TestCase):
+    num_envs = 5
+
+    def make_envs(self, **kwargs):
+        sync_envs = MOSyncVectorEnv([make_env for _ in range(self.num_envs)])
+        async_envs = MOAsyncVectorEnv([make_env for _ in range(self.num_envs)], **kwargs)
+        self.addCleanup(sync_envs.close)
+        self.addCleanup(async_envs.close)
+        return sync_envs, async_envs
+
+    def assert_same_results(self, results, other_results):
+        for value, other_value in zip(results[:4], other_results[:4]):
+            np.testing.assert_array_equal(value, other_value)
+        info, other_info = results[4], other_results[4]
+        self.assertEqual(info.keys(), other_info.keys())
+        for key in info:
+            np.testing.assert_array_equal(info[key], other_info[key])
+
+    def check_same_rollouts(self, worker_env_indices, **kwargs):
+        sync_envs, async_envs = self.make_envs(**kwargs)
+        rng = np.random.default_rng(0)
+        self.assertEqual(async_envs.worker_env_indices, worker_env_indices)
+
+        obs, _ = sync_envs.reset(seed=0)
+        async_obs, _ = async_envs.reset(seed=0)
+        np.testing.assert_array_equal(async_obs, obs)
+        for t in range(30):
+            actions = rng.uniform(-1.0, 1.0, size=(self.num_envs, 1)).astype(np.float32)
+            if t % 3 == 0:
+                results = sync_envs.step(actions)
+                async_results = async_envs.step(actions)
+            else:
+                # the other sub-environments are not stepped, and keep their episode going
+                env_indices = np.sort(rng.choice(self.num_envs, size=rng.integers(1, self.num_envs + 1), replace=False))
+                results = sync_envs.step_subset(actions[: len(env_indices)], env_indices)
+                async_results = async_envs.step_subset(actions[: len(env_indices)], env_indices)
+                self.assertEqual(len(async_results[1]), len(env_indices))
+            # rewards, done flags and the scalar info entry come through shared memory
+            self.assert_same_results(async_results, results)
+            self.assertIn("original_scalar_reward", results[4])
+
+            if t % 10 == 9:
+                reset_mask = rng.random(self.num_envs) < 0.5
+                reset_mask[0] = True
+                seeds = [int(seed) for seed in rng.integers(1000, size=self.num_envs)]
+                obs, _ = sync_envs.reset(seed=seeds, options={"reset_mask": reset_mask.copy()})
+                async_obs, _ = async_envs.reset(seed=seeds, options={"reset_mask": reset_mask.copy()})
+                np.testing.assert_array_equal(async_obs, obs)
+
+    def test_matches_sync_env(self):
+        self.check_same_rollouts([[0], [1], [2], [3], [4]])
+
+    def test_several_envs_per_worker(self):
+        self.check_same_rollouts([[0, 1], [2, 3], [4]], envs_per_worker=2)
+
+    def test_observations_through_pipes(self):
+        self.check_same_rollouts([[0], [1], [2], [3], [4]], shared_memory=False)
+        self.check_same_rollouts([[0, 1], [2, 3], [4]], shared_memory=False, envs_per_worker=2)
+
+
+if __name__ == "__main__":
+    unittest.main()